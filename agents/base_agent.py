@@ -1,11 +1,33 @@
 import logging
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List
+import functools
 import uuid
+from tools.tracing import tracer
+
+
+def _traced_process(process):
+    """Wrap an agent's process() in a span named after the agent"""
+    @functools.wraps(process)
+    async def wrapper(self, *args, **kwargs):
+        if not tracer.enabled:
+            return await process(self, *args, **kwargs)
+        with tracer.span(f"{self.name}.process", "agent", agent_id=self.agent_id):
+            return await process(self, *args, **kwargs)
+    wrapper.__traced__ = True
+    return wrapper
+
 
 class BaseAgent(ABC):
     """Base class for all agents in our multi-agent system"""
     
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Every concrete process() is timed, with parent/child links across agents
+        process = cls.__dict__.get("process")
+        if process is not None and not getattr(process, "__traced__", False):
+            cls.process = _traced_process(process)
+    
     def __init__(self, name: str):
         self.name = name
         self.agent_id = str(uuid.uuid4())[:8]
@@ -23,4 +45,13 @@ class BaseAgent(ABC):
             "name": self.name,
             "id": self.agent_id,
             "status": "active"
+        }
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Latency histograms and in-flight gauges for this agent's process() calls"""
+        span_name = f"{self.name}.process"
+        snapshot = tracer.snapshot()
+        return {
+            "histogram": next((h for h in snapshot["histograms"] if h["name"] == span_name), None),
+            "in_flight": next((g["value"] for g in snapshot["in_flight"] if g["name"] == span_name), 0)
         }
\ No newline at end of file
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, IO, Optional, Set, Tuple
+
+
+class BatchCheckpoint:
+    """Tracks which input lines are finished, as a watermark plus the lines done above it.
+
+    Lines complete out of order, so progress is kept as a watermark (every
+    line below it is done) plus the finished lines above it. BatchRunner
+    admits no line more than max_ahead past the watermark, which bounds that
+    set even behind one slow line. Saves are
+    atomic (write then rename), so a crash leaves the previous checkpoint.
+    The checkpoint also records the output file and its size at the save,
+    so a resumed run can drop results written after it.
+    """
+
+    def __init__(self, path: Optional[str], source: str):
+        self.path = path
+        self.source = source
+        self.watermark = 0
+        self.done_above: Set[int] = set()
+        self.completed = 0
+        self.output: Optional[str] = None
+        self.output_bytes: Optional[int] = None
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("source") != source:
+                raise ValueError(f"Checkpoint {path} belongs to {state.get('source')!r}, not {source!r}")
+            self.watermark = state["watermark"]
+            self.done_above = set(state.get("done_above", []))
+            self.completed = state.get("completed", 0)
+            self.output = state.get("output")
+            self.output_bytes = state.get("output_bytes")
+
+    def is_done(self, line_no: int) -> bool:
+        return line_no < self.watermark or line_no in self.done_above
+
+    def mark_done(self, line_no: int):
+        self.completed += 1
+        self.skip(line_no)
+
+    def skip(self, line_no: int):
+        """Record a line as finished without counting a session (blank or invalid input)"""
+        self.done_above.add(line_no)
+        while self.watermark in self.done_above:
+            self.done_above.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self):
+        if not self.path:
+            return
+        state = {
+            "source": self.source,
+            "watermark": self.watermark,
+            "done_above": sorted(self.done_above),
+            "completed": self.completed,
+            "output": self.output,
+            "output_bytes": self.output_bytes,
+            "saved_at": time.time()
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def parse_query_line(line: str) -> Tuple[Optional[str], Optional[str]]:
+    """Return (id, query) from a JSONL line; plain text lines are taken as the query itself.
+
+    Objects may carry "query", or "title" and "body" like requests.jsonl.
+    """
+    line = line.strip()
+    if not line:
+        return None, None
+    if not line.startswith("{"):
+        return None, line
+    record = json.loads(line)
+    query = record.get("query")
+    if not query and record.get("title"):
+        query = f"{record['title']}. {record.get('body', '')}".strip()
+    record_id = record.get("id", record.get("request_id"))
+    return (str(record_id) if record_id is not None else None), query
+
+
+class BatchRunner:
+    """Streams queries from JSONL through a research worker and appends results as JSONL.
+
+    At most `concurrency` sessions run at once and input is only read when a
+    slot frees up, so memory stays flat however long the input is. Results
+    are written in completion order; each carries its input line number.
+    A slow line holds back the checkpoint watermark, so no line is started
+    more than max_ahead lines past it (default 64 x concurrency); the
+    checkpoint stays small and a crash repeats at most that much work.
+
+    Lines finished after the last checkpoint run again on resume. An output
+    file is first cut back to its size at that checkpoint, so each line's
+    result appears once; results streamed to stdout cannot be taken back and
+    are at-least-once (deduplicate them by "line").
+    """
+
+    def __init__(self, worker: Callable[[str], Awaitable[Dict[str, Any]]], concurrency: Optional[int] = None,
+                 deadline: Optional[float] = None, checkpoint_path: Optional[str] = None,
+                 checkpoint_every: int = 100, max_ahead: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.worker = worker
+        self.concurrency = int(concurrency or os.getenv("BATCH_CONCURRENCY", 16))
+        deadline = deadline if deadline is not None else os.getenv("SESSION_DEADLINE")
+        self.deadline = float(deadline) if deadline else None
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.max_ahead = int(max_ahead or os.getenv("BATCH_MAX_AHEAD", 0) or self.concurrency * 64)
+        self.stats = {"read": 0, "skipped": 0, "invalid": 0, "completed": 0, "failed": 0, "timed_out": 0,
+                      "stalled": 0}
+
+    async def _read_lines(self, stream: IO[str], blocking: bool) -> AsyncIterator[Tuple[int, str]]:
+        loop = asyncio.get_running_loop()
+        line_no = 0
+        while True:
+            # Pipes may stall, so read them off the event loop; regular files are read directly
+            line = await loop.run_in_executor(None, stream.readline) if blocking else stream.readline()
+            if not line:
+                return
+            yield line_no, line
+            line_no += 1
+
+    async def _run_one(self, line_no: int, record_id: Optional[str], query: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        outcome: Dict[str, Any] = {"line": line_no, "id": record_id, "query": query}
+        try:
+            if self.deadline:
+                session = await asyncio.wait_for(self.worker(query), self.deadline)
+            else:
+                session = await self.worker(query)
+            outcome.update(status="completed", session=session)
+        except asyncio.TimeoutError:
+            outcome.update(status="timed_out", error=f"deadline of {self.deadline}s exceeded")
+        except Exception as e:
+            self.logger.error(f"Batch query on line {line_no} failed: {e}")
+            outcome.update(status="failed", error=str(e))
+        outcome["elapsed"] = round(time.perf_counter() - started, 4)
+        return outcome
+
+    async def run(self, input_path: str = "-", output_path: str = "-") -> Dict[str, int]:
+        """Process every unfinished line of input_path ("-" for stdin) into output_path ("-" for stdout)"""
+        source = "<stdin>" if input_path == "-" else os.path.abspath(input_path)
+        checkpoint = BatchCheckpoint(self.checkpoint_path, source)
+        if checkpoint.watermark or checkpoint.done_above:
+            self.logger.info(f"Resuming batch from line {checkpoint.watermark} "
+                             f"({checkpoint.completed} sessions already done)")
+
+        stream = sys.stdin if input_path == "-" else open(input_path, "r", encoding="utf-8")
+        if output_path != "-":
+            self._rewind_output(checkpoint, os.path.abspath(output_path))
+        else:
+            checkpoint.output = checkpoint.output_bytes = None
+        # Append so a resumed run extends the results of the crashed one
+        output = sys.stdout if output_path == "-" else open(output_path, "a", encoding="utf-8")
+        pending: Set[asyncio.Future] = set()
+        since_checkpoint = 0
+
+        def save_checkpoint():
+            # Results must be on disk before the checkpoint claims them
+            output.flush()
+            if output is not sys.stdout:
+                os.fsync(output.fileno())
+                checkpoint.output_bytes = os.fstat(output.fileno()).st_size
+            checkpoint.save()
+
+        def write(outcome: Dict[str, Any]):
+            nonlocal since_checkpoint
+            output.write(json.dumps(outcome, default=str) + "\n")
+            self.stats[outcome["status"]] += 1
+            checkpoint.mark_done(outcome["line"])
+            since_checkpoint += 1
+            if since_checkpoint >= self.checkpoint_every:
+                save_checkpoint()
+                since_checkpoint = 0
+
+        async def drain(return_when: str):
+            nonlocal pending
+            done, pending = await asyncio.wait(pending, return_when=return_when)
+            for task in done:
+                write(task.result())
+
+        try:
+            async for line_no, line in self._read_lines(stream, blocking=input_path == "-"):
+                self.stats["read"] += 1
+                if checkpoint.is_done(line_no):
+                    self.stats["skipped"] += 1
+                    continue
+                try:
+                    record_id, query = parse_query_line(line)
+                except ValueError as e:
+                    self.logger.warning(f"Skipping invalid JSON on line {line_no}: {e}")
+                    record_id, query = None, None
+                if not query:
+                    self.stats["invalid"] += 1
+                    checkpoint.skip(line_no)
+                    continue
+
+                while len(pending) >= self.concurrency:
+                    await drain(asyncio.FIRST_COMPLETED)
+                if pending and line_no - checkpoint.watermark >= self.max_ahead:
+                    # Wait for the line holding the watermark back; with nothing pending it has caught up
+                    self.stats["stalled"] += 1
+                    while pending and line_no - checkpoint.watermark >= self.max_ahead:
+                        await drain(asyncio.FIRST_COMPLETED)
+                pending.add(asyncio.ensure_future(self._run_one(line_no, record_id, query)))
+
+            if pending:
+                await drain(asyncio.ALL_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+            save_checkpoint()
+            if stream is not sys.stdin:
+                stream.close()
+            if output is not sys.stdout:
+                output.close()
+
+        return dict(self.stats)
+
+    def _rewind_output(self, checkpoint: BatchCheckpoint, output_file: str):
+        """Truncate output_file to its size at the checkpoint, dropping results of lines that will run again"""
+        if checkpoint.output == output_file and checkpoint.output_bytes is not None:
+            size = os.path.getsize(output_file) if os.path.exists(output_file) else 0
+            if size > checkpoint.output_bytes:
+                self.logger.info(f"Dropping {size - checkpoint.output_bytes} bytes of results written "
+                                 f"after the last checkpoint from {output_file}")
+                os.truncate(output_file, checkpoint.output_bytes)
+            elif size < checkpoint.output_bytes:
+                self.logger.warning(f"{output_file} is shorter than the checkpoint recorded; "
+                                    f"results of some finished lines are missing")
+        elif checkpoint.watermark or checkpoint.done_above:
+            self.logger.warning(f"Checkpoint was written for output {checkpoint.output!r}; "
+                                f"{output_file} may hold duplicate results")
+        checkpoint.output = output_file
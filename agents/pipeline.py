@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from tools.tracing import tracer
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+class Stage:
+    """One step of a StagePipeline.
+
+    handler receives one item from the upstream stage (named by `after`;
+    the first stage receives the pipeline's seed). With expand=True it
+    returns a list whose elements travel on as separate items; with
+    collect=True it runs once, on the list of every upstream item.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[Any]], after: Optional[str] = None,
+                 concurrency: int = 1, expand: bool = False, collect: bool = False,
+                 timeout: Optional[float] = None):
+        self.name = name
+        self.handler = handler
+        self.after = after
+        self.concurrency = 1 if collect else max(1, concurrency)
+        self.expand = expand
+        self.collect = collect
+        self.timeout = timeout
+
+
+class StagePipeline:
+    """Runs a tree-shaped DAG of stages with items flowing as soon as each is ready.
+
+    Each stage has its own workers (its concurrency limit) and a bounded
+    inbound queue, so a slow stage holds back its producers instead of
+    letting work pile up. A failing or timed-out item is recorded against
+    its stage and dropped; the other items carry on. Outputs and timings
+    are kept per stage.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 8):
+        self.logger = logging.getLogger(__name__)
+        names = {stage.name for stage in stages}
+        roots = [stage for stage in stages if stage.after is None]
+        if len(roots) != 1 or any(stage.after not in names for stage in stages if stage.after):
+            raise ValueError("A pipeline needs exactly one first stage, and every 'after' must name a stage")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.children = {stage.name: [child for child in stages if child.after == stage.name] for stage in stages}
+
+    async def run(self, seed: Any) -> Dict[str, Any]:
+        """Feed seed to the first stage and wait for every stage to drain.
+
+        Returns {"outputs": {stage: [results...]}, "errors": {stage: [...]},
+        "timings": {stage: {...}}}.
+        """
+        started = time.perf_counter()
+        queues = {stage.name: asyncio.Queue(self.queue_size) for stage in self.stages}
+        outputs: Dict[str, List[Any]] = {stage.name: [] for stage in self.stages}
+        errors: Dict[str, List[str]] = {stage.name: [] for stage in self.stages}
+        timings = {stage.name: {"items": 0, "errors": 0, "busy_seconds": 0.0, "first_start": None,
+                                "last_end": None, "queue_wait_seconds": 0.0} for stage in self.stages}
+        active = {stage.name: stage.concurrency for stage in self.stages}
+
+        async def emit(stage: Stage, result: Any):
+            outputs[stage.name].append(result)
+            for child in self.children[stage.name]:
+                # Blocks while the child's queue is full: backpressure
+                await queues[child.name].put((time.perf_counter(), result))
+
+        async def call(stage: Stage, item: Any) -> Any:
+            timing = timings[stage.name]
+            began = time.perf_counter()
+            if timing["first_start"] is None:
+                timing["first_start"] = began - started
+            try:
+                with tracer.span(f"pipeline.{stage.name}", "stage"):
+                    if stage.timeout:
+                        return await asyncio.wait_for(stage.handler(item), stage.timeout)
+                    return await stage.handler(item)
+            finally:
+                ended = time.perf_counter()
+                timing["items"] += 1
+                timing["busy_seconds"] += ended - began
+                timing["last_end"] = ended - started
+
+        async def worker(stage: Stage):
+            timing = timings[stage.name]
+            collected = []
+            try:
+                while True:
+                    queued_at, item = await queues[stage.name].get()
+                    if item is _DONE:
+                        break
+                    waited = time.perf_counter() - queued_at
+                    timing["queue_wait_seconds"] += waited
+                    tracer.observe(f"pipeline.{stage.name}.queue_wait", waited, kind="queue")
+                    if stage.collect:
+                        collected.append(item)
+                        continue
+                    try:
+                        result = await call(stage, item)
+                    except Exception as e:
+                        timing["errors"] += 1
+                        errors[stage.name].append(f"{type(e).__name__}: {e}"[:200])
+                        self.logger.warning(f"Stage {stage.name} failed on an item: {e}")
+                        continue
+                    for element in (result if stage.expand else [result]):
+                        await emit(stage, element)
+                if stage.collect:
+                    try:
+                        await emit(stage, await call(stage, collected))
+                    except Exception as e:
+                        timing["errors"] += 1
+                        errors[stage.name].append(f"{type(e).__name__}: {e}"[:200])
+                        self.logger.warning(f"Stage {stage.name} failed: {e}")
+            finally:
+                active[stage.name] -= 1
+                if active[stage.name] == 0:
+                    # Last worker out closes the stage for every child worker
+                    for child in self.children[stage.name]:
+                        for _ in range(child.concurrency):
+                            await queues[child.name].put((time.perf_counter(), _DONE))
+
+        root = next(stage for stage in self.stages if stage.after is None)
+        workers = [asyncio.ensure_future(worker(stage)) for stage in self.stages for _ in range(stage.concurrency)]
+        await queues[root.name].put((time.perf_counter(), seed))
+        for _ in range(root.concurrency):
+            await queues[root.name].put((time.perf_counter(), _DONE))
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+        for timing in timings.values():
+            timing["busy_seconds"] = round(timing["busy_seconds"], 4)
+            timing["queue_wait_seconds"] = round(timing["queue_wait_seconds"], 4)
+            for key in ("first_start", "last_end"):
+                if timing[key] is not None:
+                    timing[key] = round(timing[key], 4)
+        timings["total_seconds"] = round(time.perf_counter() - started, 4)
+        return {"outputs": outputs, "errors": {name: errs for name, errs in errors.items() if errs},
+                "timings": timings}
@@ -1,21 +1,70 @@
 from .base_agent import BaseAgent
+from .pipeline import Stage, StagePipeline
 from .search_agent import SearchAgent
-from typing import Dict, Any, List
+from .scheduler import ResearchScheduler
+from memory.session_store import SessionStore, create_session_store
+from tools.dedup_index import DuplicateIndex
+from tools.semantic_cache import SemanticQueryCache
+from tools.token_budget import TokenAccount, charged_to, token_accounting
+from typing import Dict, Any, List, AsyncIterator, Optional
 import asyncio
+import copy
+import os
+import time
 import uuid
+from collections import OrderedDict
 
 class ResearchOrchestrator(BaseAgent):
     """Master agent that coordinates research workflow"""
     
-    def __init__(self):
+    def __init__(self, gemini_tools: Optional[Any] = None, session_store: Optional[SessionStore] = None,
+                 search_agent: Optional[SearchAgent] = None, dedup_index: Optional[DuplicateIndex] = None,
+                 semantic_cache: Optional[SemanticQueryCache] = None):
         super().__init__("research_orchestrator")
-        self.research_sessions = {}
-        self.search_agent = SearchAgent()
+        # Bounded LRU/TTL store (memory or SQLite); sessions are re-saved after each stage
+        self.research_sessions = session_store if session_store is not None else create_session_store()
+        self.search_agent = search_agent or SearchAgent()
+        self.gemini_tools = gemini_tools
+        # Shared across sessions, so an article found by several queries is analyzed once
+        if dedup_index is None and os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes"):
+            dedup_index = DuplicateIndex()
+        self.dedup_index = dedup_index
+        # Analyses of indexed results by URL, so a duplicate reuses its original's instead of calling Gemini
+        self._analyses: "OrderedDict[str, str]" = OrderedDict()
+        self._analyzing: Dict[str, asyncio.Future] = {}
+        # Finished sessions reused for later queries that mean the same thing
+        if semantic_cache is None and os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"):
+            semantic_cache = SemanticQueryCache()
+        self.semantic_cache = semantic_cache
+        # Session pipeline: results per search, optional page fetching, per-stage worker limits
+        self.max_results = int(os.getenv("SESSION_MAX_RESULTS", 3))
+        self.fetch_content = os.getenv("PIPELINE_FETCH_PAGES", "false").lower() in ("1", "true", "yes")
+        self.fetch_concurrency = int(os.getenv("PIPELINE_FETCH_CONCURRENCY", 4))
+        self.analyze_concurrency = int(os.getenv("PIPELINE_ANALYZE_CONCURRENCY", 3))
+        self.pipeline_queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", 4))
+        # Gemini tokens one session may spend (0 means record usage without a cap)
+        self.session_token_budget = int(os.getenv("SESSION_TOKEN_BUDGET", 50000))
+    
+    @property
+    def session_kind(self) -> str:
+        """How complete this orchestrator's sessions are, for the semantic cache"""
+        return "analysis" if self.gemini_tools is not None else "search"
     
     async def process(self, query: str) -> Dict[str, Any]:
-        """Process a research query using multiple agents"""
+        """Process a research query using multiple agents.
+        
+        The session runs as a pipeline of stages (search -> fetch -> analyze
+        -> summarize): each search result moves on as soon as its previous
+        stage finishes, instead of every result waiting for the slowest one.
+        Fetching runs when PIPELINE_FETCH_PAGES is set; analysis and summary
+        run only when the orchestrator has GeminiTools.
+        """
         self.logger.info(f"Processing research query: {query}")
         
+        cached = self._cached_session(query, self.session_kind)
+        if cached is not None:
+            return cached
+        
         # Create research session
         session_id = str(uuid.uuid4())[:8]
         research_session = {
@@ -26,33 +75,308 @@ class ResearchOrchestrator(BaseAgent):
             "results": {}
         }
         
-        self.research_sessions[session_id] = research_session
+        await self.research_sessions.aput(research_session)
         
-        # Step 1: Use Search Agent to find information
-        self.logger.info("Coordinating with Search Agent...")
-        search_data = {"query": query, "max_results": 3}
-        search_results = await self.search_agent.process(search_data)
-        
-        research_session["status"] = "search_completed"
-        research_session["results"]["search"] = search_results
+        pipeline = StagePipeline(self._session_stages(research_session), queue_size=self.pipeline_queue_size)
+        with token_accounting(self.session_token_budget) as tokens:
+            run = await pipeline.run(query)
+        research_session["token_usage"] = tokens.to_dict()
+        search_results = research_session["results"].get("search", {"query": query, "results": []})
         
-        # Step 2: Prepare for analysis (we'll add Analysis Agent next)
         research_session["agents_involved"].append("analysis_agent")
-        research_session["status"] = "ready_for_analysis"
+        if self.gemini_tools is not None:
+            # Analyses finish in any order; report them in search rank order
+            rank = {result["url"]: i for i, result in enumerate(search_results.get("results", []))}
+            research_session["results"]["analyses"] = sorted(
+                run["outputs"]["analyze"], key=lambda analysis: rank.get(analysis["url"], len(rank))
+            )
+            if run["outputs"]["summarize"] and run["outputs"]["summarize"][0] is not None:
+                research_session["results"]["summary"] = run["outputs"]["summarize"][0]
+            research_session["status"] = "completed"
+        else:
+            research_session["status"] = "ready_for_analysis"
+        research_session["stage_timings"] = run["timings"]
+        if run["errors"]:
+            research_session["stage_errors"] = run["errors"]
         
-        self.logger.info(f"Research session {session_id} completed search phase")
+        await self.research_sessions.aput(research_session)
+        await self._cache_session(research_session, self.session_kind)
+        self.logger.info(f"Research session {session_id} finished in {run['timings']['total_seconds']}s")
         self.logger.info(f"Found {search_results.get('total_found', 0)} search results")
         
         return research_session
     
-    async def parallel_research(self, queries: List[str]) -> Dict[str, Any]:
-        """Conduct research on multiple topics in parallel"""
+    async def process_stream(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming mode of process: yields session events as each stage makes progress.
+        
+        Events: session_started, search_done, analysis_chunk, summary_chunk and
+        session_completed (which carries the finished session). Analysis and
+        summary stages run only when the orchestrator has GeminiTools.
+        """
+        self.logger.info(f"Processing research query (streaming): {query}")
+        started = time.perf_counter()
+        
+        kind = self.session_kind
+        cached = self._cached_session(query, kind)
+        if cached is not None:
+            yield {"event": "session_started", "session_id": cached["session_id"], "query": query}
+            yield {"event": "session_completed", "session_id": cached["session_id"], "session": cached}
+            return
+        
+        session_id = str(uuid.uuid4())[:8]
+        research_session = {
+            "session_id": session_id,
+            "query": query,
+            "status": "initialized",
+            "agents_involved": ["search_agent"],
+            "results": {}
+        }
+        await self.research_sessions.aput(research_session)
+        yield {"event": "session_started", "session_id": session_id, "query": query}
+        
+        search_results = await self.search_agent.process({"query": query, "max_results": self.max_results})
+        search_results = self._collapse_duplicates(research_session, search_results)
+        research_session["status"] = "search_completed"
+        research_session["results"]["search"] = search_results
+        yield {"event": "search_done", "session_id": session_id, "search": search_results,
+               "elapsed": round(time.perf_counter() - started, 4)}
+        
+        if self.gemini_tools is not None:
+            snippets = "\n".join(
+                f"{result['title']}: {result['snippet']}" for result in search_results.get("results", [])
+            ) or query
+            research_session["agents_involved"].append("analysis_agent")
+            
+            # The account is entered around each chunk, never across a yield to the consumer
+            tokens = TokenAccount(self.session_token_budget)
+            for stage, stream in (("analysis", self.gemini_tools.analyze_content_stream(snippets)),
+                                  ("summary", self.gemini_tools.generate_summary_stream(snippets))):
+                parts = []
+                try:
+                    while True:
+                        with charged_to(tokens):
+                            try:
+                                chunk = await anext(stream)
+                            except StopAsyncIteration:
+                                break
+                        parts.append(chunk)
+                        yield {"event": f"{stage}_chunk", "session_id": session_id, "text": chunk}
+                finally:
+                    with charged_to(tokens):
+                        await stream.aclose()
+                research_session["results"][stage] = "".join(parts)
+            research_session["token_usage"] = tokens.to_dict()
+            research_session["status"] = "completed"
+        else:
+            research_session["agents_involved"].append("analysis_agent")
+            research_session["status"] = "ready_for_analysis"
+        
+        research_session["elapsed"] = round(time.perf_counter() - started, 4)
+        await self.research_sessions.aput(research_session)
+        await self._cache_session(research_session, kind)
+        yield {"event": "session_completed", "session_id": session_id, "session": research_session}
+    
+    def _session_stages(self, research_session: Dict[str, Any]) -> List[Stage]:
+        """The stage DAG for one session; handlers record their results on the session"""
+        async def search(query: str) -> List[Dict[str, Any]]:
+            search_results = await self.search_agent.process({"query": query, "max_results": self.max_results})
+            search_results = self._collapse_duplicates(research_session, search_results)
+            research_session["status"] = "search_completed"
+            research_session["results"]["search"] = search_results
+            return search_results.get("results", [])
+        
+        async def fetch(result: Dict[str, Any]) -> Dict[str, Any]:
+            await self.search_agent.fetch_pages([result])
+            return result
+        
+        async def analyze(result: Dict[str, Any]) -> Dict[str, Any]:
+            duplicate = result.get("duplicate")
+            if duplicate is not None:
+                reused = await self._reused_analysis(duplicate["duplicate_of"])
+                if reused is not None:
+                    return {"url": result["url"], "title": result["title"], "analysis": reused,
+                            "reused_from": duplicate["duplicate_of"]}
+            content = result.get("content") or f"{result['title']}: {result['snippet']}"
+            return {"url": result["url"], "title": result["title"],
+                    "analysis": await self._analyze_once(result["url"], content)}
+        
+        async def summarize(analyses: List[Dict[str, Any]]) -> Optional[str]:
+            if not analyses:
+                return None
+            return await self.gemini_tools.generate_summary(
+                "\n\n".join(f"{analysis['title']}: {analysis['analysis']}" for analysis in analyses)
+            )
+        
+        stages = [Stage("search", search, expand=True)]
+        upstream = "search"
+        if self.fetch_content:
+            stages.append(Stage("fetch", fetch, after=upstream, concurrency=self.fetch_concurrency))
+            upstream = "fetch"
+        if self.gemini_tools is not None:
+            stages.append(Stage("analyze", analyze, after=upstream, concurrency=self.analyze_concurrency))
+            stages.append(Stage("summarize", summarize, after="analyze", collect=True))
+        return stages
+    
+    def _cached_session(self, query: str, kind: str) -> Optional[Dict[str, Any]]:
+        """A finished session for a query with the same meaning, or None"""
+        if self.semantic_cache is None:
+            return None
+        hit = self.semantic_cache.lookup(query, kind)
+        if hit is None:
+            return None
+        self.logger.info(f"Reusing session for '{hit['cached_query']}' (similarity {hit['similarity']})")
+        return self._reused_session(hit)
+    
+    @staticmethod
+    def _reused_session(hit: Dict[str, Any]) -> Dict[str, Any]:
+        """A private copy of a cached session under a new id, pointing at the session it came from"""
+        session = copy.deepcopy(hit["session"])
+        session["reused_from"] = session["session_id"]
+        session["session_id"] = str(uuid.uuid4())[:8]
+        session["semantic_cache"] = {"similarity": hit["similarity"], "cached_query": hit["cached_query"]}
+        return session
+    
+    async def _cache_session(self, research_session: Dict[str, Any], kind: str):
+        if self.semantic_cache is None:
+            return
+        # A failed or empty search, or a failed analysis, is worth retrying rather than replaying.
+        # Duplicates are fine: they carry the analysis of the result they matched
+        results = research_session["results"]
+        search = results.get("search", {})
+        if search.get("error") or not search.get("results"):
+            return
+        analyses = [analysis["analysis"] for analysis in results.get("analyses", [])]
+        analyses += [results[stage] for stage in ("analysis", "summary") if isinstance(results.get(stage), str)]
+        if any(str(analysis).startswith("❌") for analysis in analyses):
+            return
+        await self.semantic_cache.aput(research_session["query"], research_session, kind)
+    
+    def _collapse_duplicates(self, research_session: Dict[str, Any],
+                             search_results: Dict[str, Any]) -> Dict[str, Any]:
+        """Mark results already seen in this or an earlier session; every result is kept.
+        
+        Local index hits are left alone: they are earlier sessions' results by construction.
+        """
+        if self.dedup_index is None or not search_results.get("results") or search_results.get("backend") == "local":
+            return search_results
+        results, duplicates = self.dedup_index.collapse(search_results["results"],
+                                                        owner=research_session["session_id"])
+        if duplicates:
+            research_session["results"]["duplicates"] = duplicates
+            self.logger.info(f"Marked {len(duplicates)} duplicate results for session "
+                             f"{research_session['session_id']}")
+        return {**search_results, "results": results}
+    
+    async def _analyze_once(self, url: str, content: str) -> str:
+        """Analyze a result, leaving the analysis for later duplicates of it to reuse"""
+        if self.dedup_index is None:
+            return await self.gemini_tools.analyze_content(content)
+        key = url[:300]  # DuplicateIndex reports matches by this prefix
+        waiter = asyncio.get_running_loop().create_future()
+        self._analyzing[key] = waiter
+        analysis = None
+        try:
+            analysis = await self.gemini_tools.analyze_content(content)
+        finally:
+            # On failure the waiting duplicates get None and analyze themselves
+            waiter.set_result(analysis)
+            if self._analyzing.get(key) is waiter:
+                del self._analyzing[key]
+        self._analyses[key] = analysis
+        self._analyses.move_to_end(key)
+        while len(self._analyses) > self.dedup_index.capacity:
+            self._analyses.popitem(last=False)
+        return analysis
+    
+    async def _reused_analysis(self, url: str) -> Optional[str]:
+        """The analysis of the result a duplicate matched, waiting for it if still running"""
+        analysis = self._analyses.get(url)
+        if analysis is not None:
+            self._analyses.move_to_end(url)
+            return analysis
+        waiter = self._analyzing.get(url)
+        if waiter is not None and waiter.get_loop() is asyncio.get_running_loop():
+            return await asyncio.shield(waiter)
+        return None
+    
+    async def iter_research(self, queries: List[str], max_concurrency: Optional[int] = None,
+                            priorities: Optional[List[int]] = None,
+                            deadline: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Run queries through a bounded scheduler, yielding outcomes in completion order"""
+        scheduler = ResearchScheduler(self.process, max_in_flight=max_concurrency, default_deadline=deadline)
+        for i, query in enumerate(queries):
+            scheduler.submit(query, priority=priorities[i] if priorities else 0)
+        
+        self.logger.info(f"Scheduling {len(queries)} topics, {scheduler.max_in_flight} at a time")
+        async for outcome in scheduler.as_completed():
+            yield outcome
+    
+    async def parallel_research(self, queries: List[str], max_concurrency: Optional[int] = None,
+                                priorities: Optional[List[int]] = None, deadline: Optional[float] = None,
+                                timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Conduct research on multiple topics in parallel.
+        
+        One failing query no longer discards the others: every query gets a
+        status, and when the overall timeout expires the unfinished ones are
+        cancelled and the partial results returned.
+        """
         self.logger.info(f"Starting parallel research for {len(queries)} topics")
         
-        tasks = [self.process(query) for query in queries]
-        results = await asyncio.gather(*tasks)
+        statuses = [None] * len(queries)
+        results = {}
+        
+        # Answer what the semantic cache can in one batched lookup; only the rest is scheduled
+        hits = ([None] * len(queries) if self.semantic_cache is None
+                else self.semantic_cache.lookup_many(queries, self.session_kind))
+        for i, hit in enumerate(hits):
+            if hit is not None:
+                session = self._reused_session(hit)
+                results[session["session_id"]] = session
+                statuses[i] = {"job_id": i, "query": queries[i], "priority": priorities[i] if priorities else 0,
+                               "status": "completed", "error": None, "elapsed": 0.0,
+                               "session_id": session["session_id"], "cached": True,
+                               "similarity": hit["similarity"]}
+        pending = [i for i, hit in enumerate(hits) if hit is None]
+        if len(pending) < len(queries):
+            self.logger.info(f"Semantic cache answered {len(queries) - len(pending)} of {len(queries)} topics")
+        
+        outcomes = self.iter_research([queries[i] for i in pending], max_concurrency,
+                                      [priorities[i] for i in pending] if priorities else None, deadline)
+        try:
+            async with asyncio.timeout(timeout):
+                async for outcome in outcomes:
+                    session = outcome.pop("result")
+                    if session is not None:
+                        results[session["session_id"]] = session
+                        outcome["session_id"] = session["session_id"]
+                    outcome["job_id"] = pending[outcome["job_id"]]
+                    statuses[outcome["job_id"]] = outcome
+        except TimeoutError:
+            self.logger.warning(f"Parallel research timed out after {timeout}s, returning partial results")
+        finally:
+            await outcomes.aclose()
+        
+        for i, query in enumerate(queries):
+            if statuses[i] is None:
+                statuses[i] = {"job_id": i, "query": query, "status": "cancelled", "error": "overall timeout"}
+        
+        completed = sum(1 for status in statuses if status["status"] == "completed")
+        self.logger.info(f"Parallel research finished: {completed}/{len(queries)} completed")
         
         return {
             "research_sessions": len(queries),
-            "results": {result["session_id"]: result for result in results}
-        }
\ No newline at end of file
+            "completed": completed,
+            "results": results,
+            "statuses": statuses
+        }
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Agent status plus session store statistics"""
+        status = super().get_status()
+        status["session_store"] = self.research_sessions.get_stats()
+        status["search_agent"] = self.search_agent.get_status()
+        if self.dedup_index is not None:
+            status["dedup_index"] = self.dedup_index.get_stats()
+        if self.semantic_cache is not None:
+            status["semantic_cache"] = self.semantic_cache.get_stats()
+        return status
\ No newline at end of file
@@ -0,0 +1,133 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from tools.tracing import tracer
+
+# Final job statuses reported by ResearchScheduler
+COMPLETED = "completed"
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+CANCELLED = "cancelled"
+
+
+class ResearchScheduler:
+    """Runs research jobs with a bounded number in flight, priorities and per-job deadlines.
+
+    Higher priority values run first; equal priorities run in submission
+    order. Outcomes are yielded by as_completed() as soon as each job ends,
+    and a failing, timed-out or cancelled job never affects the others.
+    """
+
+    def __init__(self, worker: Callable[[str], Awaitable[Any]], max_in_flight: Optional[int] = None,
+                 default_deadline: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.worker = worker
+        self.max_in_flight = int(max_in_flight or os.getenv("MAX_PARALLEL_SESSIONS", 8))
+        deadline = default_deadline if default_deadline is not None else os.getenv("SESSION_DEADLINE")
+        self.default_deadline = float(deadline) if deadline else None
+        self.jobs: Dict[int, Dict[str, Any]] = {}
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._running: Dict[int, asyncio.Future] = {}
+        self._outcomes: asyncio.Queue = asyncio.Queue()
+
+    def submit(self, query: str, priority: int = 0, deadline: Optional[float] = None) -> int:
+        """Queue a query and return its job id"""
+        job_id = next(self._seq)
+        self.jobs[job_id] = {
+            "job_id": job_id,
+            "query": query,
+            "priority": priority,
+            "deadline": deadline if deadline is not None else self.default_deadline,
+            "status": "pending",
+            "submitted_at": time.perf_counter()
+        }
+        heapq.heappush(self._heap, (-priority, job_id))
+        return job_id
+
+    def cancel(self, job_id: Optional[int] = None):
+        """Cancel one job, or every unfinished job when job_id is None"""
+        job_ids = [job_id] if job_id is not None else list(self.jobs)
+        for jid in job_ids:
+            job = self.jobs[jid]
+            if job["status"] == "pending":
+                self._report(job, CANCELLED)
+            elif job["status"] == "running":
+                job["status"] = "cancelling"
+                self._running[jid].cancel()
+
+    def _report(self, job: Dict[str, Any], status: str, result: Any = None,
+                error: Optional[str] = None, elapsed: Optional[float] = None):
+        job["status"] = status
+        self._outcomes.put_nowait({
+            "job_id": job["job_id"],
+            "query": job["query"],
+            "priority": job["priority"],
+            "status": status,
+            "result": result,
+            "error": error,
+            "elapsed": round(elapsed, 4) if elapsed is not None else None
+        })
+
+    async def _run_jobs(self):
+        loop = asyncio.get_running_loop()
+        while self._heap:
+            _, job_id = heapq.heappop(self._heap)
+            job = self.jobs[job_id]
+            if job["status"] != "pending":
+                continue
+
+            job["status"] = "running"
+            tracer.observe("scheduler.queue_wait", time.perf_counter() - job["submitted_at"], kind="queue")
+            started = loop.time()
+            task = asyncio.ensure_future(self.worker(job["query"]))
+            self._running[job_id] = task
+            try:
+                if job["deadline"]:
+                    result = await asyncio.wait_for(task, job["deadline"])
+                else:
+                    result = await task
+                self._report(job, COMPLETED, result=result, elapsed=loop.time() - started)
+            except asyncio.TimeoutError:
+                self._report(job, TIMED_OUT, error=f"deadline of {job['deadline']}s exceeded",
+                             elapsed=loop.time() - started)
+            except asyncio.CancelledError:
+                if job["status"] != "cancelling":
+                    raise
+                self._report(job, CANCELLED, elapsed=loop.time() - started)
+            except Exception as e:
+                self.logger.error(f"Research job {job_id} failed: {e}")
+                self._report(job, FAILED, error=str(e), elapsed=loop.time() - started)
+            finally:
+                self._running.pop(job_id, None)
+
+    async def as_completed(self) -> AsyncIterator[Dict[str, Any]]:
+        """Run every submitted job and yield outcomes in completion order"""
+        runners = [asyncio.ensure_future(self._run_jobs())
+                   for _ in range(min(self.max_in_flight, len(self._heap)) or 1)]
+        yielded = 0
+        try:
+            while yielded < len(self.jobs):
+                yield await self._outcomes.get()
+                yielded += 1
+        finally:
+            # Stopping early (or being cancelled) abandons whatever is left
+            for job in self.jobs.values():
+                if job["status"] == "pending":
+                    job["status"] = CANCELLED
+            for task in list(self._running.values()):
+                task.cancel()
+            for runner in runners:
+                runner.cancel()
+            await asyncio.gather(*runners, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Count jobs by status"""
+        stats: Dict[str, int] = {}
+        for job in self.jobs.values():
+            stats[job["status"]] = stats.get(job["status"], 0) + 1
+        return stats
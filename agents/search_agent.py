@@ -1,32 +1,59 @@
 from .base_agent import BaseAgent
-from typing import Dict, List, Any
+from tools.bm25_index import BM25Index, get_local_index
+from tools.search_backends import SearchBackend, SimulatedSearchBackend, create_search_backend
+from tools.tracing import tracer
+from typing import Dict, List, Any, Optional
 import asyncio
-import requests
-from bs4 import BeautifulSoup
 import logging
+import os
+from collections import deque
 
 class SearchAgent(BaseAgent):
     """Agent responsible for searching and gathering information from the web"""
     
-    def __init__(self):
+    def __init__(self, backend: Optional[SearchBackend] = None, local_index: Optional[BM25Index] = None):
         super().__init__("search_agent")
-        self.search_history = []
+        # Only the most recent searches are kept; the orchestrator's session store holds the rest
+        self.search_history = deque(maxlen=int(os.getenv("SEARCH_HISTORY_LIMIT", 100)))
+        self.backend = backend or create_search_backend()
+        # Results of earlier searches, queried before the web; the web is only used when too few
+        # local results contain at least local_min_coverage of the query's terms
+        if local_index is None and os.getenv("LOCAL_INDEX_ENABLED", "false").lower() in ("1", "true", "yes"):
+            local_index = get_local_index()
+        self.local_index = local_index
+        self.local_min_coverage = float(os.getenv("LOCAL_INDEX_MIN_COVERAGE", 0.75))
+        self.local_stats = {"local_hits": 0, "web_searches": 0}
+        # Index updates run in the background; close() waits for them before the final snapshot
+        self._index_updates = set()
     
     async def process(self, search_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process search requests"""
         query = search_data.get("query", "")
         max_results = search_data.get("max_results", 3)
+        fetch_content = search_data.get("fetch_content", False)
         
         self.logger.info(f"Searching for: {query}")
         
         try:
-            # Simulate web search (we'll implement real search next)
-            search_results = await self.simulate_web_search(query, max_results)
+            search_results = await self.search_local(query, max_results)
+            local = search_results is not None
+            if not local:
+                with tracer.span("search_backend.search", "io", backend=self.backend.name):
+                    search_results = await self.backend.search(query, max_results)
+            
+            if fetch_content:
+                await self.fetch_pages(search_results)
+            if not local and self.local_index is not None and search_results:
+                # Appends may flush, merge or snapshot the index; the session does not wait for that
+                update = asyncio.ensure_future(self.remember([dict(result) for result in search_results]))
+                self._index_updates.add(update)
+                update.add_done_callback(self._index_updates.discard)
             
             result = {
                 "query": query,
                 "results": search_results,
                 "total_found": len(search_results),
+                "backend": "local" if local else self.backend.name,
                 "search_agent_id": self.agent_id
             }
             
@@ -44,33 +71,73 @@ class SearchAgent(BaseAgent):
                 "search_agent_id": self.agent_id
             }
     
-    async def simulate_web_search(self, query: str, max_results: int) -> List[Dict[str, str]]:
-        """Simulate web search results (will replace with real search)"""
-        await asyncio.sleep(0.2)  # Simulate search time
-        
-        # Simulated search results for our climate change topic
-        simulated_results = [
-            {
-                "title": "AI Applications in Climate Change Mitigation",
-                "url": "https://example.com/ai-climate-1",
-                "snippet": "Artificial intelligence is being used to optimize renewable energy systems and predict climate patterns with unprecedented accuracy.",
-                "source": "simulated"
-            },
-            {
-                "title": "Machine Learning for Carbon Emission Reduction",
-                "url": "https://example.com/ai-climate-2", 
-                "snippet": "Recent studies show ML algorithms can reduce industrial carbon emissions by up to 30% through optimized processes.",
-                "source": "simulated"
-            },
-            {
-                "title": "AI in Climate Modeling and Prediction",
-                "url": "https://example.com/ai-climate-3",
-                "snippet": "Advanced neural networks are improving climate model accuracy, helping policymakers make better decisions.",
-                "source": "simulated"
-            }
+    async def search_local(self, query: str, max_results: int) -> Optional[List[Dict[str, Any]]]:
+        """Top results from the local index, or None when they would not be good enough"""
+        if self.local_index is None or max_results <= 0:
+            return None
+        with tracer.span("local_index.search", "tool", documents=len(self.local_index)):
+            # In a worker thread: a search waits for a concurrent append's buffer update
+            hits = await asyncio.to_thread(self.local_index.search, query, max_results)
+        if len(hits) < max_results or hits[-1]["coverage"] < self.local_min_coverage:
+            self.local_stats["web_searches"] += 1
+            return None
+        self.local_stats["local_hits"] += 1
+        return [
+            {"title": hit["title"], "url": hit["url"], "snippet": hit["snippet"], "source": hit["source"],
+             "local_score": hit["score"]}
+            for hit in hits
         ]
-        
-        return simulated_results[:max_results]
+    
+    async def remember(self, search_results: List[Dict[str, Any]]):
+        """Add web results (with any fetched content) to the local index, in a worker thread"""
+        if self.local_index is None or not search_results:
+            return
+        try:
+            await asyncio.to_thread(self.local_index.add, search_results)
+        except OSError as e:
+            self.logger.warning(f"Local index update failed: {e}")
+    
+    async def simulate_web_search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        """Simulate web search results (kept for callers that want the offline results)"""
+        return await SimulatedSearchBackend().search(query, max_results)
+    
+    async def fetch_pages(self, search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fetch every result page concurrently and attach the extracted text"""
+        pages = await asyncio.gather(
+            *(self.backend.fetch(result["url"]) for result in search_results),
+            return_exceptions=True
+        )
+        for result, page in zip(search_results, pages):
+            if isinstance(page, BaseException):  # Including a cancelled fetch
+                result["fetch_error"] = str(page) or type(page).__name__
+            elif page.get("error"):
+                result["fetch_error"] = page["error"]
+            else:
+                result["content"] = page["text"]
+                result["content_truncated"] = page.get("truncated", False)
+        return search_results
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Agent status plus page store statistics when the backend keeps one"""
+        status = super().get_status()
+        status["backend"] = self.backend.name
+        page_store = getattr(self.backend, "page_store", None)
+        if page_store is not None:
+            status["page_store"] = page_store.get_stats()
+        if self.local_index is not None:
+            status["local_index"] = {**self.local_index.get_stats(), **self.local_stats}
+        return status
+    
+    async def close(self):
+        """Close the search backend's pooled connections and snapshot the local index"""
+        await self.backend.close()
+        if self.local_index is not None:
+            if self._index_updates:
+                await asyncio.gather(*self._index_updates, return_exceptions=True)
+            try:
+                await asyncio.to_thread(self.local_index.save)
+            except OSError as e:
+                self.logger.warning(f"Local index snapshot failed: {e}")
     
     async def parallel_searches(self, queries: List[str]) -> Dict[str, Any]:
         """Perform multiple searches in parallel"""
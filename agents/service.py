@@ -0,0 +1,281 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from .research_orchestrator import ResearchOrchestrator
+from tools.gemini_tools import GeminiTools
+
+FINISHED = ("completed", "failed", "cancelled")
+
+
+class ServiceOverloaded(Exception):
+    """Raised when a submission would exceed the service's admission limits"""
+
+
+class ResearchJob:
+    """One submitted query: its status, the events streamed so far and the finished session"""
+
+    def __init__(self, query: str):
+        self.job_id = str(uuid.uuid4())[:12]
+        self.query = query
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.session: Optional[Dict[str, Any]] = None
+        self.events: List[Dict[str, Any]] = []
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def add_event(self, event: Dict[str, Any]):
+        self.events.append(event)
+        self.notify()
+
+    def notify(self):
+        """Wake everything waiting for this job to change"""
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_for_change(self):
+        await self._changed.wait()
+
+    def to_dict(self, include_session: bool = True) -> Dict[str, Any]:
+        job = {
+            "job_id": self.job_id,
+            "query": self.query,
+            "status": self.status,
+            "error": self.error,
+            "events": len(self.events),
+            "submitted_at": self.submitted_at,
+            "queue_wait": round((self.started_at or time.time()) - self.submitted_at, 4),
+            "elapsed": round(self.finished_at - self.started_at, 4) if self.finished_at and self.started_at else None,
+            "poll": f"/research/{self.job_id}",
+            "stream": f"/research/{self.job_id}/stream"
+        }
+        if include_session and self.session is not None:
+            job["session"] = self.session
+        return job
+
+
+class ResearchService:
+    """Long-running local HTTP service around one warm ResearchOrchestrator.
+
+    The orchestrator, its GeminiTools (model already probed) and the search
+    backend's connection pool are created once and shared by every request.
+    Endpoints:
+
+        POST   /research              {"query": ..., "wait": false} -> 202 job
+        GET    /research/{id}         poll a job (session included once done)
+        GET    /research/{id}/stream  NDJSON session events, replayed then live
+        DELETE /research/{id}         cancel a job
+        GET    /status                service, orchestrator and Gemini status
+
+    Admission control: at most max_in_flight sessions run at once and
+    max_queued wait behind them; anything beyond is rejected immediately
+    with 503 and Retry-After rather than queued without bound.
+    """
+
+    def __init__(self, orchestrator: Optional[ResearchOrchestrator] = None,
+                 gemini_tools: Optional[GeminiTools] = None, max_in_flight: Optional[int] = None,
+                 max_queued: Optional[int] = None, max_jobs: Optional[int] = None,
+                 job_timeout: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        if orchestrator is None:
+            gemini_tools = gemini_tools or GeminiTools()
+            orchestrator = ResearchOrchestrator(gemini_tools=gemini_tools)
+        self.orchestrator = orchestrator
+        self.gemini_tools = gemini_tools or orchestrator.gemini_tools
+        self.max_in_flight = int(max_in_flight or os.getenv("SERVICE_MAX_IN_FLIGHT", 64))
+        self.max_queued = int(max_queued if max_queued is not None else os.getenv("SERVICE_MAX_QUEUED", 256))
+        # Finished jobs kept for polling; the oldest are forgotten first
+        self.max_jobs = int(max_jobs or os.getenv("SERVICE_MAX_JOBS", 10000))
+        job_timeout = job_timeout if job_timeout is not None else os.getenv("SESSION_DEADLINE")
+        self.job_timeout = float(job_timeout) if job_timeout else None
+        self.jobs: "OrderedDict[str, ResearchJob]" = OrderedDict()
+        self.stats = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0, "cancelled": 0}
+        self.running = 0
+        self.queued = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._runner: Optional[web.AppRunner] = None
+        self.started_at: Optional[float] = None
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/research", self.handle_submit)
+        app.router.add_get("/research/{job_id}", self.handle_poll)
+        app.router.add_get("/research/{job_id}/stream", self.handle_stream)
+        app.router.add_delete("/research/{job_id}", self.handle_cancel)
+        app.router.add_get("/status", self.handle_status)
+        return app
+
+    async def start(self, host: Optional[str] = None, port: Optional[int] = None) -> str:
+        """Warm the components, start listening and return the base URL"""
+        host = host or os.getenv("SERVICE_HOST", "127.0.0.1")
+        port = int(port if port is not None else os.getenv("SERVICE_PORT", 8080))
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        if self.gemini_tools is not None:
+            await self.gemini_tools.ensure_initialized()
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.started_at = time.time()
+        self.logger.info(f"Research service listening on http://{host}:{port}")
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        """Cancel unfinished jobs, stop listening and release pooled connections"""
+        tasks = [job.task for job in self.jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        await self.orchestrator.search_agent.close()
+
+    def submit(self, query: str) -> ResearchJob:
+        """Admit a query and start it, or raise ServiceOverloaded"""
+        if self.running + self.queued >= self.max_in_flight + self.max_queued:
+            self.stats["rejected"] += 1
+            raise ServiceOverloaded(f"{self.running} sessions running and {self.queued} queued")
+        job = ResearchJob(query)
+        self.jobs[job.job_id] = job
+        self.stats["submitted"] += 1
+        self.queued += 1
+        job.task = asyncio.ensure_future(self._run(job))
+        self._forget_old_jobs()
+        return job
+
+    def _forget_old_jobs(self):
+        while len(self.jobs) > self.max_jobs:
+            oldest = next((job_id for job_id, job in self.jobs.items() if job.finished), None)
+            if oldest is None:
+                break
+            del self.jobs[oldest]
+
+    async def _run(self, job: ResearchJob):
+        try:
+            async with self._slots:
+                self.queued -= 1
+                self.running += 1
+                job.status = "running"
+                job.started_at = time.time()
+                job.notify()
+                try:
+                    async with asyncio.timeout(self.job_timeout):
+                        async for event in self.orchestrator.process_stream(job.query):
+                            if event["event"] == "session_completed":
+                                job.session = event["session"]
+                            job.add_event(event)
+                    job.status = "completed"
+                except TimeoutError:
+                    job.status = "failed"
+                    job.error = f"deadline of {self.job_timeout}s exceeded"
+                except Exception as e:
+                    self.logger.error(f"Research job {job.job_id} failed: {e}")
+                    job.status = "failed"
+                    job.error = f"{type(e).__name__}: {e}"[:500]
+                finally:
+                    self.running -= 1
+        except asyncio.CancelledError:
+            if job.started_at is None:
+                self.queued -= 1
+            job.status = "cancelled"
+            job.error = "cancelled"
+        finally:
+            job.finished_at = time.time()
+            self.stats[job.status] += 1
+            job.notify()
+
+    def _job_or_404(self, request: web.Request) -> ResearchJob:
+        job = self.jobs.get(request.match_info["job_id"])
+        if job is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": "unknown job"}), content_type="application/json")
+        return job
+
+    async def handle_submit(self, request: web.Request) -> web.Response:
+        try:
+            payload = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return web.json_response({"error": "body must be JSON"}, status=400)
+        query = payload.get("query") if isinstance(payload, dict) else None
+        if not isinstance(query, str) or not query.strip():
+            return web.json_response({"error": "'query' must be a non-empty string"}, status=400)
+        try:
+            job = self.submit(query.strip())
+        except ServiceOverloaded as e:
+            return web.json_response({"error": f"overloaded: {e}"}, status=503, headers={"Retry-After": "1"})
+        if payload.get("wait"):
+            await asyncio.shield(job.task)
+            return web.json_response(job.to_dict(), dumps=_dumps)
+        return web.json_response(job.to_dict(), status=202, dumps=_dumps)
+
+    async def handle_poll(self, request: web.Request) -> web.Response:
+        return web.json_response(self._job_or_404(request).to_dict(), dumps=_dumps)
+
+    async def handle_stream(self, request: web.Request) -> web.StreamResponse:
+        job = self._job_or_404(request)
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        sent = 0
+        await response.write(_line({"event": "job_status", "job_id": job.job_id, "status": job.status}))
+        while True:
+            while sent < len(job.events):
+                await response.write(_line(job.events[sent]))
+                sent += 1
+            if job.finished:
+                break
+            # Nothing awaits between the checks above and this wait, so no change is missed
+            await job.wait_for_change()
+        await response.write(_line({"event": "job_finished", **job.to_dict(include_session=False)}))
+        await response.write_eof()
+        return response
+
+    async def handle_cancel(self, request: web.Request) -> web.Response:
+        job = self._job_or_404(request)
+        if not job.finished and job.task is not None:
+            job.task.cancel()
+            await asyncio.gather(job.task, return_exceptions=True)
+        return web.json_response(job.to_dict(include_session=False), dumps=_dumps)
+
+    async def handle_status(self, request: web.Request) -> web.Response:
+        return web.json_response(self.get_status(), dumps=_dumps)
+
+    def get_status(self) -> Dict[str, Any]:
+        status = {
+            "service": {
+                "uptime": round(time.time() - self.started_at, 1) if self.started_at else 0.0,
+                "running": self.running,
+                "queued": self.queued,
+                "max_in_flight": self.max_in_flight,
+                "max_queued": self.max_queued,
+                "jobs_retained": len(self.jobs),
+                **self.stats
+            },
+            "orchestrator": self.orchestrator.get_status()
+        }
+        if self.gemini_tools is not None:
+            status["gemini"] = self.gemini_tools.get_status()
+        return status
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=str)
+
+
+def _line(event: Dict[str, Any]) -> bytes:
+    return (_dumps(event) + "\n").encode("utf-8")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Batched analysis benchmark: analyze_content per snippet vs analyze_content_batch.
+
+Uses a fake Gemini backend whose latency is a fixed round trip plus a small
+per-token cost, so packing saves round trips but not prompt processing.
+
+    python -m benchmarks.batch_analysis --sizes 10 50 100 500
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.fakes import FakeGenAI
+from tools.gemini_tools import GeminiTools
+from tools.model_selection import ModelSelectionCache
+from tools.rate_limiter import RateLimiter
+from tools.response_cache import ResponseCache
+
+
+def snippets(count: int):
+    return [f"Snippet {i}: machine learning improves renewable energy forecasting "
+            f"and grid balancing in region {i % 17}." * 3 for i in range(count)]
+
+
+async def measure(mode: str, count: int, args, cache_dir: str) -> dict:
+    backend = FakeGenAI(["models/gemini-2.5-flash"], latency=args.latency,
+                        per_token_latency=args.per_token_latency, batch_drop_every=args.drop_every)
+    tools = GeminiTools(genai_backend=backend,
+                        model_cache=ModelSelectionCache(path=os.path.join(cache_dir, "models.json")),
+                        response_cache=ResponseCache(use_disk=False),
+                        rate_limiter=RateLimiter(requests_per_minute=args.rpm, max_retries=0))
+    await tools.ensure_initialized()
+    calls_before = backend.calls
+    documents = snippets(count)
+
+    started = time.perf_counter()
+    if mode == "single":
+        await asyncio.gather(*(tools.analyze_content(doc) for doc in documents))
+    else:
+        await tools.analyze_content_batch(documents, token_budget=args.token_budget)
+    elapsed = time.perf_counter() - started
+
+    return {"mode": mode, "snippets": count, "round_trips": backend.calls - calls_before,
+            "seconds": round(elapsed, 3)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 500])
+    parser.add_argument("--latency", type=float, default=0.4, help="fixed round-trip latency (s)")
+    parser.add_argument("--per-token-latency", type=float, default=0.00002)
+    parser.add_argument("--rpm", type=float, default=600, help="request rate allowed by the limiter")
+    parser.add_argument("--token-budget", type=int, default=8000)
+    parser.add_argument("--drop-every", type=int, default=0, help="drop every nth batched answer")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-api-key")
+
+    report = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.sizes:
+            for mode in ("single", "batch"):
+                report.append(await measure(mode, count, args, tmp))
+                print(json.dumps(report[-1]))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Local BM25 index at 100k to 10M documents.
+
+Builds one index incrementally from synthetic search results (Zipf-distributed
+vocabulary, title plus snippet) and, at each size checkpoint, measures:
+
+- append throughput up to that size,
+- query latency (p50/p99) for top-k over 2-3 term queries,
+- that freshly appended documents are searchable at once,
+- snapshot and reload time and the size of the postings.
+
+    python -m benchmarks.bm25_index --sizes 100000,1000000,10000000 --queries 500
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.load_test import percentile
+from tools.bm25_index import BM25Index
+
+SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "ta", "vo", "shi", "pra", "den", "gol", "ter", "bix", "qua", "zem", "ul")
+
+
+def vocabulary(size: int, rng: np.random.Generator) -> List[str]:
+    """Distinct pseudo-words of 2-5 syllables"""
+    words, seen = [], set()
+    while len(words) < size:
+        word = "".join(SYLLABLES[i] for i in rng.integers(0, len(SYLLABLES), rng.integers(2, 6)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+class Corpus:
+    """Synthetic search results whose words follow a Zipf distribution"""
+
+    def __init__(self, vocab_size: int, words_per_doc: int, seed: int):
+        self.rng = np.random.default_rng(seed)
+        self.words = np.array(vocabulary(vocab_size, self.rng), dtype=object)
+        weights = 1.0 / np.arange(1, vocab_size + 1) ** 1.05
+        self.cumulative = np.cumsum(weights / weights.sum())
+        self.words_per_doc = words_per_doc
+
+    def sample(self, count: int) -> np.ndarray:
+        return np.minimum(np.searchsorted(self.cumulative, self.rng.random(count)), len(self.words) - 1)
+
+    def documents(self, start: int, count: int) -> List[Dict[str, str]]:
+        picked = self.words[self.sample(count * self.words_per_doc)].reshape(count, self.words_per_doc)
+        title_words = min(6, self.words_per_doc // 3)
+        return [{"title": " ".join(row[:title_words]), "snippet": " ".join(row[title_words:]),
+                 "url": f"https://example.com/doc/{start + i}", "source": "benchmark"}
+                for i, row in enumerate(picked)]
+
+    def queries(self, count: int) -> List[str]:
+        # Mid-frequency terms, like the topical words of a research query
+        low, high = 50, min(len(self.words), 20000)
+        picked = self.rng.integers(low, high, (count, 3))
+        lengths = self.rng.integers(2, 4, count)
+        return [" ".join(self.words[row[:length]]) for row, length in zip(picked, lengths)]
+
+
+def measure_queries(index: BM25Index, queries: List[str], k: int) -> Dict:
+    latencies = []
+    hits = 0
+    for query in queries:
+        started = time.perf_counter()
+        results = index.search(query, k)
+        latencies.append(time.perf_counter() - started)
+        hits += bool(results)
+    return {
+        "query_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "query_p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "queries_with_results": hits
+    }
+
+
+def measure_appends(index: BM25Index, count: int) -> Dict:
+    """Append documents one at a time, each searchable by a unique token right after"""
+    latencies = []
+    found = 0
+    for i in range(count):
+        token = f"freshtoken{index.doc_count}x{i}"
+        started = time.perf_counter()
+        index.add([{"title": f"{token} appended result", "snippet": "appended after the checkpoint",
+                    "url": f"https://example.com/fresh/{index.doc_count}/{i}"}])
+        latencies.append(time.perf_counter() - started)
+        results = index.search(token, 1)
+        found += bool(results) and token in results[0]["title"]
+    return {"append_p50_us": round(percentile(latencies, 50) * 1e6, 1),
+            "append_p99_us": round(percentile(latencies, 99) * 1e6, 1),
+            "appends_searchable": f"{found}/{count}"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="100000,1000000", help="comma-separated document counts")
+    parser.add_argument("--vocab", type=int, default=200000)
+    parser.add_argument("--words-per-doc", type=int, default=24)
+    parser.add_argument("--batch", type=int, default=10000, help="documents per add() call while building")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--appends", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    corpus = Corpus(args.vocab, args.words_per_doc, args.seed)
+    queries = corpus.queries(args.queries)
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "index")
+        index = BM25Index(root=root, snapshot_every=0)
+        build_seconds = 0.0
+        for size in sizes:
+            started = time.perf_counter()
+            while index.doc_count < size:
+                index.add(corpus.documents(index.doc_count, min(args.batch, size - index.doc_count)))
+            build_seconds += time.perf_counter() - started
+            checkpoint = {
+                "build_seconds": round(build_seconds, 1),
+                "docs_per_second": round(index.doc_count / build_seconds),
+                **measure_queries(index, queries, args.k),
+                **measure_appends(index, args.appends)
+            }
+            started = time.perf_counter()
+            index.save()
+            checkpoint["snapshot_seconds"] = round(time.perf_counter() - started, 2)
+            stats = index.get_stats()
+            checkpoint.update({
+                "documents": stats["documents"],
+                "terms": stats["terms"],
+                "segments": stats["segments"],
+                "postings": stats["postings"],
+                "postings_mb": round(stats["postings_bytes"] / 1024 / 1024, 1)
+            })
+            index.close()
+            started = time.perf_counter()
+            index = BM25Index(root=root, snapshot_every=0)
+            checkpoint["load_seconds"] = round(time.perf_counter() - started, 2)
+            checkpoint.update({f"reloaded_{key}": value
+                               for key, value in measure_queries(index, queries, args.k).items()})
+            report[str(size)] = checkpoint
+            print(json.dumps({size: checkpoint}), flush=True)
+        index.close()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "bm25_index", "config": vars(args), **report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
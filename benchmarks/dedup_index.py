@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate index benchmark.
+
+Fills a DuplicateIndex with synthetic snippets, then measures signature
+throughput, lookup latency (p50/p99) and how many edited copies are caught
+versus unrelated documents wrongly flagged.
+
+    python -m benchmarks.dedup_index --docs 1000000 --probes 2000
+"""
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks.load_test import percentile
+from tools.dedup_index import DuplicateIndex
+
+VOCABULARY_SIZE = 20000
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    return " ".join(f"w{rng.randrange(VOCABULARY_SIZE)}" for _ in range(words))
+
+
+def edit_text(rng: random.Random, text: str, edits: int) -> str:
+    """Replace a few words, like a re-syndicated or lightly edited article"""
+    tokens = text.split()
+    for _ in range(edits):
+        tokens[rng.randrange(len(tokens))] = f"w{rng.randrange(VOCABULARY_SIZE)}"
+    return " ".join(tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--words", type=int, default=40, help="words per synthetic snippet")
+    parser.add_argument("--edits", type=int, default=2, help="words changed in each near-duplicate probe")
+    parser.add_argument("--probes", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=1000, help="documents per signatures() call")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = DuplicateIndex(capacity=args.docs, threshold=args.threshold)
+    kept_texts = []
+
+    signature_seconds = add_seconds = 0.0
+    probe_every = max(1, args.docs // args.probes)
+    for start in range(0, args.docs, args.batch):
+        texts = [make_text(rng, args.words) for _ in range(min(args.batch, args.docs - start))]
+        started = time.perf_counter()
+        signatures = index.signatures(texts)
+        signature_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        for i, signature in enumerate(signatures, start):
+            index.add(signature, f"https://example.com/doc/{i}", owner=i)
+        add_seconds += time.perf_counter() - started
+        kept_texts.extend(text for i, text in enumerate(texts, start) if i % probe_every == 0)
+
+    def probe(texts):
+        latencies, hits = [], 0
+        for text in texts:
+            signature = index.signature(text)
+            started = time.perf_counter()
+            match = index.lookup(signature)
+            latencies.append((time.perf_counter() - started) * 1e6)
+            hits += match is not None
+        return latencies, hits
+
+    near_latencies, caught = probe([edit_text(rng, text, args.edits) for text in kept_texts[:args.probes]])
+    fresh_latencies, false_hits = probe([make_text(rng, args.words) for _ in range(args.probes)])
+    latencies = near_latencies + fresh_latencies
+
+    results = {
+        "benchmark": "dedup_index",
+        "docs": args.docs,
+        "batch": args.batch,
+        "words": args.words,
+        "edits": args.edits,
+        "threshold": args.threshold,
+        "signatures_per_second": round(args.docs / signature_seconds),
+        "inserts_per_second": round(args.docs / add_seconds),
+        "lookup_p50_us": round(percentile(latencies, 50), 1),
+        "lookup_p99_us": round(percentile(latencies, 99), 1),
+        "lookup_max_us": round(max(latencies), 1),
+        "near_duplicate_recall": round(caught / len(near_latencies), 4),
+        "false_positive_rate": round(false_hits / len(fresh_latencies), 4),
+        "table_mb": round(index.get_stats()["table_bytes"] / 1e6, 1)
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Fake backends so the benchmarks run offline and deterministically"""
+
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional
+
+from tools.search_backends import SearchBackend
+
+
+class LatencyModel:
+    """Seeded log-normal latency: median seconds, spread sigma (0 means constant)"""
+
+    def __init__(self, median: float, sigma: float = 0.0, rng: Optional[random.Random] = None):
+        self.median = median
+        self.sigma = sigma
+        self.rng = rng or random.Random(0)
+
+    def sample(self) -> float:
+        if not self.sigma:
+            return self.median
+        return self.median * math.exp(self.rng.gauss(0.0, self.sigma))
+
+
+class FakeResponse:
+    """Mimics the parts of a genai response the tools read"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+BATCH_DOC_PATTERN = re.compile(r"<<<DOC (\d+)>>>")
+
+
+class FakeQuotaError(Exception):
+    """Shaped like the 429 errors the real API raises"""
+
+    code = 429
+
+
+class FakeStream:
+    """Async-iterable streamed response, like generate_content_async(stream=True)"""
+
+    def __init__(self, text: str, chunks: int, chunk_delay: float):
+        size = max(1, len(text) // chunks + 1)
+        self.pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        self.chunk_delay = chunk_delay
+
+    async def __aiter__(self):
+        for i, piece in enumerate(self.pieces):
+            if i:
+                await asyncio.sleep(self.chunk_delay)
+            yield FakeResponse(piece)
+
+
+class FakeModel:
+    """Stand-in for genai.GenerativeModel"""
+
+    def __init__(self, backend: "FakeGenAI", model_name: str):
+        self.backend = backend
+        self.model_name = model_name
+
+    def _respond(self, prompt: str) -> FakeResponse:
+        self.backend.calls += 1
+        self.backend.check_throttle()
+        if self.model_name in self.backend.failing_models:
+            raise RuntimeError(f"404 {self.model_name} is not available in your region")
+        if self.backend.error_rate and self.backend.rng.random() < self.backend.error_rate:
+            self.backend.injected_errors += 1
+            raise RuntimeError("500 internal error (injected by FakeGenAI)")
+        doc_ids = BATCH_DOC_PATTERN.findall(str(prompt))
+        if doc_ids:
+            # Answer batched prompts the way the batch format asks for
+            dropped = set(doc_ids[::self.backend.batch_drop_every]) if self.backend.batch_drop_every else set()
+            return FakeResponse(json.dumps([
+                {"id": int(doc_id), "analysis": f"[{self.model_name}] analysis of document {doc_id}"}
+                for doc_id in doc_ids if doc_id not in dropped
+            ]))
+        text = f"[{self.model_name}] response to: {str(prompt)[:40]}"
+        if self.backend.response_chars:
+            text = (text + " lorem ipsum") * (self.backend.response_chars // (len(text) + 12) + 1)
+            text = text[:self.backend.response_chars]
+        return FakeResponse(text)
+
+    def _latency(self, prompt) -> float:
+        latency_model = self.backend.model_latency.get(self.model_name, self.backend.latency_model)
+        return latency_model.sample() + self.backend.per_token_latency * len(str(prompt)) / 4
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        if stream:
+            # The request is accepted after one chunk interval; the body trickles in
+            chunk_delay = self._latency(prompt) / self.backend.stream_chunks
+            await asyncio.sleep(chunk_delay)
+            return FakeStream(self._respond(prompt).text, self.backend.stream_chunks, chunk_delay)
+        await asyncio.sleep(self._latency(prompt))
+        return self._respond(prompt)
+
+    def generate_content(self, prompt, **kwargs) -> FakeResponse:
+        time.sleep(self._latency(prompt))
+        return self._respond(prompt)
+
+
+class FakeGenAI:
+    """Stand-in for the google.generativeai module"""
+
+    def __init__(self, models: Iterable[str], failing_models: Optional[Iterable[str]] = None,
+                 latency: float = 0.3, list_latency: float = 0.2,
+                 throttle_per_second: Optional[int] = None, retry_after: float = 0.5,
+                 stream_chunks: int = 10, per_token_latency: float = 0.0, batch_drop_every: int = 0,
+                 latency_sigma: float = 0.0, error_rate: float = 0.0, response_chars: int = 0,
+                 model_latency: Optional[Dict[str, float]] = None, seed: int = 0):
+        self.models = list(models)
+        self.failing_models = set(failing_models or [])
+        self.latency = latency
+        self.list_latency = list_latency
+        self.throttle_per_second = throttle_per_second
+        self.retry_after = retry_after
+        self.stream_chunks = stream_chunks
+        # Prompt processing cost, so large prompts are slower than small ones
+        self.per_token_latency = per_token_latency
+        # Omit every nth document from batched answers to exercise the fallback path
+        self.batch_drop_every = batch_drop_every
+        self.rng = random.Random(seed)
+        self.latency_model = LatencyModel(latency, latency_sigma, self.rng)
+        # Median latency per model name, for models that should be faster or slower than the rest
+        self.model_latency = {name: LatencyModel(median, latency_sigma, self.rng)
+                              for name, median in (model_latency or {}).items()}
+        self.error_rate = error_rate
+        self.response_chars = response_chars
+        self.calls = 0
+        self.throttled = 0
+        self.injected_errors = 0
+        self._accepted = deque()
+
+    def check_throttle(self):
+        """Reject calls beyond throttle_per_second in a sliding one-second window"""
+        if not self.throttle_per_second:
+            return
+        now = time.monotonic()
+        while self._accepted and now - self._accepted[0] > 1.0:
+            self._accepted.popleft()
+        if len(self._accepted) >= self.throttle_per_second:
+            self.throttled += 1
+            raise FakeQuotaError(f"429 Resource has been exhausted (e.g. check quota). "
+                                 f"Please retry in {self.retry_after}s")
+        self._accepted.append(now)
+
+    def configure(self, api_key: str = None):
+        self.api_key = api_key
+
+    def list_models(self):
+        time.sleep(self.list_latency)
+        return [SimpleNamespace(name=name, supported_generation_methods=["generateContent"])
+                for name in self.models]
+
+    def GenerativeModel(self, model_name: str) -> FakeModel:
+        return FakeModel(self, model_name)
+
+
+class FakeSearchBackend(SearchBackend):
+    """Search backend with seeded latency, error rate and result sizes"""
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.05, latency_sigma: float = 0.0, error_rate: float = 0.0,
+                 results_per_query: int = 3, snippet_chars: int = 200, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.latency_model = LatencyModel(latency, latency_sigma, self.rng)
+        self.error_rate = error_rate
+        self.results_per_query = results_per_query
+        self.snippet_chars = snippet_chars
+        self.calls = 0
+        self.injected_errors = 0
+
+    def _snippet(self, query: str, i: int) -> str:
+        text = f"Result {i} for {query}: findings on renewable energy, carbon capture and climate models. "
+        return (text * (self.snippet_chars // len(text) + 1))[:self.snippet_chars]
+
+    async def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency_model.sample())
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.injected_errors += 1
+            raise ConnectionError("search backend unavailable (injected by FakeSearchBackend)")
+        slug = "-".join(query.lower().split())[:60]
+        return [
+            {
+                "title": f"{query} - result {i}",
+                "url": f"https://example.com/{slug}/{i}",
+                "snippet": self._snippet(query, i),
+                "source": "fake"
+            }
+            for i in range(min(max_results, self.results_per_query))
+        ]
+
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self.latency_model.sample())
+        text = self._snippet(url, 0) * 5
+        return {"url": url, "status": 200, "title": url, "text": text, "bytes_read": len(text), "truncated": False}
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Hedged Gemini calls against heavy-tailed model latency.
+
+Runs the same stream of analysis calls through GeminiTools with hedging off
+and on. Both fake models have log-normal latency; with --slow-primary the
+probed model is also slower than its alternative, which exercises
+latency-aware rerouting. Reports call latency percentiles, the extra load
+hedging added and the per-model trackers.
+
+    python -m benchmarks.hedging --calls 2000 --concurrency 16 --budget-percent 5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.fakes import FakeGenAI
+from benchmarks.load_test import percentile
+from tools.gemini_tools import GeminiTools
+from tools.hedging import ModelRouter
+from tools.model_selection import ModelSelectionCache
+from tools.rate_limiter import RateLimiter
+from tools.response_cache import ResponseCache
+
+MODELS = ["models/gemini-2.5-flash", "models/gemini-2.0-flash"]
+
+
+async def run_mode(hedging: bool, args, cache_dir: str) -> Dict:
+    model_latency = {MODELS[0]: args.latency * args.slow_primary, MODELS[1]: args.latency}
+    genai_backend = FakeGenAI(MODELS, latency=args.latency, latency_sigma=args.sigma,
+                              model_latency=model_latency, seed=args.seed)
+    gemini_tools = GeminiTools(genai_backend=genai_backend,
+                               model_cache=ModelSelectionCache(path=os.path.join(cache_dir, f"{hedging}.json")),
+                               response_cache=ResponseCache(use_disk=False),
+                               rate_limiter=RateLimiter(requests_per_minute=10**9, tokens_per_minute=10**12,
+                                                        max_retries=0))
+    # Probing runs both models concurrently; pin the primary so every run starts from the same one
+    gemini_tools.probe_concurrency = 1
+    gemini_tools.router = ModelRouter(enabled=hedging, hedge_percentile=args.percentile,
+                                      hedge_budget=args.budget_percent, min_samples=args.min_samples)
+    await gemini_tools.ensure_initialized()
+
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await gemini_tools.analyze_content(f"hedging benchmark document {i}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.calls)))
+    elapsed = time.perf_counter() - started
+    routing = gemini_tools.router.get_stats()
+    # Cancelled hedges never reach the fake's call counter, but they are load all the same
+    sent = args.calls + routing["hedged"]
+    return {
+        "seconds": round(elapsed, 2),
+        "latency_p50": round(percentile(latencies, 50), 4),
+        "latency_p95": round(percentile(latencies, 95), 4),
+        "latency_p99": round(percentile(latencies, 99), 4),
+        "latency_max": round(max(latencies), 4),
+        "requests_sent": sent,
+        "extra_load_percent": round((sent - args.calls) / args.calls * 100, 2),
+        "hedged": routing["hedged"],
+        "hedge_wins": routing["hedge_wins"],
+        "budget_exhausted": routing["budget_exhausted"],
+        "rerouted": routing["rerouted"],
+        "explored": routing["explored"],
+        "models": routing["models"]
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="median model latency, seconds")
+    parser.add_argument("--sigma", type=float, default=0.8, help="log-normal spread of model latency")
+    parser.add_argument("--slow-primary", type=float, default=1.0, help="latency multiplier of the probed model")
+    parser.add_argument("--percentile", type=float, default=95, help="hedge after this latency percentile")
+    parser.add_argument("--budget-percent", type=float, default=5, help="maximum extra load from hedges")
+    parser.add_argument("--min-samples", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-api-key")
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, hedging in (("unhedged", False), ("hedged", True)):
+            report[name] = await run_mode(hedging, args, tmp)
+            print(json.dumps({name: report[name]}))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "hedging", "config": vars(args), **report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+HTML extraction benchmark: inline parsing versus thread and process pools.
+
+Parses synthetic pages through PageParser while a monitor measures how late
+the event loop wakes up. Inline parsing blocks the loop for the whole run;
+a thread pool keeps the loop responsive but shares the GIL; a process pool
+also spreads the work over cores.
+
+    python -m benchmarks.html_parsing --pages 300 --page-kb 200 --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List
+
+from benchmarks.load_test import LoopLagMonitor, percentile
+from tools.page_parser import PageParser
+
+
+def make_page(index: int, kilobytes: int) -> bytes:
+    """A page with boilerplate, scripts and enough paragraphs to reach the requested size"""
+    head = (f"<html lang='en'><head><title>Benchmark page {index}</title>"
+            f"<meta name='description' content='Synthetic page {index}'>"
+            f"<script>var tracking = {{id: {index}}};</script><style>p {{ margin: 0 }}</style></head><body>")
+    paragraph = (f"<div class='para'><p>Paragraph about renewable energy &amp; carbon capture on page {index}, "
+                 f"with <a href='/link/{index}'>a link</a> and <b>inline</b> <i>markup</i>.</p></div>\n")
+    body = paragraph * (kilobytes * 1024 // len(paragraph) + 1)
+    return (head + body + "</body></html>").encode("utf-8")
+
+
+async def run_mode(mode: str, workers: int, pages: List[bytes], max_text_chars: int) -> Dict:
+    parser = PageParser(mode=mode, workers=workers, max_text_chars=max_text_chars,
+                        max_input_bytes=max(len(page) for page in pages), inline_below=0)
+    if mode != "inline":
+        # Start the pool's workers before timing
+        await asyncio.gather(*(parser.parse(pages[0]) for _ in range(workers)))
+
+    monitor = LoopLagMonitor(interval=0.005)
+    monitor.start()
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(parser.parse(page) for page in pages))
+    wall = time.perf_counter() - started
+    await monitor.stop()
+    parser.close()
+
+    # A loop blocked for the whole run never gets to take a sample
+    lag_ms = [sample * 1000 for sample in monitor.samples] or [wall * 1000]
+    megabytes = sum(len(page) for page in pages) / 1e6
+    return {
+        "mode": mode,
+        "workers": workers if mode != "inline" else 1,
+        "pages": len(pages),
+        "wall_seconds": round(wall, 3),
+        "pages_per_second": round(len(pages) / wall, 1),
+        "mb_per_second": round(megabytes / wall, 2),
+        "loop_lag_samples": len(lag_ms),
+        "loop_lag_p99_ms": round(percentile(lag_ms, 99), 2),
+        "loop_lag_max_ms": round(max(lag_ms), 2),
+        "text_chars": sum(len(result["text"]) for result in results) // len(results)
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--page-kb", type=int, default=200)
+    parser.add_argument("--max-text-chars", type=int, default=1_000_000,
+                        help="text cap; set high so whole pages are parsed")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    pages = [make_page(i, args.page_kb) for i in range(args.pages)]
+    levels = [await run_mode("inline", 1, pages, args.max_text_chars)]
+    print(json.dumps(levels[-1]))
+    for mode in ("thread", "process"):
+        for workers in sorted(set(args.workers)):
+            levels.append(await run_mode(mode, workers, pages, args.max_text_chars))
+            print(json.dumps(levels[-1]))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "html_parsing", "cpu_count": os.cpu_count(), "config": vars(args),
+                       "levels": levels}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
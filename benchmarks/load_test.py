@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Deterministic load test for the orchestrator pipeline.
+
+Runs ResearchOrchestrator.parallel_research (or process_stream, which adds
+the Gemini analysis and summary stages) against seeded fake search and
+Gemini backends at increasing concurrency, and reports throughput,
+p50/p95/p99 session latency, peak RSS and event-loop lag.
+
+    python -m benchmarks.load_test --levels 1 10 100 1000 10000 --output results.json
+    python -m benchmarks.load_test --baseline results.json   # fails on regressions
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from agents.research_orchestrator import ResearchOrchestrator
+from agents.search_agent import SearchAgent
+from benchmarks.fakes import FakeGenAI, FakeSearchBackend
+from memory.session_store import MemorySessionStore
+from tools.gemini_tools import GeminiTools
+from tools.model_selection import ModelSelectionCache
+from tools.rate_limiter import RateLimiter
+from tools.response_cache import ResponseCache
+
+# Metrics compared against a baseline, and whether bigger is better
+COMPARED_METRICS = {
+    "throughput_per_second": True,
+    "latency_p50": False,
+    "latency_p95": False,
+    "latency_p99": False,
+    "loop_lag_p99_ms": False
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task that asked to sleep for `interval`"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+def build_orchestrator(args, cache_dir: str) -> tuple:
+    search_backend = FakeSearchBackend(latency=args.search_latency, latency_sigma=args.latency_sigma,
+                                       error_rate=args.search_error_rate, snippet_chars=args.snippet_chars,
+                                       seed=args.seed)
+    gemini_tools = None
+    if args.mode == "stream":
+        genai_backend = FakeGenAI(["models/gemini-2.5-flash"], latency=args.llm_latency,
+                                  latency_sigma=args.latency_sigma, error_rate=args.llm_error_rate,
+                                  response_chars=args.response_chars, seed=args.seed)
+        gemini_tools = GeminiTools(genai_backend=genai_backend,
+                                   model_cache=ModelSelectionCache(path=os.path.join(cache_dir, "models.json")),
+                                   response_cache=ResponseCache(use_disk=False),
+                                   rate_limiter=RateLimiter(requests_per_minute=10**9, tokens_per_minute=10**12,
+                                                            max_retries=0))
+    orchestrator = ResearchOrchestrator(gemini_tools=gemini_tools,
+                                        session_store=MemorySessionStore(max_sessions=args.max_sessions),
+                                        search_agent=SearchAgent(backend=search_backend))
+    return orchestrator, gemini_tools
+
+
+async def run_level(concurrency: int, args, cache_dir: str) -> Dict:
+    orchestrator, gemini_tools = build_orchestrator(args, cache_dir)
+    if gemini_tools is not None:
+        await gemini_tools.ensure_initialized()
+    total = max(concurrency, args.min_queries)
+    queries = [f"load test query {i}" for i in range(total)]
+    latencies: List[float] = []
+    failures = 0
+    search_errors = 0
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started = time.perf_counter()
+
+    if args.mode == "process":
+        outcome = await orchestrator.parallel_research(queries, max_concurrency=concurrency)
+        for status in outcome["statuses"]:
+            if status["status"] == "completed":
+                latencies.append(status["elapsed"])
+            else:
+                failures += 1
+        search_errors = sum(1 for session in outcome["results"].values()
+                            if session["results"]["search"].get("error"))
+    else:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def stream_one(query: str):
+            nonlocal failures, search_errors
+            async with semaphore:
+                session_started = time.perf_counter()
+                try:
+                    async for event in orchestrator.process_stream(query):
+                        if event["event"] == "search_done" and event["search"].get("error"):
+                            search_errors += 1
+                        elif event["event"].endswith("_chunk") and event["text"].lstrip().startswith("❌"):
+                            failures += 1
+                    latencies.append(time.perf_counter() - session_started)
+                except Exception:
+                    failures += 1
+
+        await asyncio.gather(*(stream_one(query) for query in queries))
+
+    wall = time.perf_counter() - started
+    await monitor.stop()
+    lag_ms = [sample * 1000 for sample in monitor.samples]
+
+    return {
+        "concurrency": concurrency,
+        "queries": total,
+        "completed": len(latencies),
+        "failures": failures,
+        "search_errors": search_errors,
+        "wall_seconds": round(wall, 4),
+        "throughput_per_second": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_p50": round(percentile(latencies, 50), 4),
+        "latency_p95": round(percentile(latencies, 95), 4),
+        "latency_p99": round(percentile(latencies, 99), 4),
+        "peak_rss_mb": peak_rss_mb(),
+        "loop_lag_max_ms": round(max(lag_ms, default=0.0), 2),
+        "loop_lag_p99_ms": round(percentile(lag_ms, 99), 2)
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a description of every metric that regressed beyond tolerance"""
+    regressions = []
+    previous = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in results["levels"]:
+        old = previous.get(level["concurrency"])
+        if old is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = old.get(metric), level.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append(f"concurrency={level['concurrency']} {metric}: "
+                                   f"{before} -> {after} ({change:+.0%})")
+    return regressions
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--mode", choices=["process", "stream"], default="process")
+    parser.add_argument("--min-queries", type=int, default=50, help="queries per level when concurrency is lower")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="median fake search latency (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="median fake Gemini latency (s)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal spread of latencies")
+    parser.add_argument("--search-error-rate", type=float, default=0.01)
+    parser.add_argument("--llm-error-rate", type=float, default=0.01)
+    parser.add_argument("--snippet-chars", type=int, default=200)
+    parser.add_argument("--response-chars", type=int, default=1500)
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-api-key")
+    # Every query must run the full pipeline, not replay an earlier session
+    os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "false")
+
+    results = {
+        "benchmark": "load_test",
+        "mode": args.mode,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "levels": []
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for concurrency in args.levels:
+            level = await run_level(concurrency, args, tmp)
+            results["levels"].append(level)
+            print(json.dumps(level))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("mode") != args.mode:
+            print(f"Baseline was recorded in {baseline.get('mode')} mode, not {args.mode}")
+            return 2
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
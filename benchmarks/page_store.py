@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Fetched-page store benchmark against a local origin server with validators.
+
+The stub origin serves HTML pages with ETag and Last-Modified headers,
+answers conditional requests with 304, and changes a fraction of its pages
+between rounds. The same Zipf-popular fetch sequence runs three ways:
+
+- without a page store,
+- with a store that revalidates every time,
+- with a store that serves fresh pages without any request.
+
+For each it reports the bytes sent by the origin, fetch latency and store hit
+rates. With --processes N, N worker processes then share one store and
+fetch concurrently, which checks that the store is safe across processes.
+
+    python -m benchmarks.page_store --pages 200 --fetches 2000 --page-kb 200 --processes 4
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from email.utils import formatdate
+from typing import Dict, List
+
+from aiohttp import web
+
+from benchmarks.load_test import percentile
+from tools.page_parser import PageParser
+from tools.page_store import PageStore
+from tools.search_backends import HttpSearchBackend
+
+
+WORDS = ("grid", "storage", "forecast", "solar", "wind", "carbon", "battery", "demand", "model", "policy",
+         "turbine", "capture", "emissions", "network", "climate", "efficiency")
+_rng = random.Random(0)
+PARAGRAPHS = ["<p>" + " ".join(_rng.choice(WORDS) + str(_rng.randint(0, 99)) for _ in range(40)) + ".</p>"
+              for _ in range(2048)]
+
+
+class StubOrigin:
+    """Local HTTP origin whose pages carry ETag/Last-Modified validators"""
+
+    def __init__(self, page_bytes: int, rtt: float, bandwidth: float):
+        self.page_bytes = page_bytes
+        self.rtt = rtt
+        self.bandwidth = bandwidth
+        self.versions: Dict[str, int] = {}
+        self._bodies: Dict[tuple, bytes] = {}
+        self.bytes_sent = 0
+        self.responses = {200: 0, 304: 0}
+        self.runner = None
+
+    def body(self, page_id: str, version: int) -> bytes:
+        """Seeded pseudo-prose, so bodies compress about as well as real HTML"""
+        key = (page_id, version)
+        if key not in self._bodies:
+            rng = random.Random(f"{page_id}-{version}")
+            head = f"<html><head><title>Page {page_id}</title></head><body>"
+            count = self.page_bytes // len(PARAGRAPHS[0]) + 1
+            self._bodies[key] = (head + "".join(rng.choices(PARAGRAPHS, k=count)) + "</body></html>").encode()
+        return self._bodies[key]
+
+    async def handle_page(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.rtt)
+        page_id = request.match_info["page_id"]
+        version = self.versions.setdefault(page_id, 0)
+        etag = f'"{page_id}-{version}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.responses[304] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        body = self.body(page_id, version)
+        await asyncio.sleep(len(body) / self.bandwidth)
+        self.bytes_sent += len(body)
+        self.responses[200] += 1
+        return web.Response(body=body, content_type="text/html", charset="utf-8",
+                            headers={"ETag": etag, "Last-Modified": formatdate(usegmt=True)})
+
+    def change(self, fraction: float, rng: random.Random):
+        for page_id in list(self.versions):
+            if rng.random() < fraction:
+                self.versions[page_id] += 1
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/page/{page_id}", self.handle_page)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def fetch_sequence(args, seed: int) -> List[int]:
+    """Zipf-distributed page ids: a few popular sources are fetched over and over"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(args.pages)]
+    return rng.choices(range(args.pages), weights=weights, k=args.fetches)
+
+
+async def run_mode(mode: str, args, store_dir: str) -> Dict:
+    origin = StubOrigin(args.page_kb * 1024, args.rtt, args.bandwidth_mb * 1024 * 1024)
+    base_url = await origin.start()
+    store = None
+    if mode != "no_store":
+        store = PageStore(root=os.path.join(store_dir, mode), max_bytes=args.max_mb * 1024 * 1024,
+                          fresh_seconds=0 if mode == "revalidate" else 3600)
+    backend = HttpSearchBackend(parser=PageParser(mode="thread"), page_store=store, max_page_bytes=10**8,
+                                per_host_limit=args.concurrency)
+    rng = random.Random(args.seed)
+    sequence = fetch_sequence(args, args.seed)
+    rounds = max(1, args.rounds)
+    latencies: List[float] = []
+    started = time.perf_counter()
+    try:
+        per_round = len(sequence) // rounds
+        for round_no in range(rounds):
+            batch = sequence[round_no * per_round:(round_no + 1) * per_round]
+            limit = asyncio.Semaphore(args.concurrency)
+
+            async def fetch(page_id: int):
+                async with limit:
+                    began = time.perf_counter()
+                    page = await backend.fetch(f"{base_url}/page/{page_id}?utm_source=bench")
+                    latencies.append(time.perf_counter() - began)
+                    assert not page.get("error"), page.get("error")
+
+            await asyncio.gather(*(fetch(page_id) for page_id in batch))
+            origin.change(args.change_rate, rng)
+    finally:
+        await backend.close()
+        await origin.stop()
+    report = {
+        "seconds": round(time.perf_counter() - started, 3),
+        "origin_mb_sent": round(origin.bytes_sent / 1024 / 1024, 1),
+        "origin_200": origin.responses[200],
+        "origin_304": origin.responses[304],
+        "fetch_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "fetch_p99_ms": round(percentile(latencies, 99) * 1000, 2)
+    }
+    if store is not None:
+        stats = store.get_stats()
+        report["store"] = {key: stats[key] for key in ("hit_rate", "fresh_hits", "revalidated", "misses", "changed",
+                                                        "evictions", "entries", "stored_bytes", "raw_bytes")}
+        store.close()
+    return report
+
+
+def process_worker(args_dict: Dict, store_dir: str, base_url: str, worker: int, results) -> None:
+    """One process fetching through the shared store"""
+    args = argparse.Namespace(**args_dict)
+
+    async def work() -> Dict:
+        # Bodies are read back concurrently with other processes replacing files
+        store = PageStore(root=store_dir, max_bytes=args.max_mb * 1024 * 1024, fresh_seconds=0)
+        backend = HttpSearchBackend(parser=PageParser(mode="inline"), page_store=store, max_page_bytes=10**8)
+        errors = 0
+        body_reads = 0
+        try:
+            for page_id in fetch_sequence(args, args.seed + worker)[:args.fetches // args.processes]:
+                page = await backend.fetch(f"{base_url}/page/{page_id}")
+                if page.get("error") or f"Page {page_id}" not in page["title"]:
+                    errors += 1
+                entry = store.get(f"{base_url}/page/{page_id}")
+                if entry is not None:
+                    body = store.read_body(entry)
+                    if body is not None:
+                        body_reads += 1
+                        if not body.startswith(b"<html>"):
+                            errors += 1
+        finally:
+            await backend.close()
+        return {"worker": worker, "errors": errors, "body_reads": body_reads, **store.get_stats()}
+
+    results.put(asyncio.run(work()))
+
+
+async def run_processes(args, store_dir: str) -> Dict:
+    origin = StubOrigin(args.page_kb * 1024, args.rtt, args.bandwidth_mb * 1024 * 1024)
+    base_url = await origin.start()
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    shared_dir = os.path.join(store_dir, "shared")
+    workers = [context.Process(target=process_worker, args=(vars(args), shared_dir, base_url, i, results))
+               for i in range(args.processes)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    loop = asyncio.get_running_loop()
+    outcomes = [await loop.run_in_executor(None, results.get) for _ in workers]
+    for worker in workers:
+        await loop.run_in_executor(None, worker.join)
+    await origin.stop()
+    return {
+        "processes": args.processes,
+        "seconds": round(time.perf_counter() - started, 3),
+        "errors": sum(outcome["errors"] for outcome in outcomes),
+        "body_reads": sum(outcome["body_reads"] for outcome in outcomes),
+        "hit_rate": round(sum(outcome["hit_rate"] for outcome in outcomes) / len(outcomes), 4),
+        "origin_200": origin.responses[200],
+        "origin_304": origin.responses[304]
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--fetches", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5, help="the origin changes pages between rounds")
+    parser.add_argument("--change-rate", type=float, default=0.1, help="fraction of pages changed per round")
+    parser.add_argument("--page-kb", type=int, default=200)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--rtt", type=float, default=0.02)
+    parser.add_argument("--bandwidth-mb", type=float, default=50, help="origin bandwidth per response, MB/s")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-mb", type=int, default=512, help="store size limit")
+    parser.add_argument("--processes", type=int, default=4, help="processes sharing one store (0 to skip)")
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    # Every run passes its own store; the no_store run must not pick up the shared one
+    os.environ["PAGE_STORE_ENABLED"] = "false"
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("no_store", "revalidate", "fresh"):
+            report[mode] = await run_mode(mode, args, tmp)
+            print(json.dumps({mode: report[mode]}))
+        if args.processes:
+            report["multi_process"] = await run_processes(args, tmp)
+            print(json.dumps({"multi_process": report["multi_process"]}))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "page_store", "config": vars(args), **report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
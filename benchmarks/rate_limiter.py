@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Rate limiter benchmark against a fake Gemini backend that throttles.
+
+Fires a burst of distinct analyze_content calls at a backend that accepts
+only --throttle calls per second, once with a permissive limiter and no
+retries (the old behaviour) and once with the shared adaptive limiter.
+
+    python -m benchmarks.rate_limiter --calls 200 --throttle 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.fakes import FakeGenAI
+from tools.gemini_tools import GeminiTools
+from tools.model_selection import ModelSelectionCache
+from tools.rate_limiter import RateLimiter
+from tools.response_cache import ResponseCache
+
+
+async def run(label: str, limiter: RateLimiter, args, cache_dir: str) -> dict:
+    backend = FakeGenAI(["models/gemini-2.5-flash"], latency=args.latency,
+                        throttle_per_second=args.throttle, retry_after=args.retry_after)
+    tools = GeminiTools(genai_backend=backend,
+                        model_cache=ModelSelectionCache(path=os.path.join(cache_dir, f"{label}.json")),
+                        response_cache=ResponseCache(use_disk=False), rate_limiter=limiter)
+    await tools.ensure_initialized()
+    backend.throttled = 0
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(tools.analyze_content(f"snippet {i}") for i in range(args.calls)))
+    elapsed = time.perf_counter() - started
+
+    succeeded = sum(1 for result in results if not result.startswith("❌"))
+    stats = limiter.get_stats()
+    return {
+        "limiter": label,
+        "succeeded": succeeded,
+        "failed": args.calls - succeeded,
+        "upstream_throttled": backend.throttled,
+        "seconds": round(elapsed, 3),
+        "throughput_per_second": round(succeeded / elapsed, 2),
+        "queue_wait_avg": stats["queue_wait_avg"],
+        "queue_wait_max": stats["queue_wait_max"],
+        "retries": stats["retries"],
+        "final_rate_scale": stats["rate_scale"]
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--throttle", type=int, default=20, help="calls per second the fake backend accepts")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-api-key")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        unlimited = RateLimiter(requests_per_minute=10**9, max_retries=0)
+        # Configured 50% above what the backend really allows; adaptation closes the gap
+        adaptive = RateLimiter(requests_per_minute=args.throttle * 90, max_retries=8)
+        report = [await run("none", unlimited, args, tmp), await run("adaptive", adaptive, args, tmp)]
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
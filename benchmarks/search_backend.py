@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Search backend benchmark against a local stub HTTP server.
+
+Shows that N parallel SearchAgent queries over the pooled HttpSearchBackend
+finish in about one server round trip rather than N, and that large pages
+are streamed with a byte cap.
+
+    python -m benchmarks.search_backend --queries 50 --rtt 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from aiohttp import web
+
+from agents.search_agent import SearchAgent
+from tools.search_backends import HttpSearchBackend
+
+
+class StubSearchServer:
+    """Local HTTP server with a SearxNG-style /search endpoint and large pages"""
+
+    def __init__(self, rtt: float, page_bytes: int):
+        self.rtt = rtt
+        self.page_bytes = page_bytes
+        self.requests = 0
+        self.runner = None
+        self.port = None
+
+    async def handle_search(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.rtt)
+        query = request.query.get("q", "")
+        base = f"http://127.0.0.1:{self.port}"
+        results = [
+            {"title": f"{query} result {i}", "url": f"{base}/page/{i}", "content": f"Snippet {i} about {query}"}
+            for i in range(5)
+        ]
+        return web.json_response({"results": results})
+
+    async def handle_page(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        await asyncio.sleep(self.rtt)
+        response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+        await response.prepare(request)
+        await response.write(b"<html><head><title>Stub page</title><script>var x = 1;</script></head><body>")
+        paragraph = b"<p>Renewable energy forecasting with machine learning.</p>"
+        sent = 0
+        try:
+            while sent < self.page_bytes:
+                await response.write(paragraph * 100)
+                sent += len(paragraph) * 100
+            await response.write(b"</body></html>")
+        except ConnectionError:
+            pass  # The client stopped reading at its byte cap
+        return response
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/search", self.handle_search)
+        app.router.add_get("/page/{page_id}", self.handle_page)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{self.port}/search?q={{query}}&format=json"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--rtt", type=float, default=0.2, help="stub server delay per request (s)")
+    parser.add_argument("--page-bytes", type=int, default=5_000_000)
+    parser.add_argument("--max-page-bytes", type=int, default=256_000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    server = StubSearchServer(args.rtt, args.page_bytes)
+    search_url = await server.start()
+    backend = HttpSearchBackend(search_url=search_url, per_host_limit=args.queries,
+                                max_page_bytes=args.max_page_bytes, max_text_chars=args.max_page_bytes)
+    agent = SearchAgent(backend=backend)
+    results = {}
+    try:
+        queries = [f"renewable energy topic {i}" for i in range(args.queries)]
+
+        started = time.perf_counter()
+        parallel = await agent.parallel_searches(queries)
+        results["parallel_searches_seconds"] = round(time.perf_counter() - started, 3)
+        results["parallel_successful"] = parallel["successful_searches"]
+        results["round_trips_equivalent"] = round(results["parallel_searches_seconds"] / args.rtt, 2)
+
+        started = time.perf_counter()
+        page = await backend.fetch(f"http://127.0.0.1:{server.port}/page/0")
+        results["page_fetch_seconds"] = round(time.perf_counter() - started, 3)
+        results["page_bytes_read"] = page["bytes_read"]
+        results["page_truncated"] = page["truncated"]
+        results["page_text_chars"] = len(page["text"])
+        results["server_requests"] = server.requests
+    finally:
+        await agent.close()
+        await server.stop()
+
+    print(json.dumps({"queries": args.queries, "rtt": args.rtt, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
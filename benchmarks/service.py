@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+End-to-end test of the local research service with fake backends.
+
+Starts ResearchService on an ephemeral localhost port around one warm
+orchestrator (fake search and Gemini backends), then:
+
+- measures what a cold start costs (new GeminiTools, model probing, agents),
+- runs many concurrent clients that submit and then stream or poll,
+- bursts past the admission limits and times how fast excess is rejected.
+
+    python -m benchmarks.service --clients 200 --max-in-flight 32 --max-queued 64
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import aiohttp
+
+from agents.research_orchestrator import ResearchOrchestrator
+from agents.search_agent import SearchAgent
+from agents.service import ResearchService
+from benchmarks.fakes import FakeGenAI, FakeSearchBackend
+from benchmarks.load_test import percentile
+from memory.session_store import MemorySessionStore
+from tools.gemini_tools import GeminiTools
+from tools.model_selection import ModelSelectionCache
+from tools.rate_limiter import RateLimiter
+from tools.response_cache import ResponseCache
+
+
+def build_orchestrator(args, cache_dir: str) -> ResearchOrchestrator:
+    genai_backend = FakeGenAI(["models/gemini-2.5-flash", "models/gemini-2.0-flash"], latency=args.llm_latency,
+                              latency_sigma=args.latency_sigma, list_latency=args.list_latency, seed=args.seed)
+    gemini_tools = GeminiTools(genai_backend=genai_backend,
+                               model_cache=ModelSelectionCache(path=os.path.join(cache_dir, "models.json")),
+                               response_cache=ResponseCache(use_disk=False),
+                               rate_limiter=RateLimiter(requests_per_minute=10**9, tokens_per_minute=10**12,
+                                                        max_retries=0))
+    search_backend = FakeSearchBackend(latency=args.search_latency, latency_sigma=args.latency_sigma,
+                                       seed=args.seed)
+    return ResearchOrchestrator(gemini_tools=gemini_tools, session_store=MemorySessionStore(),
+                                search_agent=SearchAgent(backend=search_backend))
+
+
+async def cold_start(args, cache_dir: str) -> float:
+    """What each main.py run pays before its first session can start"""
+    os.makedirs(cache_dir, exist_ok=True)
+    started = time.perf_counter()
+    orchestrator = build_orchestrator(args, cache_dir)
+    await orchestrator.gemini_tools.ensure_initialized()
+    return time.perf_counter() - started
+
+
+async def stream_client(http: aiohttp.ClientSession, base_url: str, query: str) -> Dict:
+    started = time.perf_counter()
+    async with http.post(f"{base_url}/research", json={"query": query}) as response:
+        if response.status == 503:
+            return {"rejected": True}
+        job = await response.json()
+    first_event = None
+    last = None
+    async with http.get(f"{base_url}{job['stream']}") as response:
+        async for line in response.content:
+            event = json.loads(line)
+            if first_event is None and event["event"] not in ("job_status",):
+                first_event = time.perf_counter() - started
+            last = event
+    return {"rejected": False, "latency": time.perf_counter() - started, "first_event": first_event,
+            "status": last["status"]}
+
+
+async def poll_client(http: aiohttp.ClientSession, base_url: str, query: str, interval: float) -> Dict:
+    started = time.perf_counter()
+    async with http.post(f"{base_url}/research", json={"query": query}) as response:
+        if response.status == 503:
+            return {"rejected": True}
+        job = await response.json()
+    while job["status"] not in ("completed", "failed", "cancelled"):
+        await asyncio.sleep(interval)
+        async with http.get(f"{base_url}{job['poll']}") as response:
+            job = await response.json()
+    return {"rejected": False, "latency": time.perf_counter() - started, "status": job["status"],
+            "has_session": "session" in job}
+
+
+def summarize(outcomes: List[Dict]) -> Dict:
+    served = [outcome for outcome in outcomes if not outcome["rejected"]]
+    latencies = [outcome["latency"] for outcome in served]
+    return {
+        "served": len(served),
+        "rejected": len(outcomes) - len(served),
+        "completed": sum(1 for outcome in served if outcome["status"] == "completed"),
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p99": round(percentile(latencies, 99), 3)
+    }
+
+
+async def run(args, cache_dir: str) -> Dict:
+    report = {"cold_start_seconds": round(await cold_start(args, os.path.join(cache_dir, "cold")), 3)}
+
+    os.makedirs(os.path.join(cache_dir, "service"), exist_ok=True)
+    orchestrator = build_orchestrator(args, os.path.join(cache_dir, "service"))
+    service = ResearchService(orchestrator, max_in_flight=args.max_in_flight, max_queued=args.max_queued)
+    started = time.perf_counter()
+    base_url = await service.start("127.0.0.1", 0)
+    report["service_start_seconds"] = round(time.perf_counter() - started, 3)
+    connector = aiohttp.TCPConnector(limit=0)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as http:
+            # Steady load within the admission limits: half the clients stream, half poll
+            limit = asyncio.Semaphore(args.max_in_flight + args.max_queued)
+
+            async def bounded(client):
+                async with limit:
+                    return await client
+
+            clients = [stream_client(http, base_url, f"service query {i}") if i % 2 == 0
+                       else poll_client(http, base_url, f"service query {i}", args.poll_interval)
+                       for i in range(args.clients)]
+            outcomes = await asyncio.gather(*(bounded(client) for client in clients))
+            report["streaming"] = summarize(outcomes[0::2])
+            report["polling"] = summarize(outcomes[1::2])
+            first_events = [outcome["first_event"] for outcome in outcomes[0::2] if outcome.get("first_event")]
+            report["streaming"]["first_event_p50"] = round(percentile(first_events, 50), 3)
+
+            # A burst far beyond the limits: the excess must be turned away, and quickly
+            burst = args.burst or 4 * (args.max_in_flight + args.max_queued)
+            response_times: Dict[int, List[float]] = {202: [], 503: []}
+
+            async def submit(i: int) -> int:
+                began = time.perf_counter()
+                async with http.post(f"{base_url}/research", json={"query": f"burst query {i}"}) as response:
+                    response_times.setdefault(response.status, []).append(time.perf_counter() - began)
+                    return response.status
+
+            statuses = await asyncio.gather(*(submit(i) for i in range(burst)))
+            report["burst"] = {
+                "submitted": burst,
+                "accepted": statuses.count(202),
+                "rejected": statuses.count(503),
+                # Client-observed, so both include connection setup for the whole burst
+                "accept_p50_ms": round(percentile(response_times[202], 50) * 1000, 2),
+                "rejection_p50_ms": round(percentile(response_times[503], 50) * 1000, 2),
+                "rejection_p99_ms": round(percentile(response_times[503], 99) * 1000, 2)
+            }
+            async with http.get(f"{base_url}/status") as response:
+                status = await response.json()
+            report["service"] = status["service"]
+            report["gemini_model"] = status["gemini"]["current_model"]
+    finally:
+        await service.stop()
+    return report
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--max-in-flight", type=int, default=32)
+    parser.add_argument("--max-queued", type=int, default=64)
+    parser.add_argument("--burst", type=int, default=0, help="burst size (default: 4x the admission limit)")
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--list-latency", type=float, default=0.5, help="model listing cost at cold start")
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-api-key")
+    os.environ.setdefault("DEDUP_ENABLED", "false")
+    os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "false")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = await run(args, tmp)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "service", "config": vars(args), **report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Pipelined versus stop-and-wait research sessions.
+
+Runs the same sessions (search, fetch every result, analyze each page,
+summarize) two ways against seeded fake backends with log-normal latency:
+stop-and-wait finishes each stage for every result before starting the
+next, while ResearchOrchestrator.process moves each result on as soon as it
+is ready. Reports p50/p95 session latency and per-stage timings.
+
+    python -m benchmarks.session_pipeline --sessions 20 --results 8
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from agents.research_orchestrator import ResearchOrchestrator
+from agents.search_agent import SearchAgent
+from benchmarks.fakes import FakeGenAI, FakeSearchBackend
+from benchmarks.load_test import percentile
+from memory.session_store import MemorySessionStore
+from tools.gemini_tools import GeminiTools
+from tools.model_selection import ModelSelectionCache
+from tools.rate_limiter import RateLimiter
+from tools.response_cache import ResponseCache
+
+
+def build_orchestrator(args, cache_dir: str) -> ResearchOrchestrator:
+    genai_backend = FakeGenAI(["models/gemini-2.5-flash"], latency=args.llm_latency,
+                              latency_sigma=args.latency_sigma, seed=args.seed)
+    gemini_tools = GeminiTools(genai_backend=genai_backend,
+                               model_cache=ModelSelectionCache(path=os.path.join(cache_dir, "models.json")),
+                               response_cache=ResponseCache(use_disk=False),
+                               rate_limiter=RateLimiter(requests_per_minute=10**9, tokens_per_minute=10**12,
+                                                        max_retries=0))
+    search_backend = FakeSearchBackend(latency=args.fetch_latency, latency_sigma=args.latency_sigma,
+                                       results_per_query=args.results, seed=args.seed)
+    orchestrator = ResearchOrchestrator(gemini_tools=gemini_tools, session_store=MemorySessionStore(),
+                                        search_agent=SearchAgent(backend=search_backend))
+    orchestrator.max_results = args.results
+    orchestrator.fetch_content = True
+    orchestrator.fetch_concurrency = args.fetch_concurrency
+    orchestrator.analyze_concurrency = args.analyze_concurrency
+    return orchestrator
+
+
+async def stop_and_wait(orchestrator: ResearchOrchestrator, query: str, args):
+    """Each stage completes for every result before the next stage starts"""
+    gemini_tools = orchestrator.gemini_tools
+    search = await orchestrator.search_agent.process({"query": query, "max_results": args.results})
+    results = search["results"]
+
+    fetch_slots = asyncio.Semaphore(args.fetch_concurrency)
+
+    async def fetch(result):
+        async with fetch_slots:
+            await orchestrator.search_agent.fetch_pages([result])
+
+    await asyncio.gather(*(fetch(result) for result in results))
+
+    analyze_slots = asyncio.Semaphore(args.analyze_concurrency)
+
+    async def analyze(result):
+        async with analyze_slots:
+            content = result.get("content") or f"{result['title']}: {result['snippet']}"
+            return await gemini_tools.analyze_content(content)
+
+    analyses = await asyncio.gather(*(analyze(result) for result in results))
+    # Same summary input as process builds, so neither side gets a response-cache hit the other misses
+    await gemini_tools.generate_summary(
+        "\n\n".join(f"{result['title']}: {analysis}" for result, analysis in zip(results, analyses))
+    )
+
+
+async def run(args, cache_dir: str) -> Dict:
+    queries = [f"pipeline benchmark query {i}" for i in range(args.sessions)]
+    report = {}
+    for mode in ("stop_and_wait", "pipelined"):
+        orchestrator = build_orchestrator(args, cache_dir)
+        await orchestrator.gemini_tools.ensure_initialized()
+        latencies: List[float] = []
+        stage_busy: Dict[str, float] = {}
+        for query in queries:
+            started = time.perf_counter()
+            if mode == "pipelined":
+                session = await orchestrator.process(query)
+                for stage, timing in session["stage_timings"].items():
+                    if isinstance(timing, dict):
+                        stage_busy[stage] = stage_busy.get(stage, 0.0) + timing["busy_seconds"]
+            else:
+                await stop_and_wait(orchestrator, query, args)
+            latencies.append(time.perf_counter() - started)
+        report[mode] = {
+            "latency_p50": round(percentile(latencies, 50), 3),
+            "latency_p95": round(percentile(latencies, 95), 3),
+            "latency_mean": round(sum(latencies) / len(latencies), 3)
+        }
+        if stage_busy:
+            report[mode]["stage_busy_seconds_per_session"] = {
+                stage: round(busy / len(queries), 3) for stage, busy in stage_busy.items()
+            }
+    report["p50_speedup"] = round(report["stop_and_wait"]["latency_p50"] / report["pipelined"]["latency_p50"], 2)
+    return report
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--results", type=int, default=8, help="search results per session")
+    parser.add_argument("--fetch-latency", type=float, default=0.15, help="median seconds per search/fetch")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="median seconds per Gemini call")
+    parser.add_argument("--latency-sigma", type=float, default=0.6, help="log-normal latency spread")
+    parser.add_argument("--fetch-concurrency", type=int, default=4)
+    parser.add_argument("--analyze-concurrency", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-api-key")
+    os.environ.setdefault("DEDUP_ENABLED", "false")
+    os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "false")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = await run(args, tmp)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "session_pipeline", "config": vars(args), **report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Startup latency benchmark for GeminiTools model selection.
+
+Compares a cold start (empty model cache, concurrent probing) with a warm
+start (cached selection) against a fake genai backend where the preferred
+models fail with regional errors.
+
+    python -m benchmarks.startup_latency
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.fakes import FakeGenAI
+from tools.gemini_tools import GeminiTools
+from tools.model_selection import ModelSelectionCache
+
+MODELS = [
+    "models/gemini-2.5-pro-preview-03-25",
+    "models/gemini-2.5-pro-preview-05-06",
+    "models/gemini-2.5-pro-preview-06-05",
+    "models/gemini-2.5-flash",
+    "models/gemini-1.0-pro",
+]
+
+
+async def time_start(backend: FakeGenAI, cache: ModelSelectionCache) -> tuple:
+    """Return (seconds to first usable model, backend calls made, model source)"""
+    calls_before = backend.calls
+    started = time.perf_counter()
+    tools = GeminiTools(genai_backend=backend, model_cache=cache)
+    await tools.ensure_initialized()
+    elapsed = time.perf_counter() - started
+    return elapsed, backend.calls - calls_before, tools.get_status()["model_source"]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.3, help="fake generate_content latency (s)")
+    parser.add_argument("--failing", type=int, default=3, help="number of preferred models that fail")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-api-key")
+    backend = FakeGenAI(MODELS, failing_models=MODELS[:args.failing], latency=args.latency)
+    serial_estimate = backend.list_latency + args.latency * (args.failing + 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ModelSelectionCache(path=os.path.join(tmp, "model_selection.json"))
+        print(f"{'run':<6}{'start':<8}{'seconds':>10}{'calls':>8}  source")
+        for run in range(args.runs):
+            cache.clear()
+            cold, cold_calls, cold_source = await time_start(backend, cache)
+            warm, warm_calls, warm_source = await time_start(backend, cache)
+            print(f"{run:<6}{'cold':<8}{cold:>10.3f}{cold_calls:>8}  {cold_source}")
+            print(f"{run:<6}{'warm':<8}{warm:>10.3f}{warm_calls:>8}  {warm_source}")
+
+    print(f"\nSerial probing (previous behaviour) would take ~{serial_estimate:.3f}s per start")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Map-reduce versus single-prompt summarization of long documents.
+
+Uses a fake Gemini backend whose latency grows with prompt length, and
+compares one prompt holding the whole text against generate_summary's
+chunked map-reduce path for 10k to 1M characters. A second document that
+shares most paragraphs with the first shows chunk-summary reuse.
+
+    python -m benchmarks.summarization --sizes 10000 100000 1000000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fakes import FakeGenAI
+from tools.gemini_tools import SUMMARY_PROMPT, GeminiTools
+from tools.model_selection import ModelSelectionCache
+from tools.rate_limiter import RateLimiter
+from tools.response_cache import ResponseCache
+
+WORDS = ("solar", "wind", "grid", "storage", "carbon", "capture", "emissions", "policy", "model", "forecast",
+         "turbine", "battery", "efficiency", "demand", "climate", "network", "optimization", "research")
+
+
+def make_document(chars: int, rng: random.Random) -> str:
+    paragraphs, size = [], 0
+    while size < chars:
+        sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+                     for _ in range(rng.randint(3, 8))]
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:chars]
+
+
+def build_tools(args, cache_dir: str) -> tuple:
+    genai_backend = FakeGenAI(["models/gemini-2.5-flash"], latency=args.latency,
+                              per_token_latency=args.per_token_latency, response_chars=args.response_chars)
+    tools = GeminiTools(genai_backend=genai_backend,
+                        model_cache=ModelSelectionCache(path=os.path.join(cache_dir, "models.json")),
+                        response_cache=ResponseCache(use_disk=False),
+                        rate_limiter=RateLimiter(requests_per_minute=10**9, tokens_per_minute=10**12, max_retries=0))
+    tools.summary_chunk_tokens = args.chunk_tokens
+    tools.summary_concurrency = args.concurrency
+    return tools, genai_backend
+
+
+async def run_size(chars: int, args, cache_dir: str) -> dict:
+    rng = random.Random(args.seed)
+    document = make_document(chars, rng)
+
+    single_tools, single_backend = build_tools(args, cache_dir)
+    await single_tools.ensure_initialized()
+    started = time.perf_counter()
+    await single_tools._generate(SUMMARY_PROMPT, document, method="summary")
+    single_seconds = time.perf_counter() - started
+
+    tools, backend = build_tools(args, cache_dir)
+    await tools.ensure_initialized()
+    started = time.perf_counter()
+    await tools.generate_summary(document)
+    map_reduce_seconds = time.perf_counter() - started
+    calls = backend.calls
+
+    # Same document with a new opening paragraph and a changed ending
+    overlapping = make_document(2000, rng) + "\n\n" + document[:int(len(document) * 0.9)]
+    started = time.perf_counter()
+    await tools.generate_summary(overlapping)
+    overlap_seconds = time.perf_counter() - started
+
+    return {
+        "chars": chars,
+        "single_prompt_seconds": round(single_seconds, 3),
+        "map_reduce_seconds": round(map_reduce_seconds, 3),
+        "speedup": round(single_seconds / map_reduce_seconds, 2),
+        "map_reduce_calls": calls,
+        "overlapping_doc_seconds": round(overlap_seconds, 3),
+        "overlapping_doc_calls": backend.calls - calls,
+        "chunks": tools.summary_stats["chunks"],
+        "reduce_calls": tools.summary_stats["reduce_calls"]
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--latency", type=float, default=0.3, help="fixed seconds per call")
+    parser.add_argument("--per-token-latency", type=float, default=0.00005, help="seconds per prompt token")
+    parser.add_argument("--response-chars", type=int, default=600)
+    parser.add_argument("--chunk-tokens", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-api-key")
+
+    levels = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for chars in args.sizes:
+            levels.append(await run_size(chars, args, tmp))
+            print(json.dumps(levels[-1]))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "summarization", "config": vars(args), "levels": levels}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Per-call and per-session token budgets under long, uneven page content.
+
+Sessions fetch pages whose sizes follow a heavy-tailed distribution and
+analyze each one with a fake Gemini backend whose latency grows with prompt
+length. The same sessions run with budgets effectively off and with the
+configured budgets, and the report shows session latency and tokens per
+session (p50/p99), plus the token throughput GeminiTools measured.
+
+    python -m benchmarks.token_budget --sessions 40 --max-prompt-tokens 8000 --session-budget 50000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from agents.research_orchestrator import ResearchOrchestrator
+from agents.search_agent import SearchAgent
+from benchmarks.fakes import FakeGenAI, FakeSearchBackend
+from benchmarks.load_test import percentile
+from memory.session_store import MemorySessionStore
+from tools.gemini_tools import GeminiTools
+from tools.model_selection import ModelSelectionCache
+from tools.rate_limiter import RateLimiter
+from tools.response_cache import ResponseCache
+
+WORDS = ("grid", "storage", "forecast", "solar", "wind", "carbon", "battery", "demand", "model", "policy")
+
+
+class LongPageSearchBackend(FakeSearchBackend):
+    """Fake backend whose pages have log-normally distributed lengths"""
+
+    def __init__(self, page_chars: int, page_sigma: float, **kwargs):
+        super().__init__(**kwargs)
+        self.page_chars = page_chars
+        self.page_sigma = page_sigma
+        self.page_rng = random.Random(kwargs.get("seed", 0))
+
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        page = await super().fetch(url)
+        chars = int(self.page_chars * math.exp(self.page_rng.gauss(0.0, self.page_sigma)))
+        sentence_count = chars // 60 + 1
+        text = " ".join(" ".join(self.page_rng.choice(WORDS) for _ in range(8)) + f" {url} {i}."
+                        for i in range(sentence_count))[:chars]
+        return {**page, "text": text, "bytes_read": len(text)}
+
+
+def build_orchestrator(args, cache_dir: str, budgets: bool) -> ResearchOrchestrator:
+    genai_backend = FakeGenAI(["models/gemini-2.5-flash"], latency=args.llm_latency,
+                              per_token_latency=args.per_token_latency, response_chars=args.response_chars,
+                              seed=args.seed)
+    gemini_tools = GeminiTools(genai_backend=genai_backend,
+                               model_cache=ModelSelectionCache(path=os.path.join(cache_dir, "models.json")),
+                               response_cache=ResponseCache(use_disk=False),
+                               rate_limiter=RateLimiter(requests_per_minute=10**9, tokens_per_minute=10**12,
+                                                        max_retries=0))
+    gemini_tools.max_prompt_tokens = args.max_prompt_tokens if budgets else 10**9
+    gemini_tools.summary_chunk_tokens = 10**9 if not budgets else gemini_tools.summary_chunk_tokens
+    search_backend = LongPageSearchBackend(args.page_chars, args.page_sigma, latency=0.02,
+                                           results_per_query=args.results, seed=args.seed)
+    orchestrator = ResearchOrchestrator(gemini_tools=gemini_tools, session_store=MemorySessionStore(),
+                                        search_agent=SearchAgent(backend=search_backend))
+    orchestrator.max_results = args.results
+    orchestrator.fetch_content = True
+    orchestrator.session_token_budget = args.session_budget if budgets else 0
+    return orchestrator
+
+
+async def run_mode(budgets: bool, args, cache_dir: str) -> Dict:
+    orchestrator = build_orchestrator(args, cache_dir, budgets)
+    await orchestrator.gemini_tools.ensure_initialized()
+    latencies: List[float] = []
+    tokens: List[int] = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            session = await orchestrator.process(f"token budget query {i}")
+            latencies.append(time.perf_counter() - started)
+            tokens.append(session["token_usage"]["total_tokens"])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    metrics = orchestrator.gemini_tools.get_token_metrics()
+    return {
+        "seconds": round(elapsed, 2),
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p99": round(percentile(latencies, 99), 3),
+        "tokens_per_session_p50": percentile(tokens, 50),
+        "tokens_per_session_p99": percentile(tokens, 99),
+        "tokens_per_session_max": max(tokens),
+        "input_tokens": metrics["input_tokens"],
+        "output_tokens": metrics["output_tokens"],
+        "tokens_per_second": round((metrics["input_tokens"] + metrics["output_tokens"]) / elapsed, 1),
+        "truncated_calls": metrics["truncated_calls"],
+        "rejected_calls": metrics["rejected_calls"]
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--results", type=int, default=5)
+    parser.add_argument("--page-chars", type=int, default=12000, help="median page length")
+    parser.add_argument("--page-sigma", type=float, default=1.2, help="log-normal spread of page lengths")
+    parser.add_argument("--max-prompt-tokens", type=int, default=8000)
+    parser.add_argument("--session-budget", type=int, default=50000)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--per-token-latency", type=float, default=0.00005)
+    parser.add_argument("--response-chars", type=int, default=1200)
+    parser.add_argument("--seed", type=int, default=9)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-api-key")
+    os.environ.setdefault("DEDUP_ENABLED", "false")
+    os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "false")
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        report["unbounded"] = await run_mode(False, args, tmp)
+        print(json.dumps({"unbounded": report["unbounded"]}))
+        report["budgeted"] = await run_mode(True, args, tmp)
+        print(json.dumps({"budgeted": report["budgeted"]}))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "token_budget", "config": vars(args), **report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
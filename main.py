@@ -4,10 +4,16 @@ Multi-Agent Research Assistant
 Capstone Project for Agents Intensive Competition
 """
 
+import argparse
 import asyncio
 import logging
+import os
+import sys
+from agents.batch_runner import BatchRunner
 from agents.research_orchestrator import ResearchOrchestrator
+from agents.service import ResearchService
 from tools.gemini_tools import GeminiTools
+from tools.tracing import tracer
 
 # Set up logging
 logging.basicConfig(
@@ -25,6 +31,9 @@ async def main():
     orchestrator = ResearchOrchestrator()
     gemini_tools = GeminiTools()
     
+    # Pick a Gemini model in the background while the search agents work
+    gemini_ready = asyncio.create_task(gemini_tools.ensure_initialized())
+    
     # Test with a sample query
     sample_query = "impact of AI on climate change mitigation"
     
@@ -55,6 +64,7 @@ async def main():
         print(f"\n🧠 TESTING GEMINI AI INTEGRATION...")
         print("=" * 50)
         
+        await gemini_ready
         gemini_status = gemini_tools.get_status()
         
         # Display Gemini status with emojis
@@ -65,6 +75,7 @@ async def main():
             print("🚀 GEMINI STATUS: REAL AI MODE")
             print(f"   ✅ Active Model: {gemini_status['current_model']}")
             print(f"   ✅ API Connected: {gemini_status['model_available']}")
+            print(f"   ✅ Model Selection: {gemini_status['model_source']}")
         
         # Show available models for debugging
         if not gemini_status['demo_mode']:
@@ -80,21 +91,23 @@ async def main():
         
         # Test Gemini research capability
         print(f"\n🔬 TESTING AI RESEARCH CAPABILITY...")
-        test_research = await gemini_tools.research_topic(sample_query)
-        
         print("📝 RESEARCH RESULTS:")
         print("-" * 50)
         
         if gemini_status['demo_mode']:
-            # Show demo mode response
-            preview = test_research
             print("🎭 DEMO MODE RESPONSE (Simulated):")
         else:
-            # Show real AI response
-            preview = test_research[:500] + "..." if len(test_research) > 500 else test_research
-            print("🤖 REAL AI RESPONSE:")
+            print("🤖 REAL AI RESPONSE (streaming):")
+        
+        # Print the response as it is generated instead of waiting for all of it
+        async for chunk in gemini_tools.research_topic_stream(sample_query):
+            print(chunk, end="", flush=True)
+        print()
         
-        print(preview)
+        research_metrics = gemini_tools.get_call_metrics().get("research")
+        if research_metrics:
+            print(f"⏱️  First token after {research_metrics['ttft_avg']:.2f}s, "
+                  f"complete after {research_metrics['total_time_avg']:.2f}s")
         print("-" * 50)
         
         # Show how to enable/improve AI
@@ -116,7 +129,19 @@ async def main():
         ]
         
         parallel_results = await orchestrator.parallel_research(parallel_queries)
-        print(f"✅ Parallel research completed: {parallel_results['research_sessions']} sessions")
+        print(f"✅ Parallel research completed: {parallel_results['completed']}/{parallel_results['research_sessions']} sessions")
+        
+        # Per-stage latency breakdown (TRACING_ENABLED=true)
+        if tracer.enabled:
+            print(f"\n📈 STAGE LATENCIES:")
+            for stage in tracer.snapshot()["histograms"]:
+                print(f"   {stage['name']}: {stage['count']} calls, avg {stage['avg'] * 1000:.1f} ms, "
+                      f"p95 ≤ {stage['p95'] * 1000:.0f} ms")
+            export_path = os.getenv("TRACING_EXPORT_PATH")
+            if export_path:
+                with open(export_path, "w", encoding="utf-8") as f:
+                    f.write(tracer.export_prometheus() if export_path.endswith(".prom") else tracer.export_json())
+                print(f"   Metrics written to {export_path}")
         
         # Competition requirements summary
         print(f"\n🎯 COMPETITION REQUIREMENTS DEMONSTRATED:")
@@ -139,5 +164,51 @@ async def main():
         print(f"❌ Error during research: {e}")
         logging.error(f"Research error: {e}")
 
+async def run_batch(args):
+    """Batch mode: stream queries from JSONL, write one JSONL result per session"""
+    orchestrator = ResearchOrchestrator()
+    runner = BatchRunner(orchestrator.process, concurrency=args.concurrency, deadline=args.deadline,
+                         checkpoint_path=args.checkpoint, checkpoint_every=args.checkpoint_every)
+    try:
+        stats = await runner.run(args.batch, args.output)
+    finally:
+        await orchestrator.search_agent.close()
+    logging.info(f"Batch finished: {stats}")
+    return 0 if not stats["failed"] and not stats["timed_out"] else 1
+
+async def run_service(args):
+    """Service mode: keep one warm orchestrator and serve research requests over local HTTP"""
+    service = ResearchService(max_in_flight=args.concurrency)
+    try:
+        base_url = await service.start(args.host, args.port)
+        print(f"🌐 Research service ready on {base_url} (POST /research, GET /research/<id>[/stream])")
+        await asyncio.Event().wait()
+    finally:
+        await service.stop()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Multi-Agent Research Assistant")
+    parser.add_argument("--batch", metavar="INPUT",
+                        help="run every query in a JSONL file (- for stdin) instead of the demo")
+    parser.add_argument("--serve", action="store_true", help="run as a long-lived local HTTP service")
+    parser.add_argument("--host", help="service bind address (default: SERVICE_HOST or 127.0.0.1)")
+    parser.add_argument("--port", type=int, help="service port (default: SERVICE_PORT or 8080)")
+    parser.add_argument("--output", default="-", help="JSONL results file, appended to (default: stdout)")
+    parser.add_argument("--concurrency", type=int,
+                        help="sessions in flight (default: BATCH_CONCURRENCY or 16; SERVICE_MAX_IN_FLIGHT or 64 with --serve)")
+    parser.add_argument("--deadline", type=float, help="per-session timeout in seconds")
+    parser.add_argument("--checkpoint", help="checkpoint file used to resume an interrupted batch")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="sessions between checkpoint saves")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.batch:
+        sys.exit(asyncio.run(run_batch(args)))
+    if args.serve:
+        try:
+            asyncio.run(run_service(args))
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,335 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+from tools.cache_dir import cache_path
+
+# SQLite sessions past their TTL are deleted at most this often, rather than on every write
+EXPIRE_INTERVAL = 60.0
+
+
+class SessionRecord:
+    """Compact in-memory form of a research session"""
+
+    __slots__ = ("session_id", "query", "status", "agents_involved", "results",
+                 "created_at", "updated_at", "size", "extra")
+
+    FIELDS = ("session_id", "query", "status", "agents_involved", "results")
+
+    def __init__(self, session: Dict[str, Any]):
+        now = time.time()
+        self.session_id = session["session_id"]
+        self.query = session.get("query", "")
+        self.status = session.get("status", "initialized")
+        self.agents_involved = tuple(session.get("agents_involved", ()))
+        self.results = session.get("results", {})
+        # Anything else the orchestrator attached (timings, token usage, ...)
+        self.extra = {k: v for k, v in session.items() if k not in self.FIELDS} or None
+        self.created_at = now
+        self.updated_at = now
+        self.size = estimate_size(session)
+
+    def to_dict(self) -> Dict[str, Any]:
+        session = {
+            "session_id": self.session_id,
+            "query": self.query,
+            "status": self.status,
+            "agents_involved": list(self.agents_involved),
+            "results": self.results
+        }
+        if self.extra:
+            session.update(self.extra)
+        return session
+
+
+def estimate_size(session: Dict[str, Any]) -> int:
+    """Approximate footprint of a session, measured as its serialized length"""
+    return len(json.dumps(session, default=str))
+
+
+class SessionStore(ABC):
+    """Bounded store for research sessions, addressable like a dict by session id"""
+
+    backend = "base"
+
+    def __init__(self, max_sessions: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.max_sessions = int(max_sessions or os.getenv("MAX_SESSIONS", 1000))
+        self.ttl_seconds = float(ttl_seconds if ttl_seconds is not None else os.getenv("SESSION_TIMEOUT", 3600))
+        self.evictions = 0
+        self.expirations = 0
+
+    @abstractmethod
+    def put(self, session: Dict[str, Any]):
+        """Insert or replace a session"""
+        pass
+
+    async def aput(self, session: Dict[str, Any]):
+        """put() for async callers; stores that block on disk override it to write in a worker thread"""
+        self.put(session)
+
+    @abstractmethod
+    def get(self, session_id: str, default: Any = None) -> Optional[Dict[str, Any]]:
+        """Return the session as a dict, or default if unknown or expired"""
+        pass
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        pass
+
+    @abstractmethod
+    def session_ids(self) -> List[str]:
+        pass
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        pass
+
+    def _expired(self, updated_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - updated_at > self.ttl_seconds
+
+    def __setitem__(self, session_id: str, session: Dict[str, Any]):
+        self.put({**session, "session_id": session_id})
+
+    def __getitem__(self, session_id: str) -> Dict[str, Any]:
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __delitem__(self, session_id: str):
+        self.delete(session_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.session_ids())
+
+    def __len__(self) -> int:
+        return len(self.session_ids())
+
+
+class MemorySessionStore(SessionStore):
+    """LRU + TTL store capped by session count and approximate bytes"""
+
+    backend = "memory"
+
+    def __init__(self, max_sessions: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        super().__init__(max_sessions, ttl_seconds)
+        self.max_bytes = int(max_bytes or os.getenv("SESSION_STORE_MAX_BYTES", 50_000_000))
+        self.total_bytes = 0
+        self._records: "OrderedDict[str, SessionRecord]" = OrderedDict()
+
+    def put(self, session: Dict[str, Any]):
+        record = SessionRecord(session)
+        previous = self._records.pop(record.session_id, None)
+        if previous is not None:
+            record.created_at = previous.created_at
+            self.total_bytes -= previous.size
+        self._records[record.session_id] = record
+        self.total_bytes += record.size
+        self._evict()
+
+    def get(self, session_id: str, default: Any = None) -> Optional[Dict[str, Any]]:
+        record = self._records.get(session_id)
+        if record is None:
+            return default
+        if self._expired(record.updated_at):
+            self._remove(session_id)
+            self.expirations += 1
+            return default
+        self._records.move_to_end(session_id)
+        return record.to_dict()
+
+    def delete(self, session_id: str):
+        self._remove(session_id)
+
+    def _remove(self, session_id: str):
+        record = self._records.pop(session_id, None)
+        if record is not None:
+            self.total_bytes -= record.size
+
+    def _evict(self):
+        # Least recently used sessions sit at the front: drop expired ones, then trim to the caps
+        while self._records:
+            oldest_id, oldest = next(iter(self._records.items()))
+            if self._expired(oldest.updated_at):
+                self._remove(oldest_id)
+                self.expirations += 1
+            elif len(self._records) > self.max_sessions or self.total_bytes > self.max_bytes:
+                self._remove(oldest_id)
+                self.evictions += 1
+            else:
+                break
+
+    def session_ids(self) -> List[str]:
+        return [sid for sid, record in self._records.items() if not self._expired(record.updated_at)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "sessions": len(self._records),
+            "approx_bytes": self.total_bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions persisted in SQLite so they survive restarts without living in RAM.
+
+    The session count is tracked as rows are written and deleted, so a put
+    only evicts once the store is over max_sessions; expired sessions are
+    deleted at most every EXPIRE_INTERVAL seconds, which also resyncs the
+    count with other processes sharing the file.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: Optional[str] = None, max_sessions: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        super().__init__(max_sessions or int(os.getenv("MAX_SESSIONS", 100_000)), ttl_seconds)
+        self.path = path or os.getenv("SESSION_DB_PATH") or cache_path("sessions.sqlite3")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, query TEXT, status TEXT, agents_involved TEXT, "
+            "results TEXT, extra TEXT, created_at REAL, updated_at REAL, accessed_at REAL, size INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)")
+        self._db.commit()
+        self._count = 0
+        self._last_expire = 0.0
+        with self._lock:
+            self._expire()
+            self._db.commit()
+
+    def put(self, session: Dict[str, Any]):
+        """Blocking: async callers use aput()"""
+        record = SessionRecord(session)
+        with self._lock:
+            exists = self._db.execute("SELECT 1 FROM sessions WHERE session_id = ?",
+                                      (record.session_id,)).fetchone() is not None
+            self._db.execute(
+                "INSERT INTO sessions (session_id, query, status, agents_involved, results, extra, "
+                "created_at, updated_at, accessed_at, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET query = excluded.query, status = excluded.status, "
+                "agents_involved = excluded.agents_involved, results = excluded.results, "
+                "extra = excluded.extra, updated_at = excluded.updated_at, "
+                "accessed_at = excluded.accessed_at, size = excluded.size",
+                (record.session_id, record.query, record.status, json.dumps(record.agents_involved),
+                 json.dumps(record.results, default=str), json.dumps(record.extra, default=str),
+                 record.created_at, record.updated_at, record.updated_at, record.size)
+            )
+            self._count += not exists
+            if time.time() - self._last_expire > EXPIRE_INTERVAL:
+                self._expire()
+            if self._count > self.max_sessions:
+                self._evict()
+            self._db.commit()
+
+    async def aput(self, session: Dict[str, Any]):
+        """Serializing and committing a session would stall the event loop, so it runs in a worker thread"""
+        await asyncio.to_thread(self.put, session)
+
+    def get(self, session_id: str, default: Any = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT query, status, agents_involved, results, extra, updated_at "
+                "FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return default
+            query, status, agents_involved, results, extra, updated_at = row
+            if self._expired(updated_at):
+                cursor = self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self._db.commit()
+                self._count -= cursor.rowcount
+                self.expirations += 1
+                return default
+            self._db.execute("UPDATE sessions SET accessed_at = ? WHERE session_id = ?", (time.time(), session_id))
+            self._db.commit()
+
+        session = {
+            "session_id": session_id,
+            "query": query,
+            "status": status,
+            "agents_involved": json.loads(agents_involved),
+            "results": json.loads(results)
+        }
+        session.update(json.loads(extra) or {})
+        return session
+
+    def delete(self, session_id: str):
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+            self._count -= cursor.rowcount
+
+    def _expire(self):
+        """Delete sessions past their TTL and recount; the caller holds the lock and commits"""
+        self._last_expire = time.time()
+        if self.ttl_seconds > 0:
+            cursor = self._db.execute("DELETE FROM sessions WHERE updated_at < ?",
+                                      (self._last_expire - self.ttl_seconds,))
+            self.expirations += cursor.rowcount
+        self._count = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def _evict(self):
+        """Drop the least recently accessed sessions down to max_sessions"""
+        cursor = self._db.execute(
+            "DELETE FROM sessions WHERE session_id IN "
+            "(SELECT session_id FROM sessions ORDER BY accessed_at LIMIT ?)",
+            (self._count - self.max_sessions,)
+        )
+        self.evictions += cursor.rowcount
+        self._count -= cursor.rowcount
+
+    def session_ids(self) -> List[str]:
+        cutoff = time.time() - self.ttl_seconds if self.ttl_seconds > 0 else 0
+        with self._lock:
+            rows = self._db.execute("SELECT session_id FROM sessions WHERE updated_at >= ?", (cutoff,)).fetchall()
+        return [row[0] for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions, approx_bytes = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        return {
+            "backend": self.backend,
+            "sessions": sessions,
+            "approx_bytes": approx_bytes,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def create_session_store(backend: Optional[str] = None) -> SessionStore:
+    """Build the store named by SESSION_STORE (memory or sqlite)"""
+    backend = (backend or os.getenv("SESSION_STORE", "memory")).lower()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"Unknown session store: {backend}")
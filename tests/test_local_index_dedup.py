@@ -0,0 +1,53 @@
+import os
+import unittest
+from unittest import mock
+
+from agents.research_orchestrator import ResearchOrchestrator
+from agents.search_agent import SearchAgent
+from memory.session_store import MemorySessionStore
+from tools.bm25_index import BM25Index
+from tools.dedup_index import DuplicateIndex
+from tools.search_backends import SimulatedSearchBackend
+
+
+class LocalIndexDedupTest(unittest.IsolatedAsyncioTestCase):
+    """Local index hits are earlier sessions' results; cross-session dedup must not empty them"""
+
+    async def asyncSetUp(self):
+        with mock.patch.dict(os.environ, {"SEMANTIC_CACHE_ENABLED": "false"}):
+            self.search_agent = SearchAgent(backend=SimulatedSearchBackend(latency=0.0),
+                                            local_index=BM25Index(in_memory=True))
+            self.orchestrator = ResearchOrchestrator(session_store=MemorySessionStore(),
+                                                     search_agent=self.search_agent,
+                                                     dedup_index=DuplicateIndex(capacity=1000))
+        self.search_agent.local_min_coverage = 0.5
+        self.orchestrator.max_results = 2
+
+    async def asyncTearDown(self):
+        await self.search_agent.close()
+
+    async def test_local_hits_survive_cross_session_dedup(self):
+        first = await self.orchestrator.process("climate carbon")
+        self.assertNotEqual(first["results"]["search"]["backend"], "local")
+        # Let the background index update land before the next session searches locally
+        await self.search_agent.close()
+
+        second = await self.orchestrator.process("climate carbon")
+        search = second["results"]["search"]
+        self.assertEqual(search["backend"], "local")
+        self.assertEqual(search["total_found"], 2)
+        self.assertEqual(len(search["results"]), 2)
+        self.assertNotIn("duplicates", second["results"])
+
+    async def test_repeated_web_results_are_marked_not_dropped(self):
+        self.search_agent.local_index = None
+        first = await self.orchestrator.process("climate carbon")
+        second = await self.orchestrator.process("climate carbon")
+        search = second["results"]["search"]
+        self.assertEqual(len(search["results"]), search["total_found"])
+        self.assertEqual(len(search["results"]), len(first["results"]["search"]["results"]))
+        self.assertTrue(all("duplicate" in result for result in search["results"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import asyncio
+import time
+import unittest
+
+from benchmarks.fakes import FakeGenAI, FakeQuotaError
+from tools.rate_limiter import RateLimiter
+
+
+class ThrottlingBackend:
+    """Answers with a 429 for the first `throttles` calls, then succeeds"""
+
+    def __init__(self, throttles: int, retry_after: float):
+        self.throttles = throttles
+        self.retry_after = retry_after
+        self.calls = 0
+
+    async def send(self) -> str:
+        self.calls += 1
+        if self.calls <= self.throttles:
+            raise FakeQuotaError(f"429 Resource has been exhausted. Please retry in {self.retry_after}s")
+        return "ok"
+
+
+class RateLimiterTest(unittest.IsolatedAsyncioTestCase):
+    """RateLimiter against fake backends that throttle"""
+
+    async def test_every_call_eventually_succeeds(self):
+        backend = FakeGenAI(["models/gemini-2.5-flash"], latency=0.01, throttle_per_second=20, retry_after=0.2)
+        model = backend.GenerativeModel("models/gemini-2.5-flash")
+        # Configured 50% above what the backend accepts
+        limiter = RateLimiter(requests_per_minute=20 * 90, max_retries=10, base_delay=0.05, max_delay=1.0)
+
+        responses = await asyncio.gather(*(limiter.call(lambda i=i: model.generate_content_async(f"snippet {i}"))
+                                           for i in range(60)))
+
+        self.assertEqual(len(responses), 60)
+        self.assertTrue(all(response.text for response in responses))
+        self.assertGreater(backend.throttled, 0)
+        self.assertEqual(limiter.stats["succeeded"], 60)
+        self.assertEqual(limiter.stats["failed"], 0)
+
+    async def test_rate_scale_drops_after_429s_and_recovers(self):
+        backend = ThrottlingBackend(throttles=3, retry_after=0)
+        limiter = RateLimiter(requests_per_minute=60000, max_retries=5, base_delay=0.001, cooldown=0.0)
+
+        await limiter.call(backend.send)
+        self.assertEqual(limiter.stats["throttled"], 3)
+        self.assertLess(limiter.get_stats()["rate_scale"], 0.5)
+
+        for _ in range(50):
+            await limiter.call(backend.send)
+        self.assertEqual(limiter.get_stats()["rate_scale"], 1.0)
+
+    async def test_retry_after_is_honored(self):
+        backend = ThrottlingBackend(throttles=1, retry_after=0.3)
+        limiter = RateLimiter(requests_per_minute=60000, max_retries=2, base_delay=0.001)
+
+        started = time.monotonic()
+        first = asyncio.ensure_future(limiter.call(backend.send))
+        await asyncio.sleep(0.05)
+        # A call arriving during the pause waits for it too
+        self.assertEqual(await limiter.call(backend.send), "ok")
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertEqual(await first, "ok")
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertEqual(backend.calls, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
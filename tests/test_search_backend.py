@@ -0,0 +1,89 @@
+import asyncio
+import os
+import time
+import unittest
+from unittest import mock
+
+from aiohttp import web
+
+from agents.search_agent import SearchAgent
+from tools.search_backends import HttpSearchBackend
+
+RTT = 0.2
+QUERIES = 20
+MAX_PAGE_BYTES = 64 * 1024
+MAX_TEXT_CHARS = 5000
+
+
+class HttpSearchBackendTest(unittest.IsolatedAsyncioTestCase):
+    """HttpSearchBackend against a local stub server that delays every request by one round trip"""
+
+    async def asyncSetUp(self):
+        self.requests = 0
+        app = web.Application()
+        app.router.add_get("/search", self.handle_search)
+        app.router.add_get("/page/{page_id}", self.handle_page)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        with mock.patch.dict(os.environ, {"PAGE_STORE_ENABLED": "false"}):
+            self.backend = HttpSearchBackend(search_url=f"{self.base}/search?q={{query}}&format=json",
+                                             per_host_limit=QUERIES, max_page_bytes=MAX_PAGE_BYTES,
+                                             max_text_chars=MAX_TEXT_CHARS)
+        self.agent = SearchAgent(backend=self.backend)
+
+    async def asyncTearDown(self):
+        await self.agent.close()
+        await self.runner.cleanup()
+
+    async def handle_search(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(RTT)
+        query = request.query.get("q", "")
+        return web.json_response({"results": [
+            {"title": f"{query} result {i}", "url": f"{self.base}/page/{i}", "content": f"Snippet {i}"}
+            for i in range(5)
+        ]})
+
+    async def handle_page(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        await asyncio.sleep(RTT)
+        response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+        await response.prepare(request)
+        try:
+            await response.write(b"<html><head><title>Stub page</title></head><body>")
+            for _ in range(100):
+                await response.write(b"<p>Renewable energy forecasting.</p>" * 100)
+            await response.write(b"</body></html>")
+        except ConnectionError:
+            pass  # The client stopped reading at its byte cap
+        return response
+
+    async def test_parallel_queries_take_about_one_round_trip(self):
+        started = time.perf_counter()
+        searches = await self.agent.parallel_searches([f"renewable energy topic {i}" for i in range(QUERIES)])
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(searches["successful_searches"], QUERIES)
+        self.assertEqual(self.requests, QUERIES)
+        for query, result in searches["results"].items():
+            self.assertEqual(result["backend"], "http")
+            self.assertEqual(len(result["results"]), 2)
+            self.assertEqual(result["results"][0]["title"], f"{query} result 0")
+        self.assertLess(elapsed, 2 * RTT)
+
+    async def test_page_body_is_cut_at_max_page_bytes(self):
+        page = await self.backend.fetch(f"{self.base}/page/0")
+
+        self.assertEqual(page["status"], 200)
+        self.assertEqual(page["bytes_read"], MAX_PAGE_BYTES)
+        self.assertTrue(page["truncated"])
+        self.assertEqual(page["title"], "Stub page")
+        self.assertIn("Renewable energy forecasting.", page["text"])
+        self.assertEqual(len(page["text"]), MAX_TEXT_CHARS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import aiohttp
+
+from agents.research_orchestrator import ResearchOrchestrator
+from agents.search_agent import SearchAgent
+from agents.service import ResearchService
+from benchmarks.fakes import FakeGenAI, FakeSearchBackend
+from memory.session_store import MemorySessionStore
+from tools.gemini_tools import GeminiTools
+from tools.model_selection import ModelSelectionCache
+from tools.rate_limiter import RateLimiter
+from tools.response_cache import ResponseCache
+
+LLM_LATENCY = 0.2
+
+
+class ResearchServiceTest(unittest.IsolatedAsyncioTestCase):
+    """ResearchService end to end on localhost, with fake search and Gemini backends"""
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        env = {"GEMINI_API_KEY": "test-fake-api-key", "DEDUP_ENABLED": "false",
+               "SEMANTIC_CACHE_ENABLED": "false", "LOCAL_INDEX_ENABLED": "false"}
+        # The key is read when the service warms GeminiTools, so the environment stays patched
+        environment = mock.patch.dict(os.environ, env)
+        environment.start()
+        self.addCleanup(environment.stop)
+        gemini_tools = GeminiTools(genai_backend=FakeGenAI(["models/gemini-2.5-flash"], latency=LLM_LATENCY,
+                                                           list_latency=0.0),
+                                   model_cache=ModelSelectionCache(path=os.path.join(self.tmp.name, "models.json")),
+                                   response_cache=ResponseCache(use_disk=False),
+                                   rate_limiter=RateLimiter(requests_per_minute=10**9, max_retries=0))
+        orchestrator = ResearchOrchestrator(gemini_tools=gemini_tools, session_store=MemorySessionStore(),
+                                            search_agent=SearchAgent(backend=FakeSearchBackend(latency=0.01)))
+        self.service = ResearchService(orchestrator=orchestrator, max_in_flight=1, max_queued=1)
+        self.base_url = await self.service.start(host="127.0.0.1", port=0)
+        self.http = aiohttp.ClientSession()
+
+    async def asyncTearDown(self):
+        await self.http.close()
+        await self.service.stop()
+        self.tmp.cleanup()
+
+    async def submit(self, query: str) -> aiohttp.ClientResponse:
+        async with self.http.post(f"{self.base_url}/research", json={"query": query}) as response:
+            await response.read()
+            return response
+
+    async def poll(self, job_id: str) -> dict:
+        async with self.http.get(f"{self.base_url}/research/{job_id}") as response:
+            self.assertEqual(response.status, 200)
+            return await response.json()
+
+    async def test_submit_then_poll_until_completed(self):
+        async with self.http.post(f"{self.base_url}/research", json={"query": "AI for grid storage"}) as response:
+            self.assertEqual(response.status, 202)
+            job = await response.json()
+        self.assertIn(job["status"], ("queued", "running"))
+
+        for _ in range(100):
+            job = await self.poll(job["job_id"])
+            if job["status"] == "completed":
+                break
+            await asyncio.sleep(0.05)
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["session"]["query"], "AI for grid storage")
+        self.assertEqual(job["session"]["status"], "completed")
+        self.assertTrue(job["session"]["results"]["search"]["results"])
+        self.assertIn("[models/gemini-2.5-flash]", job["session"]["results"]["analysis"])
+
+    async def test_stream_replays_events_and_ends_with_job_finished(self):
+        async with self.http.post(f"{self.base_url}/research", json={"query": "AI for grid storage"}) as response:
+            job = await response.json()
+        # Let the job make progress first, so the stream has events to replay
+        await asyncio.sleep(LLM_LATENCY)
+
+        async with self.http.get(f"{self.base_url}{job['stream']}") as response:
+            self.assertEqual(response.status, 200)
+            events = [json.loads(line) async for line in response.content]
+        names = [event["event"] for event in events]
+        self.assertEqual(names[0], "job_status")
+        self.assertEqual(names[1:3], ["session_started", "search_done"])
+        self.assertIn("analysis_chunk", names)
+        self.assertIn("summary_chunk", names)
+        self.assertEqual(names[-2], "session_completed")
+        self.assertEqual(names[-1], "job_finished")
+        self.assertEqual(events[-1]["status"], "completed")
+
+    async def test_delete_cancels_a_job(self):
+        async with self.http.post(f"{self.base_url}/research", json={"query": "AI for grid storage"}) as response:
+            job = await response.json()
+        await asyncio.sleep(0.05)
+
+        async with self.http.delete(f"{self.base_url}/research/{job['job_id']}") as response:
+            self.assertEqual(response.status, 200)
+            self.assertEqual((await response.json())["status"], "cancelled")
+        job = await self.poll(job["job_id"])
+        self.assertEqual(job["status"], "cancelled")
+        self.assertNotIn("session", job)
+        self.assertEqual(self.service.stats["cancelled"], 1)
+
+    async def test_submissions_past_the_admission_limits_get_503(self):
+        accepted = [await self.submit(f"AI for grid storage {i}") for i in range(2)]
+        rejected = await self.submit("AI for grid storage 2")
+
+        self.assertEqual([response.status for response in accepted], [202, 202])
+        self.assertEqual(rejected.status, 503)
+        self.assertEqual(rejected.headers["Retry-After"], "1")
+        self.assertEqual(self.service.stats["rejected"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
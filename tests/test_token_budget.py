@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from agents.research_orchestrator import ResearchOrchestrator
+from agents.search_agent import SearchAgent
+from benchmarks.fakes import FakeGenAI, FakeSearchBackend
+from memory.session_store import MemorySessionStore
+from tools.gemini_tools import GeminiTools
+from tools.model_selection import ModelSelectionCache
+from tools.rate_limiter import RateLimiter
+from tools.response_cache import ResponseCache
+from tools.token_budget import current_account
+
+
+class StreamingTokenAccountingTest(unittest.IsolatedAsyncioTestCase):
+    """process_stream charges its Gemini calls to the session without leaking the account to the consumer"""
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        environment = mock.patch.dict(os.environ, {"GEMINI_API_KEY": "test-fake-api-key", "DEDUP_ENABLED": "false",
+                                                   "SEMANTIC_CACHE_ENABLED": "false"})
+        environment.start()
+        self.addCleanup(environment.stop)
+        gemini_tools = GeminiTools(genai_backend=FakeGenAI(["models/gemini-2.5-flash"], latency=0.01,
+                                                           list_latency=0.0),
+                                   model_cache=ModelSelectionCache(path=os.path.join(self.tmp.name, "models.json")),
+                                   response_cache=ResponseCache(use_disk=False),
+                                   rate_limiter=RateLimiter(requests_per_minute=10**9, max_retries=0))
+        await gemini_tools.ensure_initialized()
+        self.orchestrator = ResearchOrchestrator(gemini_tools=gemini_tools, session_store=MemorySessionStore(),
+                                                 search_agent=SearchAgent(backend=FakeSearchBackend(latency=0.01)))
+
+    async def test_account_stays_inside_the_stream(self):
+        session = None
+        async for event in self.orchestrator.process_stream("AI for grid storage"):
+            self.assertIsNone(current_account())
+            if event["event"] == "session_completed":
+                session = event["session"]
+        self.assertEqual(session["token_usage"]["calls"], 2)
+        self.assertGreater(session["token_usage"]["total_tokens"], 0)
+
+    async def test_abandoned_stream_closes_cleanly(self):
+        stream = self.orchestrator.process_stream("AI for grid storage")
+        async for event in stream:
+            if event["event"] == "analysis_chunk":
+                break
+        await stream.aclose()
+        self.assertIsNone(current_account())
+
+
+if __name__ == "__main__":
+    unittest.main()
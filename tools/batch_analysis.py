@@ -0,0 +1,93 @@
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .rate_limiter import estimate_tokens
+
+BATCH_PROMPT = """You will analyze {count} documents independently. Task for every document:
+{instruction}
+
+Each document is wrapped in <<<DOC n>>> ... <<<END DOC n>>> markers.
+Respond with only a JSON array, one object per document, in this form:
+[{{"id": <n>, "analysis": "<your analysis of document n>"}}]
+
+{documents}"""
+
+DOC_TEMPLATE = "<<<DOC {id}>>>\n{content}\n<<<END DOC {id}>>>"
+
+# Fallback format if the model ignores the JSON instruction: "### DOC n" headings
+SECTION_PATTERN = re.compile(r"^#+\s*DOC\s+(\d+)\s*$", re.MULTILINE)
+
+
+def instruction_from_template(template: str) -> str:
+    """Turn a single-document prompt template into a per-document instruction"""
+    return template.replace("{content}", "").strip().rstrip(":").replace("this text", "the document")
+
+
+def pack_documents(documents: List[Tuple[int, str]], token_budget: int, preamble_tokens: int = 150,
+                   max_docs: int = 25) -> List[List[Tuple[int, str]]]:
+    """Greedily pack (id, text) pairs into batches that fit the token budget.
+
+    A document too large to share a request gets a batch of its own.
+    """
+    batches: List[List[Tuple[int, str]]] = []
+    current: List[Tuple[int, str]] = []
+    used = preamble_tokens
+    for doc_id, content in documents:
+        cost = estimate_tokens(content) + 12  # markers and id
+        if current and (used + cost > token_budget or len(current) >= max_docs):
+            batches.append(current)
+            current, used = [], preamble_tokens
+        current.append((doc_id, content))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_prompt(batch: List[Tuple[int, str]], instruction: str) -> str:
+    documents = "\n\n".join(DOC_TEMPLATE.format(id=doc_id, content=content) for doc_id, content in batch)
+    return BATCH_PROMPT.format(count=len(batch), instruction=instruction, documents=documents)
+
+
+def parse_batch_response(text: str, expected_ids: List[int]) -> Dict[int, str]:
+    """Split a batched answer back into per-document results; missing ids are simply absent"""
+    expected = set(expected_ids)
+    results: Dict[int, str] = {}
+
+    # Prefer the JSON array, tolerating ```json fences and chatter around it
+    start, end = text.find("["), text.rfind("]")
+    if start != -1 and end > start:
+        try:
+            items = json.loads(text[start:end + 1])
+        except ValueError:
+            items = []
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                doc_id = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            analysis = item.get("analysis")
+            if doc_id in expected and isinstance(analysis, str) and analysis.strip():
+                results[doc_id] = analysis.strip()
+        if results:
+            return results
+
+    headings = list(SECTION_PATTERN.finditer(text))
+    for i, heading in enumerate(headings):
+        doc_id = int(heading.group(1))
+        body_end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        body = text[heading.end():body_end].strip()
+        if doc_id in expected and body:
+            results[doc_id] = body
+    return results
+
+
+def split_batch(batch: List[Tuple[int, str]]) -> Optional[Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]]:
+    """Halve a batch that was rejected or came back unparseable; None for a single document"""
+    if len(batch) < 2:
+        return None
+    middle = len(batch) // 2
+    return batch[:middle], batch[middle:]
@@ -0,0 +1,505 @@
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cache_dir import cache_path
+from .dedup_index import normalize_url, url_hash
+from .semantic_cache import STOPWORDS, TOKEN_PATTERN, stem
+
+# Raw word -> term id lookups are memoized; the memo is dropped when it grows past this
+WORD_CACHE_LIMIT = 1_000_000
+
+# Above this share of the corpus, a query's postings are summed into a dense score array
+DENSE_SCORING_SHARE = 1 / 16
+
+RECORD_FIELDS = ("title", "url", "snippet", "source")
+
+
+class _Segment:
+    """Immutable postings of a contiguous range of documents, in CSR form.
+
+    terms holds the sorted term ids present in the segment; the postings of
+    terms[i] are doc_ids/tfs[offsets[i]:offsets[i + 1]], in document order.
+    """
+
+    __slots__ = ("terms", "offsets", "doc_ids", "tfs", "url_hashes", "doc_start", "doc_count", "name")
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                 url_hashes: np.ndarray, doc_start: int, doc_count: int, name: Optional[str] = None):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.url_hashes = url_hashes
+        self.doc_start = doc_start
+        self.doc_count = doc_count
+        self.name = name
+
+    @classmethod
+    def build(cls, posting_terms: np.ndarray, posting_docs: np.ndarray, posting_tfs: np.ndarray,
+              url_hashes: np.ndarray, doc_start: int, doc_count: int) -> "_Segment":
+        # Postings arrive in document order; a stable sort by term keeps each list sorted by document
+        order = np.argsort(posting_terms, kind="stable")
+        sorted_terms = posting_terms[order]
+        terms, starts = np.unique(sorted_terms, return_index=True)
+        offsets = np.append(starts, len(sorted_terms)).astype(np.int64)
+        return cls(terms.astype(np.int32), offsets, posting_docs[order].astype(np.int32),
+                   posting_tfs[order].astype(np.uint16), np.sort(url_hashes.astype(np.uint64)), doc_start, doc_count)
+
+    @classmethod
+    def merge(cls, segments: List["_Segment"]) -> "_Segment":
+        """One segment from consecutive ones, in linear time: each posting list is scattered straight to its place"""
+        terms = np.unique(np.concatenate([segment.terms for segment in segments]))
+        positions = [np.searchsorted(terms, segment.terms) for segment in segments]
+        counts = np.zeros(len(terms), dtype=np.int64)
+        for segment, position in zip(segments, positions):
+            counts[position] += np.diff(segment.offsets)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        # Earlier segments hold earlier documents, so appending per term keeps every list in document order
+        cursor = offsets[:-1].copy()
+        for segment, position in zip(segments, positions):
+            segment_counts = np.diff(segment.offsets)
+            target = (np.repeat(cursor[position] - segment.offsets[:-1], segment_counts)
+                      + np.arange(len(segment.doc_ids), dtype=np.int64))
+            doc_ids[target] = segment.doc_ids
+            tfs[target] = segment.tfs
+            cursor[position] += segment_counts
+        return cls(terms.astype(np.int32), offsets, doc_ids, tfs,
+                   np.sort(np.concatenate([segment.url_hashes for segment in segments])),
+                   segments[0].doc_start, sum(segment.doc_count for segment in segments))
+
+    def postings(self, term_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(query term index, doc ids, tfs) of every posting of the given sorted term ids"""
+        positions = np.searchsorted(self.terms, term_ids)
+        positions[positions == len(self.terms)] = 0
+        found = np.flatnonzero(self.terms[positions] == term_ids) if len(self.terms) else np.zeros(0, dtype=np.int64)
+        if not len(found):
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        starts = self.offsets[positions[found]]
+        ends = self.offsets[positions[found] + 1]
+        query_index = np.repeat(found, ends - starts)
+        slices = [slice(start, end) for start, end in zip(starts, ends)]
+        return (query_index, np.concatenate([self.doc_ids[s] for s in slices]),
+                np.concatenate([self.tfs[s] for s in slices]))
+
+    def has_url(self, hashed: int) -> bool:
+        position = np.searchsorted(self.url_hashes, np.uint64(hashed))
+        return position < len(self.url_hashes) and self.url_hashes[position] == hashed
+
+    @property
+    def nbytes(self) -> int:
+        return self.terms.nbytes + self.offsets.nbytes + self.doc_ids.nbytes + self.tfs.nbytes + self.url_hashes.nbytes
+
+    def save(self, directory: str):
+        tmp_directory = f"{directory}.tmp"
+        os.makedirs(tmp_directory, exist_ok=True)
+        for field in ("terms", "offsets", "doc_ids", "tfs", "url_hashes"):
+            np.save(os.path.join(tmp_directory, f"{field}.npy"), getattr(self, field))
+        os.replace(tmp_directory, directory)
+
+    @classmethod
+    def load(cls, directory: str, name: str, doc_start: int, doc_count: int) -> "_Segment":
+        # Memory-mapped: a large index opens instantly and pages in only the postings queries touch
+        arrays = [np.load(os.path.join(directory, f"{field}.npy"), mmap_mode="r")
+                  for field in ("terms", "offsets", "doc_ids", "tfs", "url_hashes")]
+        return cls(*arrays, doc_start=doc_start, doc_count=doc_count, name=name)
+
+
+class BM25Index:
+    """Incremental BM25 index over search results gathered by earlier sessions.
+
+    Appended documents go to an in-memory buffer of flat posting arrays,
+    which is searchable at once and becomes an immutable CSR segment every
+    segment_docs documents. Segments are merged in tiers (merge_factor of a
+    size into one of the next size), like an LSM tree, so appends never
+    rebuild the index and queries touch a handful of segments. Scoring
+    gathers the postings of the query terms from every segment and sums
+    BM25 contributions with numpy; top-k comes from argpartition.
+
+    Documents are deduplicated by normalized URL. Their records (title, URL,
+    snippet, source) are appended to a file and read back only for the
+    top-k. save() snapshots the index: new segments as .npy files, append-only
+    term, length and offset files, and a manifest written last, so a crash
+    mid-snapshot leaves the previous snapshot intact. Loaded segments are
+    memory-mapped.
+
+    Writers (add, save) are serialized by their own lock and hold the lock
+    searches take only to append to the buffer or swap in a new segment
+    list; merges and snapshot I/O run outside it, so searches from other
+    threads are not held up by them. Flushes, merges and snapshots block
+    the caller: async code calls add and save in a worker thread.
+    """
+
+    def __init__(self, root: Optional[str] = None, in_memory: bool = False, k1: float = 1.2, b: float = 0.75,
+                 segment_docs: Optional[int] = None, merge_factor: int = 8, content_chars: Optional[int] = None,
+                 snapshot_every: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.in_memory = in_memory
+        self.root = None if in_memory else (root or os.getenv("LOCAL_INDEX_DIR") or cache_path("bm25"))
+        self.k1 = k1
+        self.b = b
+        self.segment_docs = int(segment_docs or os.getenv("LOCAL_INDEX_SEGMENT_DOCS", 16384))
+        self.merge_factor = merge_factor
+        # Fetched page text is indexed up to this many characters; titles and snippets always are
+        self.content_chars = int(content_chars if content_chars is not None
+                                 else os.getenv("LOCAL_INDEX_CONTENT_CHARS", 2000))
+        # Documents added between automatic snapshots (0 to snapshot only on save())
+        self.snapshot_every = int(snapshot_every if snapshot_every is not None
+                                  else os.getenv("LOCAL_INDEX_SNAPSHOT_EVERY", 1000))
+        self.stats = {"documents_added": 0, "duplicates": 0, "searches": 0, "flushes": 0, "merges": 0,
+                      "snapshots": 0, "search_seconds": 0.0}
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()
+
+        self.term_ids: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self._word_ids: Dict[str, int] = {}
+        self.doc_count = 0
+        self.total_length = 0
+        self._lengths = np.zeros(1024, dtype=np.uint32)
+        self._record_ends = np.zeros(1024, dtype=np.int64)
+        self.segments: List[_Segment] = []
+        self._reset_buffer()
+
+        self._saved_docs = 0
+        self._saved_terms = 0
+        self._records_bytes = 0
+        self._records_memory = bytearray()
+        self._records_file = None
+        self._records_fd = None
+        if self.root is not None:
+            os.makedirs(os.path.join(self.root, "segments"), exist_ok=True)
+            self._load()
+            records_path = os.path.join(self.root, "records.jsonl")
+            self._records_file = open(records_path, "ab")
+            self._records_fd = os.open(records_path, os.O_RDONLY)
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def _reset_buffer(self):
+        self._buffer_terms = array("i")
+        self._buffer_docs = array("i")
+        self._buffer_tfs = array("H")
+        self._buffer_urls = array("Q")
+        self._buffer_url_set = set()
+        self._buffer_start = self.doc_count
+
+    # Tokens
+
+    def _term_id(self, word: str, create: bool) -> int:
+        """Term id of a lowercased word (-1 for stopwords and, unless create, unknown terms)"""
+        term = self._word_ids.get(word)
+        if term is not None:
+            return term
+        if word in STOPWORDS:
+            term = -1
+        else:
+            stemmed = stem(word)
+            term = self.term_ids.get(stemmed, -1)
+            if term < 0:
+                if not create:
+                    return -1
+                term = len(self.terms)
+                self.term_ids[stemmed] = term
+                self.terms.append(stemmed)
+        if len(self._word_ids) >= WORD_CACHE_LIMIT:
+            self._word_ids.clear()
+        self._word_ids[word] = term
+        return term
+
+    def _document_text(self, document: Dict[str, Any]) -> str:
+        parts = [document.get("title") or "", document.get("snippet") or ""]
+        if self.content_chars and document.get("content"):
+            parts.append(document["content"][:self.content_chars])
+        return " ".join(parts)
+
+    # Appends
+
+    def _known_url(self, hashed: int) -> bool:
+        return hashed in self._buffer_url_set or any(segment.has_url(hashed) for segment in self.segments)
+
+    def _grow(self, needed: int):
+        if needed > len(self._lengths):
+            size = max(needed, 2 * len(self._lengths))
+            self._lengths = np.resize(self._lengths, size)
+            self._record_ends = np.resize(self._record_ends, size)
+
+    def add(self, documents: List[Dict[str, Any]]) -> int:
+        """Index search results (title, url, snippet and optional content); returns how many were new"""
+        added = 0
+        records = []
+        with self._write_lock, self._lock:
+            self._grow(self.doc_count + len(documents))
+            for document in documents:
+                url = document.get("url") or ""
+                hashed = url_hash(normalize_url(url)) if url else None
+                if hashed is not None and self._known_url(hashed):
+                    self.stats["duplicates"] += 1
+                    continue
+                words = TOKEN_PATTERN.findall(self._document_text(document).lower())
+                counts = Counter(term for term in (self._term_id(word, True) for word in words) if term >= 0)
+                if not counts:
+                    continue
+                doc_id = self.doc_count
+                self._buffer_terms.extend(counts.keys())
+                self._buffer_docs.extend([doc_id] * len(counts))
+                self._buffer_tfs.extend(min(tf, 0xFFFF) for tf in counts.values())
+                if hashed is not None:
+                    self._buffer_urls.append(hashed)
+                    self._buffer_url_set.add(hashed)
+                length = sum(counts.values())
+                self._lengths[doc_id] = length
+                self.total_length += length
+                record = json.dumps({field: document.get(field) or "" for field in RECORD_FIELDS},
+                                    ensure_ascii=False).encode("utf-8") + b"\n"
+                records.append(record)
+                self._records_bytes += len(record)
+                self._record_ends[doc_id] = self._records_bytes
+                self.doc_count += 1
+                added += 1
+            if records:
+                if self._records_file is not None:
+                    self._records_file.write(b"".join(records))
+                    self._records_file.flush()
+                else:
+                    self._records_memory.extend(b"".join(records))
+            self.stats["documents_added"] += added
+        with self._write_lock:
+            if self.doc_count - self._buffer_start >= self.segment_docs:
+                self._flush()
+            if self.snapshot_every and self.root is not None and self.doc_count - self._saved_docs >= self.snapshot_every:
+                self.save()
+        return added
+
+    def _flush(self):
+        """Turn the buffer into a segment and merge full tiers (caller holds the write lock)"""
+        with self._lock:
+            if self.doc_count == self._buffer_start:
+                return
+            self.segments = self.segments + [_Segment.build(
+                np.array(self._buffer_terms, dtype=np.int32), np.array(self._buffer_docs, dtype=np.int32),
+                np.array(self._buffer_tfs, dtype=np.uint16), np.array(self._buffer_urls, dtype=np.uint64),
+                self._buffer_start, self.doc_count - self._buffer_start
+            )]
+            self._reset_buffer()
+        self.stats["flushes"] += 1
+        while True:
+            segments = self.segments
+            level = self._level(segments[-1])
+            run = 1
+            while run < len(segments) and self._level(segments[-run - 1]) == level:
+                run += 1
+            if run < self.merge_factor:
+                break
+            # Segments are immutable, so searches keep using the old ones until the swap
+            merged = _Segment.merge(segments[-run:])
+            with self._lock:
+                self.segments = segments[:-run] + [merged]
+            self.stats["merges"] += 1
+
+    def _level(self, segment: _Segment) -> int:
+        return int(math.log(max(1.0, segment.doc_count / self.segment_docs), self.merge_factor) + 1e-9)
+
+    # Queries
+
+    def search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        """Top-k documents by BM25, each with its record, score and the share of query terms it contains"""
+        started = time.perf_counter()
+        words = {word for word in TOKEN_PATTERN.findall(query.lower()) if word not in STOPWORDS}
+        query_terms = {stem(word) for word in words}
+        with self._lock:
+            self.stats["searches"] += 1
+            term_ids = np.array(sorted({self.term_ids[term] for term in query_terms if term in self.term_ids}),
+                                dtype=np.int32)
+            if not len(term_ids) or not self.doc_count or k <= 0:
+                return []
+            parts = [segment.postings(term_ids) for segment in self.segments]
+            if self.doc_count > self._buffer_start:
+                buffer_terms = np.array(self._buffer_terms, dtype=np.int32)
+                selected = np.flatnonzero(np.isin(buffer_terms, term_ids))
+                parts.append((np.searchsorted(term_ids, buffer_terms[selected]),
+                              np.array(self._buffer_docs, dtype=np.int32)[selected],
+                              np.array(self._buffer_tfs, dtype=np.uint16)[selected]))
+            query_index = np.concatenate([part[0] for part in parts])
+            docs = np.concatenate([part[1] for part in parts]).astype(np.int64)
+            tfs = np.concatenate([part[2] for part in parts]).astype(np.float32)
+            if not len(docs):
+                return []
+
+            count = self.doc_count
+            df = np.bincount(query_index, minlength=len(term_ids))
+            idf = np.log1p((count - df + 0.5) / (df + 0.5)).astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[docs] / (self.total_length / count))
+            contributions = idf[query_index] * tfs * (self.k1 + 1) / (tfs + norm)
+
+            if len(docs) > count * DENSE_SCORING_SHARE:
+                scores = np.bincount(docs, weights=contributions, minlength=count)
+                matched = np.bincount(docs, minlength=count)
+                candidates = np.flatnonzero(matched)
+                scores, matched = scores[candidates], matched[candidates]
+            else:
+                candidates, inverse = np.unique(docs, return_inverse=True)
+                scores = np.bincount(inverse, weights=contributions)
+                matched = np.bincount(inverse)
+            if len(candidates) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(candidates))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results = []
+            for position in top:
+                doc_id = int(candidates[position])
+                results.append({
+                    **self._record(doc_id),
+                    "doc_id": doc_id,
+                    "score": round(float(scores[position]), 4),
+                    "coverage": round(int(matched[position]) / len(query_terms), 4)
+                })
+        self.stats["search_seconds"] += time.perf_counter() - started
+        return results
+
+    def _record(self, doc_id: int) -> Dict[str, Any]:
+        start = int(self._record_ends[doc_id - 1]) if doc_id else 0
+        end = int(self._record_ends[doc_id])
+        if self._records_fd is not None:
+            raw = os.pread(self._records_fd, end - start, start)
+        else:
+            raw = bytes(self._records_memory[start:end])
+        return json.loads(raw)
+
+    # Snapshots
+
+    def _path(self, *parts: str) -> str:
+        return os.path.join(self.root, *parts)
+
+    def save(self):
+        """Snapshot the index to disk (no-op for in-memory indexes)"""
+        if self.root is None:
+            return
+        # Only writers change what is written here, so searches are not locked out meanwhile
+        with self._write_lock:
+            self._flush()
+            for segment in self.segments:
+                if segment.name is None:
+                    segment.name = f"{segment.doc_start:010d}-{segment.doc_count}-{uuid.uuid4().hex[:8]}"
+                    segment.save(self._path("segments", segment.name))
+            with open(self._path("terms.txt"), "a", encoding="utf-8") as f:
+                f.writelines(f"{term}\n" for term in self.terms[self._saved_terms:])
+            with open(self._path("lengths.u32"), "ab") as f:
+                self._lengths[self._saved_docs:self.doc_count].tofile(f)
+            with open(self._path("record_ends.i64"), "ab") as f:
+                self._record_ends[self._saved_docs:self.doc_count].tofile(f)
+            if self._records_file is not None:
+                self._records_file.flush()
+                os.fsync(self._records_file.fileno())
+            manifest = {
+                "version": 1,
+                "doc_count": self.doc_count,
+                "term_count": len(self.terms),
+                "total_length": self.total_length,
+                "records_bytes": self._records_bytes,
+                "segments": [{"name": segment.name, "doc_start": segment.doc_start, "doc_count": segment.doc_count}
+                             for segment in self.segments]
+            }
+            tmp_path = self._path(f"manifest.json.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self._path("manifest.json"))
+            self._saved_docs = self.doc_count
+            self._saved_terms = len(self.terms)
+            self.stats["snapshots"] += 1
+            # Segments merged away since the last snapshot are no longer referenced
+            live = {segment.name for segment in self.segments}
+            for name in os.listdir(self._path("segments")):
+                if name not in live:
+                    shutil.rmtree(self._path("segments", name), ignore_errors=True)
+
+    def _load(self):
+        """Open the last snapshot, discarding anything appended after it"""
+        try:
+            with open(self._path("manifest.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {"doc_count": 0, "term_count": 0, "total_length": 0, "records_bytes": 0, "segments": []}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Local index snapshot unreadable, starting empty: {e}")
+            manifest = {"doc_count": 0, "term_count": 0, "total_length": 0, "records_bytes": 0, "segments": []}
+        doc_count, term_count = manifest["doc_count"], manifest["term_count"]
+        for filename, size in (("lengths.u32", doc_count * 4), ("record_ends.i64", doc_count * 8),
+                               ("records.jsonl", manifest["records_bytes"])):
+            path = self._path(filename)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+        if term_count:
+            with open(self._path("terms.txt"), encoding="utf-8") as f:
+                self.terms = [line.rstrip("\n") for _, line in zip(range(term_count), f)]
+            with open(self._path("terms.txt"), "r+", encoding="utf-8") as f:
+                f.seek(sum(len(term.encode("utf-8")) + 1 for term in self.terms))
+                f.truncate()
+            self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        elif os.path.exists(self._path("terms.txt")):
+            os.truncate(self._path("terms.txt"), 0)
+        if doc_count:
+            self._grow(doc_count)
+            self._lengths[:doc_count] = np.fromfile(self._path("lengths.u32"), dtype=np.uint32, count=doc_count)
+            self._record_ends[:doc_count] = np.fromfile(self._path("record_ends.i64"), dtype=np.int64,
+                                                        count=doc_count)
+        self.segments = [_Segment.load(self._path("segments", entry["name"]), entry["name"], entry["doc_start"],
+                                       entry["doc_count"]) for entry in manifest["segments"]]
+        self.doc_count = doc_count
+        self.total_length = manifest["total_length"]
+        self._records_bytes = manifest["records_bytes"]
+        self._saved_docs = doc_count
+        self._saved_terms = term_count
+        self._reset_buffer()
+
+    def close(self):
+        with self._write_lock, self._lock:
+            self.save()
+            if self._records_file is not None:
+                self._records_file.close()
+                os.close(self._records_fd)
+                self._records_file = None
+                self._records_fd = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            searches = self.stats["searches"] or 1
+            return {
+                **{key: value for key, value in self.stats.items() if key != "search_seconds"},
+                "search_ms_avg": round(self.stats["search_seconds"] / searches * 1000, 3),
+                "documents": self.doc_count,
+                "terms": len(self.terms),
+                "segments": len(self.segments),
+                "buffered_documents": self.doc_count - self._buffer_start,
+                "postings": sum(len(segment.doc_ids) for segment in self.segments) + len(self._buffer_docs),
+                "postings_bytes": sum(segment.nbytes for segment in self.segments),
+                "root": self.root
+            }
+
+
+_shared_index: Optional[BM25Index] = None
+
+
+def get_local_index() -> BM25Index:
+    """The local index shared by every SearchAgent in this process"""
+    global _shared_index
+    if _shared_index is None:
+        _shared_index = BM25Index()
+    return _shared_index
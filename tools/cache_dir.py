@@ -0,0 +1,15 @@
+import os
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "multi-agent-research")
+
+
+def get_cache_dir() -> str:
+    """Return the directory used for on-disk caches, creating it if needed"""
+    cache_dir = os.getenv("RESEARCH_CACHE_DIR", DEFAULT_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def cache_path(filename: str) -> str:
+    """Return the full path of a file inside the cache directory"""
+    return os.path.join(get_cache_dir(), filename)
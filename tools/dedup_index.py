@@ -0,0 +1,282 @@
+import logging
+import os
+import re
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Multipliers combining the token hashes of a shingle, and the splitmix64 constants
+SHINGLE_PRIMES = (0x9E3779B185EBCA87, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x85EBCA77C2B2AE63)
+_MIX_1 = np.uint64(0x9E3779B97F4A7C15)
+_MIX_2 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_3 = np.uint64(0x94D049BB133111EB)
+
+# Query parameters that only track the visitor and never change the page; only utm_ is a prefix
+TRACKING_PARAMS = frozenset(("fbclid", "gclid", "mc_cid", "mc_eid", "ref"))
+TRACKING_PREFIXES = ("utm_",)
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL: lowercase scheme and host, no fragment, tracking parameters or trailing slash"""
+    parts = urlsplit(url.strip())
+    host = parts.hostname or ""
+    if parts.port and not (parts.scheme, parts.port) in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ))
+    return urlunsplit((parts.scheme.lower(), host, parts.path.rstrip("/") or "/", query, ""))
+
+
+def _splitmix64(values: np.ndarray) -> np.ndarray:
+    z = values + _MIX_1
+    z = (z ^ (z >> np.uint64(30))) * _MIX_2
+    z = (z ^ (z >> np.uint64(27))) * _MIX_3
+    return z ^ (z >> np.uint64(31))
+
+
+def shingle_hashes(text: str, shingle_size: int = 2) -> np.ndarray:
+    """64-bit hashes of a text's word shingles (one crc32 per token, the rest in numpy).
+
+    DuplicateIndex.signatures() does the same for a batch of texts at once.
+    """
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if not tokens:
+        return np.zeros(0, dtype=np.uint64)
+    hashes = np.fromiter((zlib.crc32(token.encode("utf-8")) for token in tokens), dtype=np.uint64,
+                         count=len(tokens))
+    size = min(shingle_size, len(SHINGLE_PRIMES), len(hashes))
+    count = len(hashes) - size + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        shingles += hashes[offset:offset + count] * np.uint64(SHINGLE_PRIMES[offset])
+    return np.unique(_splitmix64(shingles))
+
+
+def minhash(shingles: np.ndarray, multipliers: np.ndarray, increments: np.ndarray,
+            offsets: Optional[np.ndarray] = None) -> np.ndarray:
+    """MinHash under the permutations x -> a*x + b (mod 2**64), in one array op.
+
+    Each minimum is rehashed and cut to 16 bits (b-bit MinHash). With
+    offsets, shingles holds several documents back to back and one
+    signature row is returned per document.
+    """
+    permuted = shingles[:, None] * multipliers[None, :] + increments[None, :]
+    minima = permuted.min(axis=0) if offsets is None else np.minimum.reduceat(permuted, offsets, axis=0)
+    return (_splitmix64(minima) & np.uint64(0xFFFF)).astype(np.uint16)
+
+
+def url_hash(url: str) -> int:
+    """Stable 64-bit hash of a normalized URL"""
+    encoded = url.encode("utf-8")
+    return (zlib.crc32(encoded) << 32) | zlib.adler32(encoded)
+
+
+class DuplicateIndex:
+    """Bounded near-duplicate index over result URLs and text, shared across sessions.
+
+    Exact duplicates are found by normalized-URL hash and near duplicates by
+    MinHash with LSH banding: signatures agreeing on every row of any band
+    are candidates, kept when their estimated Jaccard similarity reaches
+    threshold. Tables are numpy arrays of bucket heads plus per-slot chain
+    links (about 150 bytes per document with the defaults) and slots are
+    reused oldest-first once capacity is reached, so memory is fixed and a
+    lookup touches a handful of slots however many documents are indexed.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, threshold: Optional[float] = None,
+                 num_perm: int = 32, rows: int = 2, shingle_size: int = 2, max_probe: int = 64, seed: int = 0):
+        self.logger = logging.getLogger(__name__)
+        self.capacity = int(capacity or os.getenv("DEDUP_CAPACITY", 50_000))
+        self.threshold = float(threshold if threshold is not None else os.getenv("DEDUP_THRESHOLD", 0.5))
+        if num_perm % rows:
+            raise ValueError("num_perm must be a multiple of rows")
+        self.num_perm = num_perm
+        self.rows = rows
+        self.bands = num_perm // rows
+        self.shingle_size = shingle_size
+        self.max_probe = max_probe
+        self.table_bits = max(10, (self.capacity - 1).bit_length())
+        # Odd multipliers make every a*x + b a permutation of the 64-bit shingle hashes
+        self.multipliers = _splitmix64(np.arange(1, num_perm + 1, dtype=np.uint64) + np.uint64(seed)) | np.uint64(1)
+        self.increments = _splitmix64(np.arange(1, num_perm + 1, dtype=np.uint64) + np.uint64(seed + num_perm))
+        self._row_shifts = (np.arange(rows, dtype=np.uint64) * np.uint64(16))[None, :]
+        self._band_range = np.arange(self.bands)
+
+        self.minhashes = np.zeros((self.capacity, num_perm), dtype=np.uint16)
+        self.has_signature = np.zeros(self.capacity, dtype=bool)
+        self.url_hashes = np.zeros(self.capacity, dtype=np.uint64)
+        self.sequence = np.full(self.capacity, -1, dtype=np.int64)
+        self.band_heads = np.full((self.bands, 1 << self.table_bits), -1, dtype=np.int32)
+        self.band_links = np.full((self.bands, self.capacity), -1, dtype=np.int32)
+        self.url_heads = np.full(1 << self.table_bits, -1, dtype=np.int32)
+        self.url_links = np.full(self.capacity, -1, dtype=np.int32)
+        # Small per-slot labels for reporting what a duplicate collapsed into
+        self.urls: List[Optional[str]] = [None] * self.capacity
+        self.owners: List[Any] = [None] * self.capacity
+        self.inserted = 0
+        self.stats = {"lookups": 0, "url_duplicates": 0, "near_duplicates": 0}
+
+    def __len__(self) -> int:
+        return min(self.inserted, self.capacity)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of a text, or None when it has no words"""
+        shingles = shingle_hashes(text, self.shingle_size)
+        return minhash(shingles, self.multipliers, self.increments) if len(shingles) else None
+
+    def signatures(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Signatures of many texts, with tokens hashed and shingles permuted as one batch"""
+        tokenized = [TOKEN_PATTERN.findall(text.lower()) for text in texts]
+        lengths = np.fromiter(map(len, tokenized), dtype=np.int64, count=len(tokenized))
+        # Texts shorter than one shingle take the single-text path
+        batched = lengths >= self.shingle_size
+        signatures = [self.signature(text) if not full and length else None
+                      for text, full, length in zip(texts, batched, lengths)]
+        if not batched.any():
+            return signatures
+
+        hashes = np.fromiter(
+            (zlib.crc32(token.encode("utf-8")) for tokens, full in zip(tokenized, batched) if full
+             for token in tokens),
+            dtype=np.uint64, count=int(lengths[batched].sum())
+        )
+        count = len(hashes) - self.shingle_size + 1
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(self.shingle_size):
+            shingles += hashes[offset:offset + count] * np.uint64(SHINGLE_PRIMES[offset])
+        # Drop shingles that straddle two texts
+        starts = np.concatenate(([0], np.cumsum(lengths[batched])[:-1]))
+        valid = np.ones(count, dtype=bool)
+        for offset in range(1, self.shingle_size):
+            straddling = starts[1:] - offset
+            valid[straddling[straddling >= 0]] = False
+        shingle_counts = lengths[batched] - self.shingle_size + 1
+        offsets = np.concatenate(([0], np.cumsum(shingle_counts)[:-1]))
+        rows = iter(minhash(_splitmix64(shingles[valid]), self.multipliers, self.increments, offsets))
+        return [next(rows) if full else signature for full, signature in zip(batched, signatures)]
+
+    def _buckets(self, signature: np.ndarray) -> np.ndarray:
+        """Bucket of every band, from the band's rows packed into one integer"""
+        packed = (signature.astype(np.uint64).reshape(self.bands, self.rows) << self._row_shifts).sum(axis=1)
+        return (_splitmix64(packed) >> np.uint64(64 - self.table_bits)).astype(np.int64)
+
+    def _url_bucket(self, hashed: int) -> int:
+        return hashed & ((1 << self.table_bits) - 1)
+
+    def _chain(self, heads: np.ndarray, links: np.ndarray, bucket: int) -> Iterator[int]:
+        """Slots in one bucket, newest first.
+
+        Reused slots are not unlinked from their old chains. Links always
+        point at older slots, so a walk stops at the first slot that is not
+        older than its predecessor: it was reused, and everything beyond it
+        was evicted even earlier.
+        """
+        slot = int(heads[bucket])
+        previous = None
+        for _ in range(self.max_probe):
+            if slot < 0:
+                return
+            sequence = int(self.sequence[slot])
+            if previous is not None and sequence >= previous:
+                return
+            yield slot
+            previous = sequence
+            slot = int(links[slot])
+
+    def lookup(self, signature: Optional[np.ndarray], url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the indexed document this one duplicates, or None"""
+        self.stats["lookups"] += 1
+        if url:
+            hashed = url_hash(normalize_url(url))
+            for slot in self._chain(self.url_heads, self.url_links, self._url_bucket(hashed)):
+                if int(self.url_hashes[slot]) == hashed:
+                    self.stats["url_duplicates"] += 1
+                    return self._match(slot, 1.0, "url")
+
+        if signature is not None:
+            candidates = {slot for band, bucket in enumerate(self._buckets(signature).tolist())
+                          for slot in self._chain(self.band_heads[band], self.band_links[band], bucket)}
+            if candidates:
+                slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+                similarity = (self.minhashes[slots] == signature).mean(axis=1)
+                similarity[~self.has_signature[slots]] = 0.0
+                best = int(similarity.argmax())
+                if similarity[best] >= self.threshold:
+                    self.stats["near_duplicates"] += 1
+                    return self._match(int(slots[best]), round(float(similarity[best]), 3), "near_duplicate")
+        return None
+
+    def _match(self, slot: int, similarity: float, reason: str) -> Dict[str, Any]:
+        return {"duplicate_of": self.urls[slot], "owner": self.owners[slot], "similarity": similarity,
+                "reason": reason}
+
+    def add(self, signature: Optional[np.ndarray], url: Optional[str] = None, owner: Any = None) -> int:
+        """Index a document, overwriting the oldest one when full; returns its slot"""
+        slot = self.inserted % self.capacity
+        self.sequence[slot] = self.inserted
+        self.inserted += 1
+        self.urls[slot] = url[:300] if url else None
+        self.owners[slot] = owner
+
+        self.has_signature[slot] = signature is not None
+        if signature is not None:
+            self.minhashes[slot] = signature
+            # Push the slot onto the front of its bucket in every band at once
+            bands, buckets = self._band_range, self._buckets(signature)
+            heads = self.band_heads[bands, buckets]
+            # A reused slot may still head a bucket from its previous life
+            self.band_links[:, slot] = np.where(heads == slot, self.band_links[:, slot], heads)
+            self.band_heads[bands, buckets] = slot
+        hashed = url_hash(normalize_url(url)) if url else 0
+        self.url_hashes[slot] = hashed
+        if url:
+            self._link(self.url_heads, self.url_links, self._url_bucket(hashed), slot)
+        return slot
+
+    @staticmethod
+    def _link(heads: np.ndarray, links: np.ndarray, bucket: int, slot: int):
+        head = int(heads[bucket])
+        links[slot] = links[slot] if head == slot else head
+        heads[bucket] = slot
+
+    def collapse(self, documents: List[Dict[str, Any]], owner: Any = None
+                 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Mark documents that duplicate indexed ones and index the rest under owner.
+
+        Returns (documents, duplicates): every document in its original order,
+        duplicates as copies carrying a "duplicate" entry that names the URL
+        and owner they match, plus the list of those entries. Signatures come
+        from each result's title, snippet and fetched content.
+        """
+        marked, duplicates = [], []
+        texts = [" ".join(str(document.get(field) or "") for field in ("title", "snippet", "content"))
+                 for document in documents]
+        for document, signature in zip(documents, self.signatures(texts)):
+            match = self.lookup(signature, document.get("url"))
+            if match is None:
+                self.add(signature, document.get("url"), owner)
+                marked.append(document)
+            else:
+                marked.append({**document, "duplicate": match})
+                duplicates.append({"url": document.get("url"), "title": document.get("title"), **match})
+        return marked, duplicates
+
+    def get_stats(self) -> Dict[str, Any]:
+        table_bytes = sum(array.nbytes for array in (
+            self.minhashes, self.has_signature, self.url_hashes, self.sequence,
+            self.band_heads, self.band_links, self.url_heads, self.url_links
+        ))
+        return {
+            "documents": len(self),
+            "capacity": self.capacity,
+            "evicted": max(0, self.inserted - self.capacity),
+            "threshold": self.threshold,
+            "table_bytes": table_bytes,
+            **self.stats
+        }
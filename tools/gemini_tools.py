@@ -1,78 +1,163 @@
 import google.generativeai as genai
+import asyncio
 import logging
 import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, List, Optional, Tuple
 from dotenv import load_dotenv
+from .batch_analysis import build_batch_prompt, instruction_from_template, pack_documents, parse_batch_response, split_batch
+from .hedging import ModelRouter
+from .map_reduce import CHUNK_SUMMARY_PROMPT, COMBINE_PROMPT, group_partials, split_into_chunks
+from .model_selection import ModelSelectionCache, probe_models
+from .rate_limiter import RateLimiter, estimate_tokens, get_rate_limiter
+from .response_cache import ResponseCache, make_cache_key
+from .token_budget import MIN_CONTENT_TOKENS, TokenBudgetExceeded, current_account, fit_text
+from .tracing import traced, tracer
 
 # Load environment variables
 load_dotenv()
 
+# Prompt templates; the template text is part of the response cache key
+SUMMARY_PROMPT = "Please provide a concise 2-3 sentence summary of the following text:\n\n{content}"
+
+RESEARCH_PROMPT = """Please provide a comprehensive research overview about: {content}
+
+Include:
+1. Key concepts and definitions
+2. Main applications and use cases
+3. Current research developments
+4. Challenges and limitations
+5. Future trends and opportunities
+
+Please structure the response in clear sections and keep it under 500 words."""
+
+ANALYSIS_PROMPTS = {
+    "key_points": "Extract the 5 most important key points from this text:\n\n{content}",
+    "sentiment": "Analyze the sentiment and tone of this text:\n\n{content}",
+}
+DEFAULT_ANALYSIS_PROMPT = "Analyze this text and provide insights:\n\n{content}"
+
+DEMO_RESEARCH = """🔍 Demo Research: {topic}
+
+🤖 MULTI-AGENT RESEARCH ASSISTANT - COMPETITION READY
+
+This demo response simulates what you'd get with real Gemini AI. Your system is fully functional with:
+
+✅ Multi-agent coordination
+✅ Parallel execution capabilities  
+✅ Session management
+✅ Custom tools framework
+✅ Professional logging & observability
+
+TECHNICAL NOTE: API key is valid but model availability varies by region.
+The Gemini integration framework is implemented and demonstrates the concept.
+
+COMPETITION SCORING:
+• Multi-agent system: ✅ Demonstrated
+• Sequential agents: ✅ Implemented  
+• Parallel execution: ✅ Working
+• Session management: ✅ Active
+• Custom tools: ✅ Gemini framework ready
+• Observability: ✅ Comprehensive logging
+
+Even in demo mode, this demonstrates all required competition features!"""
+
+
 class GeminiTools:
     """Tools for interacting with Gemini AI"""
     
-    def __init__(self):
+    # Used when the model list cannot be fetched
+    DEFAULT_MODELS = [
+        'models/gemini-2.5-flash',                    # Fast model
+        'models/gemini-2.5-pro-preview-03-25',        # Pro preview
+        'models/gemini-2.5-pro-preview-05-06',        # Another pro preview
+        'models/gemini-2.5-pro-preview-06-05',        # Latest pro preview
+        'models/gemini-1.0-pro',                      # Fallback to older
+    ]
+    
+    def __init__(self, genai_backend: Any = None, model_cache: Optional[ModelSelectionCache] = None,
+                 probe_deadline: Optional[float] = None, probe_concurrency: Optional[int] = None,
+                 response_cache: Optional[ResponseCache] = None, rate_limiter: Optional[RateLimiter] = None):
         self.logger = logging.getLogger(__name__)
-        self.setup_gemini()
+        self.genai = genai_backend or genai
+        self.model_cache = model_cache or ModelSelectionCache()
+        self.response_cache = response_cache or ResponseCache()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.probe_deadline = float(probe_deadline or os.getenv("GEMINI_PROBE_DEADLINE", 10))
+        self.probe_concurrency = int(probe_concurrency or os.getenv("GEMINI_PROBE_CONCURRENCY", 4))
+        self.batch_token_budget = int(os.getenv("GEMINI_BATCH_TOKEN_BUDGET", 8000))
+        # Longer summary inputs are chunked, summarized concurrently and reduced (map-reduce)
+        self.summary_chunk_tokens = int(os.getenv("GEMINI_SUMMARY_CHUNK_TOKENS", 6000))
+        self.summary_concurrency = int(os.getenv("GEMINI_SUMMARY_CONCURRENCY", 8))
+        # Prompt content is shrunk to fit max_prompt_tokens (and what is left of the session's budget);
+        # responses are capped at max_output_tokens (0 means no cap)
+        self.max_prompt_tokens = int(os.getenv("GEMINI_MAX_PROMPT_TOKENS", 8000))
+        self.max_output_tokens = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", 2048))
+        
+        # Gemini is set up lazily on first use, see ensure_initialized()
+        self.model = None
+        self.demo_mode = True
+        self.current_model = "uninitialized"
+        self.candidate_models = []
+        self.failed_models = {}
+        self.model_source = None
+        self.initialized = False
+        self._init_lock = None
+        
+        # Latency metrics per generation method (research, summary, analysis)
+        self.call_metrics = {}
+        self.recent_calls = deque(maxlen=100)
+        self.batch_stats = {"batch_requests": 0, "documents_batched": 0, "fallback_calls": 0, "splits": 0}
+        self.summary_stats = {"map_reduce_runs": 0, "chunks": 0, "failed_chunks": 0, "reduce_calls": 0,
+                              "budget_fitted": 0}
+        # Tokens sent and received, in total, per method and over the last minute
+        self.token_stats = {"input_tokens": 0, "output_tokens": 0, "calls": 0, "truncated_calls": 0,
+                            "trimmed_tokens": 0, "rejected_calls": 0, "hedge_input_tokens": 0}
+        self.method_tokens = {}
+        self.recent_tokens = deque()
+        # Per-model latency tracking; slow calls may be hedged to another candidate model
+        self.router = ModelRouter()
+        self._models = {}
+    
+    async def ensure_initialized(self):
+        """Run setup_gemini once, on first use"""
+        if self.initialized:
+            return
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        async with self._init_lock:
+            if not self.initialized:
+                await self.setup_gemini()
+                self.initialized = True
     
-    def setup_gemini(self):
+    async def setup_gemini(self):
         """Initialize Gemini AI with proper API key configuration and model selection"""
         try:
             # Get API key from environment variable
             api_key = os.getenv("GEMINI_API_KEY")
             
             if api_key and api_key != "your_gemini_api_key_here" and len(api_key) > 10:
-                genai.configure(api_key=api_key)
-                
-                # Use the models that are actually available in your region
-                available_models = [
-                    'models/gemini-2.5-flash',                    # Fast model
-                    'models/gemini-2.5-pro-preview-03-25',        # Pro preview
-                    'models/gemini-2.5-pro-preview-05-06',        # Another pro preview
-                    'models/gemini-2.5-pro-preview-06-05',        # Latest pro preview
-                    'models/gemini-1.0-pro',                      # Fallback to older
-                ]
+                self.genai.configure(api_key=api_key)
                 
                 self.model = None
                 successful_model = None
                 
-                # First, let's see what models are actually available
-                try:
-                    all_models = genai.list_models()
-                    available_model_names = [model.name for model in all_models]
-                    self.logger.info(f"📋 Models available in your region: {len(available_model_names)}")
-                    
-                    # Filter to only Gemini models that support generateContent
-                    gemini_models = []
-                    for model in all_models:
-                        if 'gemini' in model.name.lower() and 'generateContent' in model.supported_generation_methods:
-                            gemini_models.append(model.name)
-                    
-                    self.logger.info(f"🎯 Gemini models with generateContent: {len(gemini_models)}")
-                    for model_name in gemini_models[:8]:  # Show first 8
-                        self.logger.info(f"   - {model_name}")
-                        
-                    # Update our available_models with actual Gemini models
-                    if gemini_models:
-                        available_models = gemini_models
-                        
-                except Exception as list_error:
-                    self.logger.warning(f"Could not list available models: {list_error}")
-                    available_model_names = []
-                
-                # Now try to initialize a working model
-                for model_name in available_models:
-                    try:
-                        self.logger.info(f"🔧 Trying to initialize model: {model_name}")
-                        self.model = genai.GenerativeModel(model_name)
-                        # Test the model with a simple prompt
-                        test_response = self.model.generate_content("Hello, please respond with 'AI System Active'")
-                        successful_model = model_name
-                        self.logger.info(f"✅ Successfully initialized model: {model_name}")
-                        self.logger.info(f"🧪 Model test response: {test_response.text}")
-                        break
-                    except Exception as model_error:
-                        error_msg = str(model_error)
-                        self.logger.warning(f"❌ Model {model_name} failed: {error_msg[:100]}")
-                        continue
+                # Warm start: reuse the model chosen by a previous probe
+                cached = self.model_cache.load(api_key)
+                if cached is not None:
+                    self.candidate_models = cached.get("candidates", [])
+                    self.failed_models = cached.get("failures", {})
+                    successful_model = cached.get("model")
+                    if successful_model:
+                        self.model = self.genai.GenerativeModel(successful_model)
+                    self.model_source = "cache"
+                    self.logger.info(f"⚡ Using cached model selection: {successful_model or 'none available'}")
+                else:
+                    self.candidate_models = await self._list_candidate_models()
+                    successful_model, self.model, self.failed_models = await self._probe_candidates(self.candidate_models)
+                    self.model_source = "probe"
+                    self.model_cache.store(api_key, successful_model, self.candidate_models, self.failed_models)
                 
                 if self.model and successful_model:
                     self.demo_mode = False
@@ -99,85 +184,532 @@ class GeminiTools:
             self.demo_mode = True
             self.current_model = "demo"
     
+    async def _list_candidate_models(self) -> list:
+        """Ask the API which Gemini models support generateContent"""
+        try:
+            all_models = await asyncio.to_thread(lambda: list(self.genai.list_models()))
+            self.logger.info(f"📋 Models available in your region: {len(all_models)}")
+            
+            # Filter to only Gemini models that support generateContent
+            gemini_models = [
+                model.name for model in all_models
+                if 'gemini' in model.name.lower() and 'generateContent' in model.supported_generation_methods
+            ]
+            
+            self.logger.info(f"🎯 Gemini models with generateContent: {len(gemini_models)}")
+            for model_name in gemini_models[:8]:  # Show first 8
+                self.logger.info(f"   - {model_name}")
+            
+            if gemini_models:
+                return gemini_models
+                
+        except Exception as list_error:
+            self.logger.warning(f"Could not list available models: {list_error}")
+        
+        return list(self.DEFAULT_MODELS)
+    
+    async def _probe_candidates(self, candidates: list):
+        """Probe candidates concurrently, a wave at a time, until one works"""
+        failures = {}
+        for start in range(0, len(candidates), self.probe_concurrency):
+            wave = candidates[start:start + self.probe_concurrency]
+            self.logger.info(f"🔧 Probing {len(wave)} models concurrently: {', '.join(wave)}")
+            model_name, model, wave_failures = await probe_models(
+                self.genai, wave, deadline=self.probe_deadline, logger=self.logger
+            )
+            failures.update(wave_failures)
+            if model_name:
+                self.logger.info(f"✅ Successfully initialized model: {model_name}")
+                return model_name, model, failures
+        return None, None, failures
+    
+    @traced("gemini.generate_summary")
     async def generate_summary(self, text: str) -> str:
         """Generate a summary using Gemini AI"""
+        await self.ensure_initialized()
         if self.demo_mode or not self.model:
             return f"📝 Demo Summary: '{text[:80]}...' - [Enable real AI by adding your Gemini API key to .env file]"
         
         try:
-            prompt = f"Please provide a concise 2-3 sentence summary of the following text:\n\n{text}"
-            response = await self.model.generate_content_async(prompt)
-            return f"🤖 AI Summary ({self.current_model}): {response.text}"
+            content = await self._condense(text)
+            response_text = await self._generate(SUMMARY_PROMPT, content, method="summary")
+            return f"🤖 AI Summary ({self.current_model}): {response_text}"
         except Exception as e:
             self.logger.error(f"Error generating summary: {e}")
             return f"❌ Summary generation failed: {str(e)[:200]}"
     
+    async def _condense(self, text: str) -> str:
+        """Map-reduce text that is too long for one summary prompt.
+        
+        Chunks are summarized concurrently (at most summary_concurrency at a
+        time), then the partial summaries are merged in rounds until they fit
+        the budget. Every call goes through the response cache, so chunks
+        shared with an earlier document are not summarized again. Text that
+        already fits is returned unchanged. Under a session budget the text is
+        first shrunk to what the budget can map, reduce and summarize, rather
+        than letting the later chunks be rejected.
+        """
+        if estimate_tokens(text) <= self.summary_chunk_tokens:
+            return text
+        
+        chunks = split_into_chunks(text, self.summary_chunk_tokens)
+        account = current_account()
+        if account is not None and account.remaining is not None:
+            text, chunks = self._fit_map_reduce(text, chunks, account)
+            if len(chunks) <= 1:
+                # Not worth a map phase; the summary call fits what is left itself
+                return text
+        self.summary_stats["map_reduce_runs"] += 1
+        self.summary_stats["chunks"] += len(chunks)
+        self.logger.info(f"🧩 Summarizing {len(chunks)} chunks ({len(text)} characters)")
+        semaphore = asyncio.Semaphore(self.summary_concurrency)
+        
+        async def summarize(template: str, content: str, method: str) -> str:
+            async with semaphore:
+                return await self._generate(template, content, method=method)
+        
+        with tracer.span("gemini.summary_map", "tool", chunks=len(chunks)):
+            outcomes = await asyncio.gather(*(summarize(CHUNK_SUMMARY_PROMPT, chunk, "summary_map")
+                                              for chunk in chunks), return_exceptions=True)
+        partials = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+        failed = len(outcomes) - len(partials)
+        if failed:
+            self.summary_stats["failed_chunks"] += failed
+            self.logger.warning(f"{failed} of {len(chunks)} chunk summaries failed")
+            if not partials:
+                raise next(outcome for outcome in outcomes if isinstance(outcome, BaseException))
+        
+        while estimate_tokens("\n\n".join(partials)) > self.summary_chunk_tokens and len(partials) > 1:
+            groups = group_partials(partials, self.summary_chunk_tokens)
+            self.summary_stats["reduce_calls"] += len(groups)
+            with tracer.span("gemini.summary_reduce", "tool", groups=len(groups)):
+                partials = list(await asyncio.gather(*(
+                    summarize(COMBINE_PROMPT, "\n\n".join(group), "summary_reduce") if len(group) > 1
+                    else asyncio.sleep(0, result=group[0])
+                    for group in groups
+                )))
+        return "\n\n".join(partials)
+    
+    def _map_reduce_cost(self, chunks: List[str]) -> int:
+        """Tokens to map these chunks, read the partials back when reducing and summarize.
+        
+        Partials are sized from earlier chunk summaries (the output cap until
+        there are a few), plus headroom for the worst-case reservations of the
+        calls in flight at once.
+        """
+        per_chunk, final = self._map_reduce_overheads()
+        in_flight = min(len(chunks), self.summary_concurrency) * self.max_output_tokens
+        return sum(estimate_tokens(chunk) for chunk in chunks) + per_chunk * len(chunks) + in_flight + final
+    
+    def _map_reduce_overheads(self) -> Tuple[int, int]:
+        """(tokens per chunk besides its text, tokens of the final summary call)"""
+        totals = self.method_tokens.get("summary_map")
+        partial = self.max_output_tokens
+        if totals and totals["calls"] >= 5:
+            partial = min(partial, int(totals["output_tokens"] / totals["calls"] * 1.5) + 1)
+        per_chunk = estimate_tokens(CHUNK_SUMMARY_PROMPT.format(content="")) + 2 * partial
+        final = self.summary_chunk_tokens + estimate_tokens(SUMMARY_PROMPT.format(content="")) + self.max_output_tokens
+        return per_chunk, final
+    
+    def _fit_map_reduce(self, text: str, chunks: List[str], account: Any) -> Tuple[str, List[str]]:
+        """Shrink text until map-reducing it fits the session's remaining budget"""
+        available = account.remaining
+        if self._map_reduce_cost(chunks) <= available:
+            return text, chunks
+        original = estimate_tokens(text)
+        # Start from the size whose chunks, at this text's average chunk size, would just fit
+        per_chunk, final = self._map_reduce_overheads()
+        spare = available - final - self.summary_concurrency * self.max_output_tokens
+        target = int(spare / (1 + per_chunk * len(chunks) / original))
+        fitted = text
+        while target >= self.summary_chunk_tokens:
+            fitted, _ = fit_text(text, target)
+            chunks = split_into_chunks(fitted, self.summary_chunk_tokens)
+            if self._map_reduce_cost(chunks) <= available:
+                break
+            target = int(target * 0.9)
+        else:
+            fitted, chunks = text, [text]
+        trimmed = original - estimate_tokens(fitted)
+        self.summary_stats["budget_fitted"] += 1
+        if trimmed > 0:
+            self.token_stats["truncated_calls"] += 1
+            self.token_stats["trimmed_tokens"] += trimmed
+            account.note_trimmed(trimmed)
+        self.logger.warning(f"Session budget allows {len(chunks)} summary chunk(s): "
+                            f"{original} tokens of text shrunk to {estimate_tokens(fitted)}")
+        return fitted, chunks
+    
+    @traced("gemini.research_topic")
     async def research_topic(self, topic: str) -> str:
         """Research a topic using Gemini AI"""
+        await self.ensure_initialized()
         if self.demo_mode or not self.model:
-            demo_response = f"""🔍 Demo Research: {topic}
-
-🤖 MULTI-AGENT RESEARCH ASSISTANT - COMPETITION READY
-
-This demo response simulates what you'd get with real Gemini AI. Your system is fully functional with:
-
-✅ Multi-agent coordination
-✅ Parallel execution capabilities  
-✅ Session management
-✅ Custom tools framework
-✅ Professional logging & observability
-
-TECHNICAL NOTE: API key is valid but model availability varies by region.
-The Gemini integration framework is implemented and demonstrates the concept.
-
-COMPETITION SCORING:
-• Multi-agent system: ✅ Demonstrated
-• Sequential agents: ✅ Implemented  
-• Parallel execution: ✅ Working
-• Session management: ✅ Active
-• Custom tools: ✅ Gemini framework ready
-• Observability: ✅ Comprehensive logging
-
-Even in demo mode, this demonstrates all required competition features!"""
-            return demo_response
+            return DEMO_RESEARCH.format(topic=topic)
         
         try:
-            prompt = f"""Please provide a comprehensive research overview about: {topic}
-
-Include:
-1. Key concepts and definitions
-2. Main applications and use cases
-3. Current research developments
-4. Challenges and limitations
-5. Future trends and opportunities
-
-Please structure the response in clear sections and keep it under 500 words."""
-            
-            response = await self.model.generate_content_async(prompt)
-            return f"🔬 AI Research ({self.current_model}): {topic}\n\n{response.text}"
+            response_text = await self._generate(RESEARCH_PROMPT, topic, method="research")
+            return f"🔬 AI Research ({self.current_model}): {topic}\n\n{response_text}"
         except Exception as e:
             self.logger.error(f"Error researching topic: {e}")
             return f"❌ Research failed: {str(e)[:200]}"
     
+    @traced("gemini.analyze_content")
     async def analyze_content(self, content: str, analysis_type: str = "key_points") -> str:
         """Analyze content for key points, sentiment, or other aspects"""
+        await self.ensure_initialized()
         if self.demo_mode or not self.model:
             return f"📊 Demo Analysis ({analysis_type}): Content preview - '{content[:60]}...'"
         
         try:
-            if analysis_type == "key_points":
-                prompt = f"Extract the 5 most important key points from this text:\n\n{content}"
-            elif analysis_type == "sentiment":
-                prompt = f"Analyze the sentiment and tone of this text:\n\n{content}"
-            else:
-                prompt = f"Analyze this text and provide insights:\n\n{content}"
-            
-            response = await self.model.generate_content_async(prompt)
-            return f"📈 Analysis Results ({self.current_model}):\n{response.text}"
+            template = ANALYSIS_PROMPTS.get(analysis_type, DEFAULT_ANALYSIS_PROMPT)
+            response_text = await self._generate(template, content, analysis_type, method="analysis")
+            return f"📈 Analysis Results ({self.current_model}):\n{response_text}"
         except Exception as e:
             self.logger.error(f"Error analyzing content: {e}")
             return f"❌ Analysis failed: {str(e)[:200]}"
     
+    @traced("gemini.analyze_content_batch")
+    async def analyze_content_batch(self, contents: List[str], analysis_type: str = "key_points",
+                                    token_budget: Optional[int] = None) -> List[str]:
+        """Analyze many documents in as few requests as possible.
+        
+        Documents are packed into requests that fit the token budget, the JSON
+        answer is split back into per-document results (in input order), and any
+        document the model's answer does not cover is retried on its own.
+        """
+        await self.ensure_initialized()
+        if self.demo_mode or not self.model:
+            return [await self.analyze_content(content, analysis_type) for content in contents]
+        
+        template = ANALYSIS_PROMPTS.get(analysis_type, DEFAULT_ANALYSIS_PROMPT)
+        results: List[Optional[Tuple[bool, str]]] = [None] * len(contents)
+        pending = []
+        for i, content in enumerate(contents):
+            cached = await self.response_cache.aget(make_cache_key(self.current_model, template, analysis_type, content))
+            if cached is not None:
+                results[i] = (True, cached)
+            else:
+                pending.append((i, content))
+        
+        batches = pack_documents(pending, token_budget or self.batch_token_budget)
+        self.logger.info(f"📦 Analyzing {len(contents)} documents in {len(batches)} batched requests")
+        await asyncio.gather(*(self._run_analysis_batch(batch, template, analysis_type, results)
+                               for batch in batches))
+        
+        return [f"📈 Analysis Results ({self.current_model}):\n{text}" if ok else text
+                for ok, text in results]
+    
+    async def _run_analysis_batch(self, batch: List[Tuple[int, str]], template: str, analysis_type: str,
+                                  results: List[Optional[Tuple[bool, str]]]):
+        """Send one packed batch; split it on failure and fall back to single calls for gaps"""
+        if len(batch) == 1:
+            doc_id, content = batch[0]
+            self.batch_stats["fallback_calls"] += 1
+            try:
+                results[doc_id] = (True, await self._generate(template, content, analysis_type, method="analysis"))
+            except Exception as e:
+                self.logger.error(f"Error analyzing content: {e}")
+                results[doc_id] = (False, f"❌ Analysis failed: {str(e)[:200]}")
+            return
+        
+        prompt = build_batch_prompt(batch, instruction_from_template(template))
+        self.batch_stats["batch_requests"] += 1
+        started = time.perf_counter()
+        try:
+            # No output cap: the answer holds one analysis per document
+            response, _, model_name = await self._call_model(prompt, "analysis_batch", capped=False)
+        except TokenBudgetExceeded as e:
+            for doc_id, _ in batch:
+                results[doc_id] = (False, f"❌ Analysis failed: {str(e)[:200]}")
+            return
+        except Exception as e:
+            # Most often the request was too large; halve it and try again
+            self.logger.warning(f"Batch of {len(batch)} documents failed ({str(e)[:100]}), splitting")
+            self.batch_stats["splits"] += 1
+            halves = split_batch(batch)
+            await asyncio.gather(*(self._run_analysis_batch(half, template, analysis_type, results)
+                                   for half in halves))
+            return
+        elapsed = time.perf_counter() - started
+        self._record_call("analysis_batch", elapsed, elapsed, streamed=False, model=model_name)
+        
+        parsed = parse_batch_response(response.text, [doc_id for doc_id, _ in batch])
+        missing = []
+        for doc_id, content in batch:
+            if doc_id in parsed:
+                results[doc_id] = (True, parsed[doc_id])
+                await self.response_cache.aput(make_cache_key(model_name, template, analysis_type, content),
+                                               parsed[doc_id])
+            else:
+                missing.append((doc_id, content))
+        self.batch_stats["documents_batched"] += len(batch) - len(missing)
+        
+        if missing:
+            self.logger.warning(f"{len(missing)} of {len(batch)} batched documents unparsed, analyzing individually")
+            await asyncio.gather(*(self._run_analysis_batch([doc], template, analysis_type, results)
+                                   for doc in missing))
+    
+    @traced("gemini.generate_summary_stream")
+    async def generate_summary_stream(self, text: str) -> AsyncIterator[str]:
+        """Streaming generate_summary: yields text chunks as Gemini produces them"""
+        await self.ensure_initialized()
+        if self.demo_mode or not self.model:
+            yield await self.generate_summary(text)
+            return
+        
+        yield f"🤖 AI Summary ({self.current_model}): "
+        try:
+            content = await self._condense(text)
+            async for chunk in self._generate_stream(SUMMARY_PROMPT, content, method="summary"):
+                yield chunk
+        except Exception as e:
+            self.logger.error(f"Error generating summary: {e}")
+            yield f"\n❌ Summary generation failed: {str(e)[:200]}"
+    
+    @traced("gemini.research_topic_stream")
+    async def research_topic_stream(self, topic: str) -> AsyncIterator[str]:
+        """Streaming research_topic: yields text chunks as Gemini produces them"""
+        await self.ensure_initialized()
+        if self.demo_mode or not self.model:
+            yield await self.research_topic(topic)
+            return
+        
+        yield f"🔬 AI Research ({self.current_model}): {topic}\n\n"
+        try:
+            async for chunk in self._generate_stream(RESEARCH_PROMPT, topic, method="research"):
+                yield chunk
+        except Exception as e:
+            self.logger.error(f"Error researching topic: {e}")
+            yield f"\n❌ Research failed: {str(e)[:200]}"
+    
+    @traced("gemini.analyze_content_stream")
+    async def analyze_content_stream(self, content: str, analysis_type: str = "key_points") -> AsyncIterator[str]:
+        """Streaming analyze_content: yields text chunks as Gemini produces them"""
+        await self.ensure_initialized()
+        if self.demo_mode or not self.model:
+            yield await self.analyze_content(content, analysis_type)
+            return
+        
+        yield f"📈 Analysis Results ({self.current_model}):\n"
+        try:
+            template = ANALYSIS_PROMPTS.get(analysis_type, DEFAULT_ANALYSIS_PROMPT)
+            async for chunk in self._generate_stream(template, content, analysis_type, method="analysis"):
+                yield chunk
+        except Exception as e:
+            self.logger.error(f"Error analyzing content: {e}")
+            yield f"\n❌ Analysis failed: {str(e)[:200]}"
+    
+    def _fit_content(self, template: str, content: str) -> str:
+        """Shrink content so the filled prompt fits the per-call and remaining session budgets"""
+        overhead = estimate_tokens(template.format(content=""))
+        allowed = self.max_prompt_tokens - overhead
+        account = current_account()
+        if account is not None and account.remaining is not None:
+            allowed = min(allowed, account.remaining - self.max_output_tokens - overhead)
+        if allowed < MIN_CONTENT_TOKENS:
+            self.token_stats["rejected_calls"] += 1
+            if account is not None:
+                account.rejected_calls += 1
+            raise TokenBudgetExceeded(f"only {max(allowed, 0)} prompt tokens left for this session")
+        fitted, trimmed = fit_text(content, allowed)
+        if trimmed:
+            self.token_stats["truncated_calls"] += 1
+            self.token_stats["trimmed_tokens"] += trimmed
+            if account is not None:
+                account.note_trimmed(trimmed)
+        return fitted
+    
+    async def _call_model(self, prompt: str, method: str, stream: bool = False,
+                          capped: bool = True) -> Tuple[Any, tuple, str]:
+        """Send one prompt through the rate limiter, reserving its worst case against the session budget.
+        
+        Returns (response, reservation, model that answered), which routing
+        or a hedge may have made differ from current_model. Non-streamed
+        calls are charged here; streamed ones are charged by the caller once
+        the response is complete. A hedge's duplicate prompt is charged too.
+        """
+        prompt_tokens = estimate_tokens(prompt)
+        output_cap = self.max_output_tokens if capped else 0
+        kwargs = {"generation_config": {"max_output_tokens": output_cap}} if output_cap else {}
+        account = current_account()
+        reserved = account.reserve(prompt_tokens + (output_cap or self.max_output_tokens)) if account else 0
+        
+        async def send(model_name: str) -> Any:
+            model = self._model_for(model_name)
+            return await self.rate_limiter.call(lambda: model.generate_content_async(prompt, **kwargs), prompt_tokens)
+        
+        try:
+            if stream:
+                kwargs["stream"] = True
+                model_name = self.router.route(self.current_model, self._routable_models())
+                response = await send(model_name)
+            else:
+                response, model_name, hedged = await self.router.run(self.current_model, self._routable_models(),
+                                                                     send)
+                if hedged:
+                    self.token_stats["hedge_input_tokens"] += prompt_tokens
+                    if account is not None:
+                        account.note_hedge(prompt_tokens)
+        except BaseException:
+            if account is not None:
+                account.release(reserved)
+            raise
+        reservation = (account, reserved, prompt_tokens)
+        if not stream:
+            self._charge(method, reservation, response.text, getattr(response, "usage_metadata", None))
+        return response, reservation, model_name
+    
+    def _model_for(self, model_name: str) -> Any:
+        """The GenerativeModel for a candidate, created on first use"""
+        if model_name == self.current_model:
+            return self.model
+        if model_name not in self._models:
+            self._models[model_name] = self.genai.GenerativeModel(model_name)
+        return self._models[model_name]
+    
+    def _routable_models(self) -> List[str]:
+        """Candidates calls may be routed or hedged to: the selected model plus those not known to fail"""
+        return [self.current_model] + [name for name in self.candidate_models
+                                       if name != self.current_model and name not in self.failed_models]
+    
+    def _charge(self, method: str, reservation: tuple, output_text: str, usage: Any = None):
+        """Record a finished call's token usage, preferring the API's own counts to estimates"""
+        account, reserved, input_tokens = reservation
+        output_tokens = estimate_tokens(output_text)
+        if usage is not None:
+            input_tokens = getattr(usage, "prompt_token_count", None) or input_tokens
+            output_tokens = getattr(usage, "candidates_token_count", None) or output_tokens
+        if account is not None:
+            account.settle(reserved, input_tokens, output_tokens)
+        self.token_stats["calls"] += 1
+        self.token_stats["input_tokens"] += input_tokens
+        self.token_stats["output_tokens"] += output_tokens
+        totals = self.method_tokens.setdefault(method, {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+        totals["calls"] += 1
+        totals["input_tokens"] += input_tokens
+        totals["output_tokens"] += output_tokens
+        now = time.monotonic()
+        self.recent_tokens.append((now, input_tokens, output_tokens))
+        while self.recent_tokens and now - self.recent_tokens[0][0] > 60:
+            self.recent_tokens.popleft()
+    
+    async def _generate(self, template: str, content: str, analysis_type: str = "", method: str = "generate") -> str:
+        """Fill a prompt template and generate, answering from the response cache when possible"""
+        content = self._fit_content(template, content)
+        preferred = self.current_model
+        key = make_cache_key(preferred, template, analysis_type, content)
+        prompt = template.format(content=content)
+        answered_by = preferred
+        
+        async def call_model() -> str:
+            nonlocal answered_by
+            started = time.perf_counter()
+            with tracer.span("gemini.generate_content", "llm", model=preferred, method=method) as span:
+                response, _, answered_by = await self._call_model(prompt, method)
+                if span is not None:
+                    span.attributes["model"] = answered_by
+            elapsed = time.perf_counter() - started
+            # Without streaming the first token arrives with the last one
+            self._record_call(method, elapsed, elapsed, streamed=False, model=answered_by)
+            if answered_by != preferred:
+                # Rerouted or hedged: the answer belongs under the model that gave it
+                await self.response_cache.aput(make_cache_key(answered_by, template, analysis_type, content),
+                                               response.text)
+            return response.text
+        
+        return await self.response_cache.get_or_compute(key, call_model,
+                                                        cacheable=lambda _: answered_by == preferred)
+    
+    async def _generate_stream(self, template: str, content: str, analysis_type: str = "",
+                               method: str = "generate") -> AsyncIterator[str]:
+        """Like _generate, but yields chunks as they arrive; complete responses are cached"""
+        content = self._fit_content(template, content)
+        key = make_cache_key(self.current_model, template, analysis_type, content)
+        cached = await self.response_cache.aget(key)
+        if cached is not None:
+            yield cached
+            return
+        
+        prompt = template.format(content=content)
+        started = time.perf_counter()
+        first_token = None
+        parts = []
+        usage = None
+        response, reservation, model_name = await self._call_model(prompt, method, stream=True)
+        try:
+            async for chunk in response:
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                parts.append(chunk.text)
+                # The last chunk carries the usage counts when the API reports them
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                yield chunk.text
+        finally:
+            self._charge(method, reservation, "".join(parts), usage)
+        
+        total = time.perf_counter() - started
+        self._record_call(method, first_token if first_token is not None else total, total, streamed=True,
+                          model=model_name)
+        await self.response_cache.aput(make_cache_key(model_name, template, analysis_type, content), "".join(parts))
+    
+    def _record_call(self, method: str, time_to_first_token: float, total_time: float, streamed: bool,
+                     model: Optional[str] = None):
+        """Accumulate time-to-first-token and total-time metrics per method"""
+        metrics = self.call_metrics.setdefault(method, {
+            "calls": 0,
+            "streamed_calls": 0,
+            "ttft_total": 0.0,
+            "ttft_max": 0.0,
+            "total_time_total": 0.0,
+            "total_time_max": 0.0
+        })
+        metrics["calls"] += 1
+        metrics["streamed_calls"] += int(streamed)
+        metrics["ttft_total"] += time_to_first_token
+        metrics["ttft_max"] = max(metrics["ttft_max"], time_to_first_token)
+        metrics["total_time_total"] += total_time
+        metrics["total_time_max"] = max(metrics["total_time_max"], total_time)
+        self.recent_calls.append({
+            "method": method,
+            "model": model or self.current_model,
+            "streamed": streamed,
+            "ttft": round(time_to_first_token, 4),
+            "total_time": round(total_time, 4)
+        })
+    
+    def get_call_metrics(self) -> dict:
+        """Average and worst time-to-first-token and total time per method"""
+        summary = {}
+        for method, metrics in self.call_metrics.items():
+            calls = metrics["calls"]
+            summary[method] = {
+                "calls": calls,
+                "streamed_calls": metrics["streamed_calls"],
+                "ttft_avg": round(metrics["ttft_total"] / calls, 4),
+                "ttft_max": round(metrics["ttft_max"], 4),
+                "total_time_avg": round(metrics["total_time_total"] / calls, 4),
+                "total_time_max": round(metrics["total_time_max"], 4)
+            }
+        return summary
+    
+    def get_token_metrics(self) -> dict:
+        """Token totals, per-method totals and throughput over the last minute"""
+        now = time.monotonic()
+        window = [entry for entry in self.recent_tokens if now - entry[0] <= 60]
+        span = max(1.0, now - window[0][0]) if window else 60.0
+        return {
+            **self.token_stats,
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "max_output_tokens": self.max_output_tokens,
+            "per_method": {method: dict(totals) for method, totals in self.method_tokens.items()},
+            "last_minute": {
+                "calls": len(window),
+                "input_tokens_per_second": round(sum(entry[1] for entry in window) / span, 1),
+                "output_tokens_per_second": round(sum(entry[2] for entry in window) / span, 1)
+            }
+        }
+    
     def get_status(self) -> dict:
         """Get the current status of Gemini tools"""
         return {
@@ -185,14 +717,27 @@ Please structure the response in clear sections and keep it under 500 words."""
             "model_available": self.model is not None,
             "current_model": self.current_model if hasattr(self, 'current_model') else "unknown",
             "status": "active" if self.model else "demo_mode",
-            "api_key_present": bool(os.getenv("GEMINI_API_KEY")) and os.getenv("GEMINI_API_KEY") != "your_gemini_api_key_here"
+            "api_key_present": bool(os.getenv("GEMINI_API_KEY")) and os.getenv("GEMINI_API_KEY") != "your_gemini_api_key_here",
+            "initialized": self.initialized,
+            "model_source": self.model_source,
+            "candidate_models": len(self.candidate_models),
+            "failed_models": dict(self.failed_models),
+            "response_cache": self.response_cache.get_stats(),
+            "rate_limiter": self.rate_limiter.get_stats(),
+            "call_metrics": self.get_call_metrics(),
+            "batch_analysis": dict(self.batch_stats),
+            "summary_map_reduce": dict(self.summary_stats),
+            "tokens": self.get_token_metrics(),
+            "routing": self.router.get_stats()
         }
     
     def list_available_models(self):
         """List available Gemini models (for debugging)"""
         try:
             if not self.demo_mode:
-                models = genai.list_models()
+                if self.candidate_models:
+                    return list(self.candidate_models)
+                models = self.genai.list_models()
                 available = []
                 for model in models:
                     if 'generateContent' in model.supported_generation_methods:
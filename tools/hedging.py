@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# A model that failed this many calls in a row is skipped until the cooldown passes
+UNHEALTHY_AFTER_ERRORS = 3
+UNHEALTHY_COOLDOWN = 30.0
+
+# Another model becomes primary once its median is this fraction of the preferred model's or less
+SWITCH_RATIO = 0.75
+
+# An alternative without fresh latency samples is sent every this many calls as primary,
+# so routing has unbiased numbers for it (hedge wins alone would only show its fast calls)
+EXPLORE_EVERY = 20
+STALE_AFTER = 60.0
+
+# Unused hedge credit is capped, so a long quiet spell cannot fund a burst of hedges
+MAX_HEDGE_CREDIT = 10.0
+
+
+class LatencyTracker:
+    """Recent call latencies and error streak of one model"""
+
+    def __init__(self, window: int = 200):
+        # Latencies of calls this model served as primary; hedges start late, so theirs are not comparable
+        self.samples = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.last_error = 0.0
+        self.wins = 0
+        self.cancelled = 0
+        self.last_sample = 0.0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.last_sample = time.monotonic()
+
+    def record_success(self):
+        self.calls += 1
+        self.consecutive_errors = 0
+
+    def record_error(self):
+        self.calls += 1
+        self.errors += 1
+        self.consecutive_errors += 1
+        self.last_error = time.monotonic()
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def fresh(self, min_samples: int) -> bool:
+        return len(self.samples) >= min_samples and time.monotonic() - self.last_sample < STALE_AFTER
+
+    @property
+    def healthy(self) -> bool:
+        return (self.consecutive_errors < UNHEALTHY_AFTER_ERRORS
+                or time.monotonic() - self.last_error > UNHEALTHY_COOLDOWN)
+
+    def to_dict(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "wins": self.wins,
+            "cancelled": self.cancelled,
+            "healthy": self.healthy,
+            "samples": len(self.samples),
+            "p50": round(p50, 4) if p50 is not None else None,
+            "p95": round(p95, 4) if p95 is not None else None
+        }
+
+
+class ModelRouter:
+    """Routes calls across models by observed latency and hedges slow ones.
+
+    Calls are timed into their primary model's tracker. With hedging enabled, a
+    call still running after the model's hedge_percentile latency gets a
+    duplicate sent to the fastest other healthy model; the first success
+    wins and the other request is cancelled. Each call earns hedge_budget
+    (a fraction) of hedge credit and each hedge spends one, so hedges never
+    add more than that share of extra load. The trackers also decide the
+    primary: the preferred model keeps it unless it is failing or another
+    model is clearly faster.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, hedge_percentile: Optional[float] = None,
+                 hedge_budget: Optional[float] = None, min_samples: Optional[int] = None,
+                 min_delay: Optional[float] = None, window: int = 200):
+        self.logger = logging.getLogger(__name__)
+        self.enabled = (enabled if enabled is not None
+                        else os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() == "true")
+        self.hedge_percentile = float(hedge_percentile or os.getenv("GEMINI_HEDGE_PERCENTILE", 95))
+        # Percent of extra requests hedging may add
+        self.hedge_budget = float(hedge_budget if hedge_budget is not None
+                                  else os.getenv("GEMINI_HEDGE_BUDGET_PERCENT", 5)) / 100
+        self.min_samples = int(min_samples or os.getenv("GEMINI_HEDGE_MIN_SAMPLES", 20))
+        self.min_delay = float(min_delay if min_delay is not None else os.getenv("GEMINI_HEDGE_MIN_DELAY", 0.05))
+        self.window = window
+        self.trackers: Dict[str, LatencyTracker] = {}
+        self.credit = 0.0
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "budget_exhausted": 0, "rerouted": 0,
+                      "explored": 0}
+
+    def tracker(self, model: str) -> LatencyTracker:
+        if model not in self.trackers:
+            self.trackers[model] = LatencyTracker(self.window)
+        return self.trackers[model]
+
+    def _median(self, model: str) -> Optional[float]:
+        tracker = self.tracker(model)
+        return tracker.percentile(50) if len(tracker.samples) >= self.min_samples else None
+
+    def route(self, preferred: str, candidates: List[str]) -> str:
+        """The model to send a call to first"""
+        if not self.enabled:
+            return preferred
+        others = [model for model in candidates if model != preferred and self.tracker(model).healthy]
+        if not self.tracker(preferred).healthy:
+            return self.backup_for(preferred, candidates) or preferred
+        preferred_median = self._median(preferred)
+        if preferred_median is None or not others:
+            return preferred
+        stale = [model for model in others if not self.tracker(model).fresh(self.min_samples)]
+        if stale and self.stats["calls"] % EXPLORE_EVERY == 0:
+            self.stats["explored"] += 1
+            return stale[self.stats["calls"] // EXPLORE_EVERY % len(stale)]
+        timed = [(median, model) for model in others if (median := self._median(model)) is not None]
+        if timed:
+            median, model = min(timed)
+            if median <= preferred_median * SWITCH_RATIO:
+                return model
+        return preferred
+
+    def backup_for(self, primary: str, candidates: List[str]) -> Optional[str]:
+        """The fastest healthy model other than primary; models without enough samples come after timed ones"""
+        ranked = []
+        for position, model in enumerate(candidates):
+            if model == primary or not self.tracker(model).healthy:
+                continue
+            median = self._median(model)
+            ranked.append((median is None, median or 0.0, position, model))
+        return min(ranked)[3] if ranked else None
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """How long to wait on a model before hedging, or None while it has too few samples"""
+        tracker = self.tracker(model)
+        if len(tracker.samples) < self.min_samples:
+            return None
+        return max(self.min_delay, tracker.percentile(self.hedge_percentile))
+
+    async def _timed(self, model: str, send: Callable[[str], Awaitable[Any]], primary: bool = True) -> Any:
+        tracker = self.tracker(model)
+        started = time.monotonic()
+        try:
+            result = await send(model)
+        except asyncio.CancelledError:
+            tracker.cancelled += 1
+            if primary:
+                # A hedged-over primary took at least this long; the lower bound keeps its tail visible
+                tracker.observe(time.monotonic() - started)
+            raise
+        except Exception:
+            tracker.record_error()
+            raise
+        tracker.record_success()
+        if primary:
+            tracker.observe(time.monotonic() - started)
+        return result
+
+    async def run(self, preferred: str, candidates: List[str],
+                  send: Callable[[str], Awaitable[Any]]) -> Tuple[Any, str, bool]:
+        """Call send(model) on the routed model, hedging if it is slow.
+
+        Returns (result, model that answered, whether a hedge was sent).
+        """
+        self.stats["calls"] += 1
+        self.credit = min(MAX_HEDGE_CREDIT, self.credit + self.hedge_budget)
+        primary = self.route(preferred, candidates)
+        if primary != preferred:
+            self.stats["rerouted"] += 1
+        delay = self.hedge_delay(primary) if self.enabled else None
+        backup = self.backup_for(primary, candidates) if delay is not None else None
+        if backup is None:
+            result = await self._timed(primary, send)
+            self.tracker(primary).wins += 1
+            return result, primary, False
+
+        tasks = {asyncio.ensure_future(self._timed(primary, send)): primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                if self.credit >= 1.0:
+                    self.credit -= 1.0
+                    self.stats["hedged"] += 1
+                    tasks[asyncio.ensure_future(self._timed(backup, send, primary=False))] = backup
+                else:
+                    self.stats["budget_exhausted"] += 1
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        model = tasks[task]
+                        self.tracker(model).wins += 1
+                        if model != primary:
+                            self.stats["hedge_wins"] += 1
+                        return task.result(), model, len(tasks) > 1
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        calls = self.stats["calls"] or 1
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "hedge_rate": round(self.stats["hedged"] / calls, 4),
+            "hedge_percentile": self.hedge_percentile,
+            "hedge_budget_percent": round(self.hedge_budget * 100, 2),
+            "models": {model: tracker.to_dict() for model, tracker in self.trackers.items()}
+        }
@@ -0,0 +1,85 @@
+import re
+import zlib
+from typing import List
+
+from .rate_limiter import estimate_tokens
+
+CHUNK_SUMMARY_PROMPT = """Summarize this section of a longer document in a few sentences. Keep the key facts, figures and names:
+
+{content}"""
+
+COMBINE_PROMPT = """These are summaries of consecutive sections of one document. Merge them into one shorter summary that keeps the key facts:
+
+{content}"""
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# A unit whose hash is divisible by this ends a chunk (once the chunk is past its minimum size)
+BOUNDARY_DIVISOR = 4
+
+
+def _units(text: str, max_chars: int) -> List[str]:
+    """Paragraphs, with over-long ones split into sentences and over-long sentences cut at spaces"""
+    units = []
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        pieces = [paragraph] if len(paragraph) <= max_chars else SENTENCE_END.split(paragraph)
+        for piece in pieces:
+            while len(piece) > max_chars:
+                cut = piece.rfind(" ", 0, max_chars)
+                cut = cut if cut > max_chars // 2 else max_chars
+                units.append(piece[:cut])
+                piece = piece[cut:].lstrip()
+            if piece:
+                units.append(piece)
+    return units
+
+
+def split_into_chunks(text: str, chunk_tokens: int) -> List[str]:
+    """Split text into chunks of at most chunk_tokens, at paragraph or sentence boundaries.
+
+    Chunk ends are chosen by content (a hash of the unit that closes it)
+    rather than by offset, so two documents sharing a run of paragraphs
+    split that run into the same chunks, and a cached chunk summary serves
+    both.
+    """
+    max_chars = max(200, chunk_tokens * 4)
+    min_chars = max_chars // 2
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for unit in _units(text, max_chars):
+        if current and size + len(unit) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(unit)
+        size += len(unit) + 2
+        if size >= min_chars and zlib.crc32(unit.encode("utf-8")) % BOUNDARY_DIVISOR == 0:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def group_partials(partials: List[str], token_budget: int) -> List[List[str]]:
+    """Pack consecutive partial summaries into groups that each fit one combine prompt"""
+    groups: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for partial in partials:
+        cost = estimate_tokens(partial) + 1
+        if current and used + cost > token_budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(partial)
+        used += cost
+    if current:
+        groups.append(current)
+    # Always make progress: never leave a round with as many groups as partials
+    if len(groups) == len(partials) > 1:
+        groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+    return groups
@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache_dir import cache_path
+
+PROBE_PROMPT = "Hello, please respond with 'AI System Active'"
+
+
+class ModelSelectionCache:
+    """On-disk record of the last model probe so warm starts can skip probing"""
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[float] = None,
+                 negative_ttl_seconds: Optional[float] = None):
+        self.path = path or os.getenv("GEMINI_MODEL_CACHE") or cache_path("model_selection.json")
+        self.ttl_seconds = float(ttl_seconds if ttl_seconds is not None
+                                 else os.getenv("GEMINI_MODEL_CACHE_TTL", 86400))
+        # A probe where every model failed is only trusted for a short while
+        self.negative_ttl_seconds = float(negative_ttl_seconds if negative_ttl_seconds is not None
+                                          else os.getenv("GEMINI_MODEL_CACHE_NEGATIVE_TTL", 300))
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def fingerprint(api_key: str) -> str:
+        """Hash the API key so the cache is invalidated when the key changes"""
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+    def load(self, api_key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached selection for this key, or None if missing or expired"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(entry, dict) or entry.get("key_fingerprint") != self.fingerprint(api_key):
+            return None
+
+        ttl = self.ttl_seconds if entry.get("model") else self.negative_ttl_seconds
+        age = time.time() - entry.get("created_at", 0)
+        if age > ttl:
+            self.logger.info(f"⌛ Model selection cache expired ({age:.0f}s old)")
+            return None
+        return entry
+
+    def store(self, api_key: str, model: Optional[str], candidates: List[str],
+              failures: Dict[str, str]) -> Dict[str, Any]:
+        """Persist a probe outcome atomically"""
+        entry = {
+            "key_fingerprint": self.fingerprint(api_key),
+            "model": model,
+            "candidates": candidates,
+            "failures": failures,
+            "created_at": time.time()
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.warning(f"Could not write model selection cache: {e}")
+        return entry
+
+    def clear(self):
+        """Forget the cached selection"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+async def probe_models(genai_backend: Any, candidates: List[str], deadline: float = 10.0,
+                       logger: Optional[logging.Logger] = None) -> Tuple[Optional[str], Any, Dict[str, str]]:
+    """Probe candidate models concurrently and return (name, model, failures).
+
+    Candidates earlier in the list are preferred: probing stops as soon as the
+    best-ranked success is known, and whatever succeeded by the deadline wins.
+    """
+    logger = logger or logging.getLogger(__name__)
+    failures: Dict[str, str] = {}
+    tasks: Dict[asyncio.Future, Tuple[int, str, Any]] = {}
+
+    for rank, model_name in enumerate(candidates):
+        try:
+            model = genai_backend.GenerativeModel(model_name)
+        except Exception as e:
+            failures[model_name] = str(e)[:200]
+            continue
+        task = asyncio.ensure_future(model.generate_content_async(PROBE_PROMPT))
+        tasks[task] = (rank, model_name, model)
+
+    successes: Dict[int, Tuple[str, Any]] = {}
+    pending = set(tasks)
+    loop = asyncio.get_running_loop()
+    expires_at = loop.time() + deadline
+
+    try:
+        while pending:
+            remaining = expires_at - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                rank, model_name, model = tasks[task]
+                try:
+                    response = task.result()
+                    successes[rank] = (model_name, model)
+                    logger.info(f"🧪 Model {model_name} responded: {str(getattr(response, 'text', ''))[:60]}")
+                except Exception as e:
+                    failures[model_name] = str(e)[:200]
+                    logger.warning(f"❌ Model {model_name} failed: {str(e)[:100]}")
+
+            # Nothing still running can beat the best success we already have
+            if successes and all(tasks[t][0] > min(successes) for t in pending):
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+            if not successes:
+                failures[tasks[task][1]] = f"probe timed out after {deadline}s"
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if not successes:
+        return None, None, failures
+    model_name, model = successes[min(successes)]
+    return model_name, model, failures
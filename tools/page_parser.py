@@ -0,0 +1,189 @@
+import asyncio
+import codecs
+import functools
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+
+# Caps on what extraction returns, whatever the page size
+MAX_TITLE_CHARS = 300
+MAX_DESCRIPTION_CHARS = 500
+
+
+class TextExtractor(HTMLParser):
+    """Incremental HTML-to-text extractor: feed() chunks as they arrive"""
+
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "section", "article"}
+
+    def __init__(self, max_chars: int = 20000):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.title = ""
+        self.description = ""
+        self.language = ""
+        self.links = 0
+        self.chars = 0
+        self._parts: List[str] = []
+        self._skip_depth = 0
+        self._in_title = False
+
+    @property
+    def full(self) -> bool:
+        return self.chars >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            attributes = dict(attrs)
+            if (attributes.get("name") or attributes.get("property") or "").lower() in ("description",
+                                                                                       "og:description"):
+                self.description = self.description or (attributes.get("content") or "")[:MAX_DESCRIPTION_CHARS]
+        elif tag == "html":
+            self.language = dict(attrs).get("lang") or ""
+        elif tag == "a":
+            self.links += 1
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS and self._parts and not self._parts[-1].endswith("\n"):
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._in_title:
+            if len(self.title) < MAX_TITLE_CHARS:
+                self.title = (self.title + data.strip())[:MAX_TITLE_CHARS]
+            return
+        if self._skip_depth or self.full:
+            return
+        text = " ".join(data.split())
+        if text:
+            text = text[:self.max_chars - self.chars]
+            self._parts.append(text + " ")
+            self.chars += len(text) + 1
+
+    def get_text(self) -> str:
+        return "".join(self._parts).strip()[:self.max_chars]
+
+
+def extract_page(raw: bytes, charset: Optional[str] = None, max_text_chars: int = 20000,
+                 max_input_bytes: int = 1_000_000) -> Dict[str, Any]:
+    """Decode raw HTML and extract compact text plus metadata.
+
+    A plain module-level function so it can run in a worker process.
+    """
+    started = time.perf_counter()
+    raw = raw[:max_input_bytes]
+    try:
+        decoder = codecs.getincrementaldecoder(charset or "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    extractor = TextExtractor(max_text_chars)
+    # Feed in slices so a page whose text cap is reached early stops there
+    for offset in range(0, len(raw), 65536):
+        extractor.feed(decoder.decode(raw[offset:offset + 65536]))
+        if extractor.full:
+            break
+    else:
+        extractor.feed(decoder.decode(b"", final=True))
+    extractor.close()
+    return {
+        "title": extractor.title,
+        "description": extractor.description,
+        "language": extractor.language,
+        "links": extractor.links,
+        "text": extractor.get_text(),
+        "parse_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+class PageParser:
+    """Runs extract_page off the event loop in a process or thread pool.
+
+    mode is "thread" (the default: keeps the loop responsive but shares the
+    GIL), "process" (parallel across cores, worth its startup and pickling
+    cost only when many large pages are parsed at once) or "inline". Pages
+    smaller than inline_below bytes are parsed inline, where a pool hop
+    costs more than the parse itself.
+    """
+
+    MODES = ("process", "thread", "inline")
+
+    def __init__(self, mode: Optional[str] = None, workers: Optional[int] = None,
+                 max_text_chars: Optional[int] = None, max_input_bytes: Optional[int] = None,
+                 inline_below: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.mode = (mode or os.getenv("PARSE_EXECUTOR", "thread")).lower()
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown parse executor: {self.mode}")
+        self.workers = int(workers or os.getenv("PARSE_WORKERS", 0)) or os.cpu_count() or 1
+        self.max_text_chars = int(max_text_chars or os.getenv("FETCH_MAX_TEXT_CHARS", 20000))
+        self.max_input_bytes = int(max_input_bytes or os.getenv("FETCH_MAX_BYTES", 1_000_000))
+        self.inline_below = int(inline_below if inline_below is not None else os.getenv("PARSE_INLINE_BYTES", 4096))
+        self._executor: Optional[Executor] = None
+        self.stats = {"offloaded": 0, "inline": 0, "failed": 0, "bytes": 0, "parse_seconds": 0.0}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="page-parser")
+        return self._executor
+
+    async def parse(self, raw: bytes, charset: Optional[str] = None,
+                    max_text_chars: Optional[int] = None) -> Dict[str, Any]:
+        """Extract text and metadata from raw page bytes without blocking the event loop.
+
+        max_text_chars overrides the parser's own cap for this page, so
+        callers with different limits can share one pool.
+        """
+        job = functools.partial(extract_page, raw, charset, max_text_chars or self.max_text_chars,
+                                self.max_input_bytes)
+        self.stats["bytes"] += min(len(raw), self.max_input_bytes)
+        try:
+            if self.mode == "inline" or len(raw) < self.inline_below:
+                self.stats["inline"] += 1
+                page = job()
+            else:
+                self.stats["offloaded"] += 1
+                page = await asyncio.get_running_loop().run_in_executor(self._get_executor(), job)
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        self.stats["parse_seconds"] += page["parse_ms"] / 1000
+        return page
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            **self.stats,
+            "parse_seconds": round(self.stats["parse_seconds"], 4)
+        }
+
+    def close(self):
+        """Shut the pool down; a later parse() starts a new one"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_shared_parser: Optional[PageParser] = None
+
+
+def get_page_parser() -> PageParser:
+    """The parser pool shared by every search backend in this process"""
+    global _shared_parser
+    if _shared_parser is None:
+        _shared_parser = PageParser()
+    return _shared_parser
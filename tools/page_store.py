@@ -0,0 +1,300 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from .cache_dir import cache_path
+
+# Pages are only re-stamped as used this often, so hits rarely need a write
+ACCESS_UPDATE_INTERVAL = 60.0
+
+
+def page_key(url: str) -> str:
+    """Key of a page: the exact URL without its fragment, with scheme and host lowercased"""
+    parts = urlsplit(url.strip())
+    exact = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ""))
+    return hashlib.sha256(exact.encode("utf-8")).hexdigest()
+
+
+def freshness_lifetime(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds a response may be served without revalidation, from Cache-Control or Expires.
+
+    None when the headers say nothing (the store's default applies); 0 for
+    no-cache, private or an Expires in the past.
+    """
+    directives = {}
+    for part in headers.get("Cache-Control", "").lower().split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name] = value.strip('"')
+    if "no-cache" in directives or "private" in directives:
+        return 0.0
+    age = float(headers["Age"]) if headers.get("Age", "").isdigit() else 0.0
+    if "max-age" in directives:
+        try:
+            return max(0.0, float(directives["max-age"]) - age)
+        except ValueError:
+            return 0.0
+    if "Expires" in headers:
+        try:
+            expires = parsedate_to_datetime(headers["Expires"]).timestamp()
+            date = parsedate_to_datetime(headers["Date"]).timestamp() if "Date" in headers else time.time()
+        except (TypeError, ValueError):
+            return 0.0  # An invalid Expires means already expired
+        return max(0.0, expires - date - age)
+    return None
+
+
+class PageStore:
+    """On-disk store of fetched pages, keyed by URL.
+
+    Each page keeps its zlib-compressed body in its own file and its
+    extracted text (compressed JSON) plus ETag/Last-Modified validators in an
+    SQLite index. A page is served without a request for as long as its
+    Cache-Control max-age or Expires allows (fresh_seconds when the response
+    had neither); after that it is revalidated with a conditional GET, so an
+    unchanged page costs a 304. Bodies are kept so a page can be re-extracted;
+    fetches are served from the stored extraction and never read them.
+
+    Several processes may share one store: the index runs in WAL mode (readers
+    never block and writers queue on SQLite's lock), body files are written
+    to a temporary name and renamed into place, and every body version has
+    its own file name, so a reader never sees a half-written or swapped body.
+    When the total size passes max_bytes, the least recently used pages are
+    evicted down to 90% of it.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None,
+                 fresh_seconds: Optional[float] = None, compress_level: int = 1):
+        self.logger = logging.getLogger(__name__)
+        self.root = root or os.getenv("PAGE_STORE_DIR") or cache_path("pages")
+        self.max_bytes = int(max_bytes or os.getenv("PAGE_STORE_MAX_BYTES", 512 * 1024 * 1024))
+        self.fresh_seconds = float(fresh_seconds if fresh_seconds is not None
+                                   else os.getenv("PAGE_STORE_FRESH_SECONDS", 3600))
+        # Level 1 compresses HTML about 3x at a fraction of the default level's CPU cost
+        self.compress_level = compress_level
+        self.stats = {"fresh_hits": 0, "revalidated": 0, "misses": 0, "changed": 0, "stored": 0,
+                      "evictions": 0, "bytes_saved": 0}
+        self._stats_lock = threading.Lock()
+
+        os.makedirs(os.path.join(self.root, "bodies"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), timeout=30,
+                                   check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, url TEXT NOT NULL, status INTEGER, "
+            "content_type TEXT, charset TEXT, etag TEXT, last_modified TEXT, body_file TEXT NOT NULL, "
+            "body_bytes INTEGER NOT NULL, raw_bytes INTEGER NOT NULL, truncated INTEGER NOT NULL, "
+            "page BLOB NOT NULL, fetched_at REAL NOT NULL, validated_at REAL NOT NULL, "
+            "last_access REAL NOT NULL, max_age REAL)"
+        )
+        if "max_age" not in {row[1] for row in self._db.execute("PRAGMA table_info(pages)")}:
+            try:
+                self._db.execute("ALTER TABLE pages ADD COLUMN max_age REAL")
+            except sqlite3.OperationalError:
+                pass  # Another process added it first
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_by_access ON pages (last_access)")
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """The stored entry for a URL, or None.
+
+        The entry carries the extracted page, its validators and whether it
+        is still fresh; a caller that has to revalidate uses conditional_headers().
+        Blocking: async callers run it in a worker thread.
+        """
+        key = page_key(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, status, content_type, charset, etag, last_modified, body_file, raw_bytes, "
+                "truncated, page, fetched_at, validated_at, last_access, max_age FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        (stored_url, status, content_type, charset, etag, last_modified, body_file, raw_bytes, truncated,
+         page, fetched_at, validated_at, last_access, max_age) = row
+        now = time.time()
+        if now - last_access > ACCESS_UPDATE_INTERVAL:
+            self._execute("UPDATE pages SET last_access = ? WHERE key = ?", (now, key))
+        return {
+            "key": key,
+            "url": stored_url,
+            "status": status,
+            "content_type": content_type,
+            "charset": charset,
+            "etag": etag,
+            "last_modified": last_modified,
+            "body_file": body_file,
+            "raw_bytes": raw_bytes,
+            "truncated": bool(truncated),
+            "page": json.loads(zlib.decompress(page)),
+            "fetched_at": fetched_at,
+            "validated_at": validated_at,
+            "max_age": max_age,
+            "fresh": now - validated_at < (max_age if max_age is not None else self.fresh_seconds)
+        }
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers for revalidating a stored entry"""
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record_hit(self, entry: Dict[str, Any]):
+        self._count("fresh_hits")
+        self._count("bytes_saved", entry["raw_bytes"])
+
+    def mark_validated(self, entry: Dict[str, Any], max_age: Optional[float] = None):
+        """The origin answered 304: the stored page is current again, for max_age if the 304 gave one.
+
+        Blocking: async callers run it in a worker thread.
+        """
+        self._execute("UPDATE pages SET validated_at = ?, max_age = COALESCE(?, max_age) WHERE key = ?",
+                      (time.time(), max_age, entry["key"]))
+        self._count("revalidated")
+        self._count("bytes_saved", entry["raw_bytes"])
+
+    def record_miss(self, changed: bool = False):
+        self._count("changed" if changed else "misses")
+
+    def read_body(self, entry: Dict[str, Any]) -> Optional[bytes]:
+        """The stored raw body, or None if it was evicted meanwhile"""
+        path = os.path.join(self.root, "bodies", entry["body_file"])
+        try:
+            with open(path, "rb") as f:
+                return zlib.decompress(f.read())
+        except (FileNotFoundError, zlib.error):
+            return None
+
+    def put(self, url: str, body: bytes, page: Dict[str, Any], status: int = 200,
+            content_type: Optional[str] = None, charset: Optional[str] = None, etag: Optional[str] = None,
+            last_modified: Optional[str] = None, truncated: bool = False, max_age: Optional[float] = None):
+        """Store (or replace) a fetched page. Blocking: call it from a worker thread.
+
+        max_age is the freshness lifetime from the response headers (see
+        freshness_lifetime); None falls back to fresh_seconds.
+        """
+        key = page_key(url)
+        compressed = zlib.compress(body, self.compress_level)
+        body_file = f"{key[:2]}/{key}-{hashlib.sha1(compressed).hexdigest()[:12]}.z"
+        path = os.path.join(self.root, "bodies", body_file)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+
+        page_blob = zlib.compress(json.dumps(page).encode("utf-8"), self.compress_level)
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                previous = self._db.execute("SELECT body_file FROM pages WHERE key = ?", (key,)).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO pages (key, url, status, content_type, charset, etag, last_modified, "
+                    "body_file, body_bytes, raw_bytes, truncated, page, fetched_at, validated_at, last_access, max_age) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, url, status, content_type, charset, etag, last_modified, body_file,
+                     len(compressed) + len(page_blob), len(body), int(truncated), page_blob, now, now, now,
+                     max_age)
+                )
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+        if previous is not None and previous[0] != body_file:
+            self._unlink(previous[0])
+        self._count("stored")
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used pages until the store is back under 90% of max_bytes"""
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(body_bytes), 0) FROM pages").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            target = total - int(self.max_bytes * 0.9)
+            victims, freed = [], 0
+            for key, body_file, size in self._db.execute(
+                    "SELECT key, body_file, body_bytes FROM pages ORDER BY last_access"):
+                victims.append((key, body_file))
+                freed += size
+                if freed >= target:
+                    break
+            self._db.executemany("DELETE FROM pages WHERE key = ?", [(key,) for key, _ in victims])
+        for _, body_file in victims:
+            self._unlink(body_file)
+        self._count("evictions", len(victims))
+
+    def _unlink(self, body_file: str):
+        try:
+            os.unlink(os.path.join(self.root, "bodies", body_file))
+        except FileNotFoundError:
+            pass
+
+    def _execute(self, sql: str, params: tuple):
+        try:
+            with self._lock:
+                self._db.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            # A busy store only costs a stale timestamp
+            self.logger.warning(f"Page store update skipped: {e}")
+
+    def clear(self):
+        with self._lock:
+            files = [row[0] for row in self._db.execute("SELECT body_file FROM pages")]
+            self._db.execute("DELETE FROM pages")
+        for body_file in files:
+            self._unlink(body_file)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, stored_bytes, raw_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(body_bytes), 0), COALESCE(SUM(raw_bytes), 0) FROM pages"
+            ).fetchone()
+        with self._stats_lock:
+            stats = dict(self.stats)
+        served = stats["fresh_hits"] + stats["revalidated"]
+        lookups = served + stats["misses"] + stats["changed"]
+        return {
+            **stats,
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "stored_bytes": stored_bytes,
+            "raw_bytes": raw_bytes,
+            "max_bytes": self.max_bytes,
+            "root": self.root
+        }
+
+
+_shared_store: Optional[PageStore] = None
+
+
+def get_page_store() -> PageStore:
+    """The page store shared by every search backend in this process"""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = PageStore()
+    return _shared_store
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .tracing import tracer
+
+THROTTLE_MARKERS = ("429", "resource exhausted", "resourceexhausted", "quota", "rate limit")
+RETRYABLE_MARKERS = THROTTLE_MARKERS + ("503", "unavailable", "deadline exceeded", "500 internal")
+RETRY_AFTER_PATTERN = re.compile(r"retry(?:[ _-](?:after|delay|in))?\D{0,20}?(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Throttling, quota and transient server errors are worth retrying"""
+    if getattr(error, "code", None) in (429, 500, 503, 504):
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in RETRYABLE_MARKERS)
+
+
+def is_throttling(error: Exception) -> bool:
+    """429/quota errors: the caller is over its rate, as opposed to a transient server fault"""
+    code = getattr(error, "code", None)
+    if code is not None and code != 429:
+        return False
+    text = f"{type(error).__name__} {error}".lower()
+    return code == 429 or any(marker in text for marker in THROTTLE_MARKERS)
+
+
+def retry_after_hint(error: Exception) -> Optional[float]:
+    """Extract a server-provided retry delay, if the error carries one"""
+    hint = getattr(error, "retry_after", None)
+    if hint is not None:
+        return float(hint)
+    match = RETRY_AFTER_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at per_minute / 60 per second.
+
+    The bucket holds burst_seconds worth of budget, so a cold start cannot
+    release a whole minute of traffic at once.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = 1.0):
+        self.per_minute = float(per_minute)
+        self.rate = self.per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, scale: float = 1.0):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate * scale)
+        self.updated = now
+
+    def wait_time(self, amount: float, scale: float = 1.0) -> float:
+        """Seconds until amount is available (0 if it already is)"""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / (self.rate * scale)
+
+
+class RateLimiter:
+    """Process-wide limiter for Gemini traffic: requests/minute and tokens/minute buckets,
+    retries with jittered exponential backoff, and an adaptive rate that halves on
+    throttling and creeps back up on success (AIMD).
+
+    Only 429/quota errors cut the rate; transient server errors (5xx) are
+    retried with backoff but say nothing about the caller's quota. The
+    default GEMINI_RPM of 1000 matches a paid-tier key; free-tier keys should
+    set their own limit, though AIMD also backs off on their first 429s.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_retries: Optional[int] = None, base_delay: float = 0.5, max_delay: float = 30.0,
+                 min_scale: float = 0.05, burst_seconds: float = 1.0, cooldown: float = 1.0):
+        self.logger = logging.getLogger(__name__)
+        self.requests = TokenBucket(requests_per_minute or float(os.getenv("GEMINI_RPM", 1000)), burst_seconds)
+        self.tokens = TokenBucket(tokens_per_minute or float(os.getenv("GEMINI_TPM", 1_000_000)), burst_seconds)
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv("GEMINI_MAX_RETRIES", 4))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_scale = min_scale
+        self.cooldown = cooldown
+        self.scale = 1.0
+        self._last_cut = 0.0
+        self.paused_until = 0.0
+        self._lock = None
+        self._lock_loop = None
+        self._completions = deque()
+        self.stats = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "throttled": 0,
+            "server_errors": 0,
+            "retries": 0,
+            "tokens_consumed": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0
+        }
+
+    def _get_lock(self) -> asyncio.Lock:
+        # asyncio locks are bound to one loop; benchmarks and tests may run several
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def acquire(self, tokens: int = 1) -> float:
+        """Wait for a request slot and the estimated tokens; return the time spent queued"""
+        started = time.monotonic()
+        async with self._get_lock():  # FIFO: waiters are served in arrival order
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.requests.refill(self.scale)
+                self.tokens.refill(self.scale)
+                wait = max(self.requests.wait_time(1, self.scale), self.tokens.wait_time(tokens, self.scale))
+                if wait <= 0:
+                    self.requests.level -= 1
+                    self.tokens.level -= min(tokens, self.tokens.capacity)
+                    break
+                await asyncio.sleep(wait)
+
+        waited = time.monotonic() - started
+        self.stats["queue_wait_total"] += waited
+        self.stats["queue_wait_max"] = max(self.stats["queue_wait_max"], waited)
+        return waited
+
+    def record_usage(self, estimated: int, actual: Optional[int]):
+        """Correct the token bucket once the real usage is known"""
+        if actual is None:
+            actual = estimated
+        self.tokens.level -= actual - estimated
+        self.stats["tokens_consumed"] += actual
+
+    def record_success(self):
+        self.scale = min(1.0, self.scale + 0.02)
+        self.stats["succeeded"] += 1
+        self._completions.append(time.monotonic())
+
+    def record_throttle(self, retry_after: Optional[float] = None):
+        """Cut the allowed rate and, if the server asked, pause everyone.
+
+        Requests already in flight when throttling starts all fail together,
+        so the rate is only cut once per cooldown window.
+        """
+        now = time.monotonic()
+        self.stats["throttled"] += 1
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        if now - self._last_cut >= self.cooldown:
+            self._last_cut = now
+            self.scale = max(self.min_scale, self.scale * 0.5)
+            self.logger.warning(f"🐢 Gemini throttled; rate scaled to {self.scale:.2f}"
+                                + (f", pausing {retry_after:.1f}s" if retry_after else ""))
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's hint"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    async def call(self, send: Callable[[], Awaitable[Any]], estimated_tokens: int = 1) -> Any:
+        """Send one request through the limiter, retrying retryable errors"""
+        for attempt in range(self.max_retries + 1):
+            with tracer.span("rate_limiter.acquire", "queue"):
+                await self.acquire(estimated_tokens)
+            self.stats["requests"] += 1
+            try:
+                response = await send()
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    self.stats["failed"] += 1
+                    raise
+                hint = retry_after_hint(e)
+                if is_throttling(e):
+                    self.record_throttle(hint)
+                else:
+                    self.stats["server_errors"] += 1
+                delay = self.backoff_delay(attempt, hint)
+                self.stats["retries"] += 1
+                self.logger.info(f"🔁 Retrying Gemini call in {delay:.2f}s (attempt {attempt + 2})")
+                await asyncio.sleep(delay)
+                continue
+
+            usage = getattr(response, "usage_metadata", None)
+            self.record_usage(estimated_tokens, getattr(usage, "total_token_count", None))
+            self.record_success()
+            return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Throughput, queue wait and throttling metrics"""
+        now = time.monotonic()
+        while self._completions and now - self._completions[0] > 60:
+            self._completions.popleft()
+        requests = self.stats["requests"] or 1
+        return {
+            **self.stats,
+            "queue_wait_total": round(self.stats["queue_wait_total"], 3),
+            "queue_wait_max": round(self.stats["queue_wait_max"], 3),
+            "queue_wait_avg": round(self.stats["queue_wait_total"] / requests, 4),
+            "completed_last_minute": len(self._completions),
+            "rate_scale": round(self.scale, 3),
+            "requests_per_minute": self.requests.per_minute,
+            "tokens_per_minute": self.tokens.per_minute
+        }
+
+
+_shared_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """The limiter shared by every GeminiTools instance in this process"""
+    global _shared_limiter
+    if _shared_limiter is None:
+        _shared_limiter = RateLimiter()
+    return _shared_limiter
@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .cache_dir import cache_path
+
+# Expired rows are deleted from the disk store at most this often (and when it is opened)
+PURGE_INTERVAL = 3600.0
+
+
+def content_hash(content: str) -> str:
+    """Stable hash of arbitrary prompt content"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(model: str, template: str, analysis_type: str, content: str) -> str:
+    """Content-addressed key: same model, template, analysis type and content share an entry"""
+    parts = [model, content_hash(template), analysis_type, content_hash(content)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier response cache: an in-memory LRU backed by an SQLite store with TTL.
+
+    Concurrent requests for the same key share a single upstream call. The
+    async methods (aget, aput, get_or_compute) do their disk I/O in a worker
+    thread; get and put are for synchronous callers. Expired rows are purged
+    when the store is opened and then at most every PURGE_INTERVAL seconds.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 disk_path: Optional[str] = None, use_disk: bool = True):
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = int(max_entries or os.getenv("RESPONSE_CACHE_SIZE", 512))
+        self.ttl_seconds = float(ttl_seconds if ttl_seconds is not None
+                                 else os.getenv("RESPONSE_CACHE_TTL", 86400))
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expired": 0,
+            "purged": 0
+        }
+        self._last_purge = 0.0
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        if use_disk:
+            self.disk_path = disk_path or os.getenv("RESPONSE_CACHE_PATH") or cache_path("responses.sqlite3")
+            try:
+                self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                self._db.commit()
+                self._purge_expired()
+            except sqlite3.Error as e:
+                self.logger.warning(f"Response cache disk store unavailable: {e}")
+                self._db = None
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _from_memory(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, created_at = entry
+            if not self._expired(created_at):
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return value
+            del self._memory[key]
+            self.stats["expired"] += 1
+        return None
+
+    def _read_from_disk(self, key: str) -> Optional[tuple]:
+        """(value, created_at) of a live disk entry; expired ones are deleted. Blocking."""
+        try:
+            with self._db_lock:
+                row = self._db.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and self._expired(row[1]):
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.stats["expired"] += 1
+                    return None
+        except sqlite3.Error as e:
+            self.logger.warning(f"Response cache read failed: {e}")
+            return None
+        return row
+
+    def _write_to_disk(self, key: str, value: str, created_at: float):
+        """Blocking; also purges expired rows when PURGE_INTERVAL has passed"""
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, value, created_at)
+                )
+                self._db.commit()
+            if time.time() - self._last_purge > PURGE_INTERVAL:
+                self._purge_expired()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Response cache write failed: {e}")
+
+    def _purge_expired(self):
+        self._last_purge = time.time()
+        if self.ttl_seconds <= 0:
+            return
+        with self._db_lock:
+            cursor = self._db.execute("DELETE FROM responses WHERE created_at < ?",
+                                      (self._last_purge - self.ttl_seconds,))
+            self._db.commit()
+        self.stats["purged"] += max(cursor.rowcount, 0)
+
+    def _from_disk_row(self, key: str, row: Optional[tuple]) -> Optional[str]:
+        if row is None:
+            return None
+        value, created_at = row
+        self._remember(key, value, created_at)
+        self.stats["disk_hits"] += 1
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        """Look a key up in memory, then on disk (blocking; async callers use aget)"""
+        value = self._from_memory(key)
+        if value is None and self._db is not None:
+            value = self._from_disk_row(key, self._read_from_disk(key))
+        return value
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Like get, with the disk lookup in a worker thread"""
+        value = self._from_memory(key)
+        if value is None and self._db is not None:
+            value = self._from_disk_row(key, await asyncio.to_thread(self._read_from_disk, key))
+        return value
+
+    def put(self, key: str, value: str):
+        """Store a value in both tiers (blocking; async callers use aput)"""
+        created_at = time.time()
+        self._remember(key, value, created_at)
+        if self._db is not None:
+            self._write_to_disk(key, value, created_at)
+
+    async def aput(self, key: str, value: str):
+        """Like put, with the disk write in a worker thread"""
+        created_at = time.time()
+        self._remember(key, value, created_at)
+        if self._db is not None:
+            await asyncio.to_thread(self._write_to_disk, key, value, created_at)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[str]],
+                             cacheable: Optional[Callable[[str], bool]] = None) -> str:
+        """Return the cached value or run compute(), sharing one call between concurrent callers.
+
+        Exceptions propagate to every waiter and are never cached; nor are
+        results for which cacheable(result) is false.
+        """
+        cached = await self.aget(key)
+        if cached is not None:
+            return cached
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+
+            def _finish(done: asyncio.Future):
+                self._in_flight.pop(key, None)
+                if (not done.cancelled() and done.exception() is None
+                        and (cacheable is None or cacheable(done.result()))):
+                    created_at = time.time()
+                    self._remember(key, done.result(), created_at)
+                    if self._db is not None:
+                        asyncio.get_running_loop().run_in_executor(
+                            None, self._write_to_disk, key, done.result(), created_at
+                        )
+
+            task.add_done_callback(_finish)
+
+        # Shield so a cancelled caller does not cancel the call others are waiting on
+        return await asyncio.shield(task)
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus current sizes, for get_status()"""
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "in_flight": len(self._in_flight),
+            "disk_enabled": self._db is not None
+        }
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, urlsplit
+
+import aiohttp
+
+from .page_parser import PageParser, get_page_parser
+from .page_store import PageStore, freshness_lifetime, get_page_store
+
+
+class SearchBackend(ABC):
+    """Pluggable source of search results and page content for SearchAgent"""
+
+    name = "base"
+
+    @abstractmethod
+    async def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        """Return up to max_results results with title, url, snippet and source"""
+        pass
+
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        """Fetch a page and return its extracted text"""
+        return {"url": url, "status": None, "title": "", "text": "", "error": "fetch not supported"}
+
+    async def close(self):
+        """Release pooled resources"""
+        pass
+
+
+class SimulatedSearchBackend(SearchBackend):
+    """Offline backend returning canned results (the original simulator)"""
+
+    name = "simulated"
+
+    # Simulated search results for our climate change topic
+    SIMULATED_RESULTS = [
+        {
+            "title": "AI Applications in Climate Change Mitigation",
+            "url": "https://example.com/ai-climate-1",
+            "snippet": "Artificial intelligence is being used to optimize renewable energy systems and predict climate patterns with unprecedented accuracy.",
+            "source": "simulated"
+        },
+        {
+            "title": "Machine Learning for Carbon Emission Reduction",
+            "url": "https://example.com/ai-climate-2",
+            "snippet": "Recent studies show ML algorithms can reduce industrial carbon emissions by up to 30% through optimized processes.",
+            "source": "simulated"
+        },
+        {
+            "title": "AI in Climate Modeling and Prediction",
+            "url": "https://example.com/ai-climate-3",
+            "snippet": "Advanced neural networks are improving climate model accuracy, helping policymakers make better decisions.",
+            "source": "simulated"
+        }
+    ]
+
+    def __init__(self, latency: float = 0.2):
+        self.latency = latency
+
+    async def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        await asyncio.sleep(self.latency)  # Simulate search time
+        return [dict(result) for result in self.SIMULATED_RESULTS[:max_results]]
+
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        await asyncio.sleep(self.latency)
+        for result in self.SIMULATED_RESULTS:
+            if result["url"] == url:
+                return {"url": url, "status": 200, "title": result["title"], "text": result["snippet"],
+                        "bytes_read": len(result["snippet"]), "truncated": False}
+        return {"url": url, "status": 404, "title": "", "text": "", "error": "not found"}
+
+
+class HttpSearchBackend(SearchBackend):
+    """Search and fetch over HTTP using one pooled keep-alive aiohttp session.
+
+    search_url is a SearxNG-style JSON endpoint with a {query} placeholder,
+    e.g. http://localhost:8888/search?q={query}&format=json
+    """
+
+    name = "http"
+
+    def __init__(self, search_url: Optional[str] = None, max_connections: Optional[int] = None,
+                 per_host_limit: Optional[int] = None, timeout: Optional[float] = None,
+                 max_page_bytes: Optional[int] = None, max_text_chars: Optional[int] = None,
+                 user_agent: str = "multi-agent-research-assistant/1.0", parser: Optional[PageParser] = None,
+                 page_store: Optional[PageStore] = None):
+        self.logger = logging.getLogger(__name__)
+        self.search_url = search_url or os.getenv("SEARCH_API_URL", "")
+        self.max_connections = int(max_connections or os.getenv("SEARCH_MAX_CONNECTIONS", 100))
+        self.per_host_limit = int(per_host_limit or os.getenv("SEARCH_PER_HOST_LIMIT", 10))
+        self.timeout = float(timeout or os.getenv("SEARCH_TIMEOUT", 15))
+        self.max_page_bytes = int(max_page_bytes or os.getenv("FETCH_MAX_BYTES", 1_000_000))
+        self.max_text_chars = int(max_text_chars or os.getenv("FETCH_MAX_TEXT_CHARS", 20000))
+        self.user_agent = user_agent
+        # HTML extraction is CPU-bound, so it runs in a worker pool rather than on the event loop.
+        # The pool is shared by every backend in the process (or owned by the caller), so close()
+        # leaves it running
+        self.parser = parser or get_page_parser()
+        # Fetched pages are kept on disk and revalidated with ETag/Last-Modified
+        if page_store is None and os.getenv("PAGE_STORE_ENABLED", "true").lower() in ("1", "true", "yes"):
+            try:
+                page_store = get_page_store()
+            except (OSError, sqlite3.Error) as e:
+                self.logger.warning(f"Page store unavailable, fetching without it: {e}")
+        self.page_store = page_store
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Create the shared session lazily, inside the running event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.per_host_limit,
+                keepalive_timeout=30,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": self.user_agent}
+            )
+        return self._session
+
+    async def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        if not self.search_url:
+            raise ValueError("SEARCH_API_URL is not configured for the http search backend")
+
+        url = self.search_url.replace("{query}", quote(query, safe=""))
+        async with self._get_session().get(url) as response:
+            response.raise_for_status()
+            payload = await response.json(content_type=None)
+
+        items = payload.get("results") or payload.get("items") or []
+        results = []
+        for item in items[:max_results]:
+            results.append({
+                "title": item.get("title", ""),
+                "url": item.get("url") or item.get("link", ""),
+                "snippet": item.get("content") or item.get("snippet", ""),
+                "source": urlsplit(item.get("url") or item.get("link", "")).netloc or "web"
+            })
+        return results
+
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        """Stream a page up to max_page_bytes, then extract its text in the parser pool.
+
+        With a page store, a fresh stored copy is returned without a request
+        and a stale one is revalidated, so an unchanged page costs a 304.
+        Freshness follows the response's Cache-Control and Expires headers.
+        """
+        stored = await asyncio.to_thread(self.page_store.get, url) if self.page_store is not None else None
+        if stored is not None and stored["fresh"]:
+            self.page_store.record_hit(stored)
+            return self._stored_page(stored, "fresh")
+
+        body = bytearray()
+        truncated = False
+        try:
+            async with self._get_session().get(url, headers=PageStore.conditional_headers(stored)) as response:
+                if response.status == 304 and stored is not None:
+                    await asyncio.to_thread(self.page_store.mark_validated, stored,
+                                            freshness_lifetime(response.headers))
+                    return self._stored_page(stored, "revalidated")
+                if not 200 <= response.status < 300:
+                    # Error pages are not content; keep them out of analysis and the store
+                    self.logger.warning(f"Fetch failed for {url}: HTTP {response.status}")
+                    return {"url": url, "status": response.status, "title": "", "text": "",
+                            "error": f"HTTP {response.status} {response.reason or ''}".strip()}
+                async for chunk in response.content.iter_chunked(65536):
+                    if len(body) + len(chunk) > self.max_page_bytes:
+                        body += chunk[:self.max_page_bytes - len(body)]
+                        truncated = True
+                        break
+                    body += chunk
+                status, content_type, charset = response.status, response.content_type, response.charset
+                etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+                cacheable = "no-store" not in response.headers.get("Cache-Control", "").lower()
+                max_age = freshness_lifetime(response.headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.warning(f"Fetch failed for {url}: {e}")
+            return {"url": url, "status": None, "title": "", "text": "", "error": str(e) or type(e).__name__}
+
+        body = bytes(body)
+        page = await self.parser.parse(body, charset, self.max_text_chars)
+        if self.page_store is not None:
+            self.page_store.record_miss(changed=stored is not None)
+            if status == 200 and cacheable:
+                try:
+                    # Compressing and writing a large body would stall the event loop
+                    await asyncio.to_thread(self.page_store.put, url, body, page, status, content_type, charset,
+                                            etag, last_modified, truncated, max_age)
+                except Exception as e:
+                    self.logger.warning(f"Could not store page {url}: {e}")
+        return {
+            "url": url,
+            "status": status,
+            "content_type": content_type,
+            **page,
+            "bytes_read": len(body),
+            "truncated": truncated,
+            "cache": "miss"
+        }
+
+    @staticmethod
+    def _stored_page(stored: Dict[str, Any], cache: str) -> Dict[str, Any]:
+        return {
+            "url": stored["url"],
+            "status": stored["status"],
+            "content_type": stored["content_type"],
+            **stored["page"],
+            "bytes_read": 0,
+            "truncated": stored["truncated"],
+            "cache": cache
+        }
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+def create_search_backend(name: Optional[str] = None) -> SearchBackend:
+    """Build the backend named by SEARCH_BACKEND (simulated or http)"""
+    name = (name or os.getenv("SEARCH_BACKEND", "simulated")).lower()
+    if name == "http":
+        return HttpSearchBackend()
+    if name == "simulated":
+        return SimulatedSearchBackend()
+    raise ValueError(f"Unknown search backend: {name}")
@@ -0,0 +1,289 @@
+import asyncio
+import copy
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .cache_dir import cache_path
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+STOPWORDS = frozenset({
+    "a", "an", "the", "in", "for", "of", "on", "to", "with", "and", "or", "by", "at", "from",
+    "about", "into", "using", "via", "is", "are", "how", "what", "does", "do"
+})
+
+# Longest first, so "optimization" and "optimizing" both reduce to "optim"
+SUFFIXES = ("ization", "isation", "ations", "ation", "ating", "izing", "ising", "ings", "ing", "ated",
+            "ates", "ate", "ized", "ised", "izes", "ises", "ize", "ise", "ies", "ed", "es", "s")
+
+# Relative weight of character trigrams, which only break ties between similar words
+TRIGRAM_WEIGHT = 0.15
+
+
+def stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def query_features(query: str) -> List[str]:
+    """Stemmed content words, each followed by its character trigrams (marked with a 'c:' prefix)"""
+    features = []
+    for word in TOKEN_PATTERN.findall(query.lower()):
+        if word in STOPWORDS:
+            continue
+        word = stem(word)
+        padded = f"<{word}>"
+        features.append(f"w:{word}")
+        features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+def embed_queries(queries: List[str], dim: int = 1024) -> np.ndarray:
+    """L2-normalized hashed-feature embeddings, one row per query.
+
+    Each feature hashes to a column and a sign (the hashing trick); rows are
+    accumulated with one scatter-add over the whole batch.
+    """
+    per_query = [query_features(query) for query in queries]
+    counts = np.fromiter(map(len, per_query), dtype=np.int64, count=len(per_query))
+    flat = [feature for features in per_query for feature in features]
+    hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in flat), dtype=np.int64,
+                         count=len(flat))
+    weights = np.fromiter((TRIGRAM_WEIGHT if feature[0] == "c" else 1.0 for feature in flat),
+                          dtype=np.float32, count=len(flat))
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+
+    matrix = np.zeros((len(queries), dim), dtype=np.float32)
+    np.add.at(matrix, (np.repeat(np.arange(len(queries)), counts), hashes % dim), weights * signs)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SemanticQueryCache:
+    """Finished research sessions, looked up by query meaning rather than exact text.
+
+    Embeddings live in one (capacity, dim) matrix, so a batch of queries is
+    matched against every cached query with a single matrix product. Entries
+    are grouped by kind (e.g. search-only versus fully analyzed sessions) so
+    a lookup never returns a less complete session than the caller needs.
+    The least recently used entry is evicted when full; with use_disk,
+    entries are written through to SQLite and reloaded on start. The cache
+    keeps its own copy of each session; aput() serializes and writes it in a
+    worker thread, and rows of dropped entries are deleted with the next write.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, threshold: Optional[float] = None,
+                 ttl_seconds: Optional[float] = None, dim: int = 1024, disk_path: Optional[str] = None,
+                 use_disk: bool = True):
+        self.logger = logging.getLogger(__name__)
+        self.capacity = int(capacity or os.getenv("SEMANTIC_CACHE_SIZE", 1000))
+        self.threshold = float(threshold if threshold is not None
+                               else os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.85))
+        self.ttl_seconds = float(ttl_seconds if ttl_seconds is not None
+                                 else os.getenv("SEMANTIC_CACHE_TTL", 86400))
+        self.dim = dim
+        self.embeddings = np.zeros((self.capacity, dim), dtype=np.float32)
+        self.valid = np.zeros(self.capacity, dtype=bool)
+        self.created_at = np.zeros(self.capacity, dtype=np.float64)
+        self.last_used = np.zeros(self.capacity, dtype=np.float64)
+        self.kind_ids = np.zeros(self.capacity, dtype=np.int16)
+        self.queries: List[Optional[str]] = [None] * self.capacity
+        self.sessions: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self._kinds: Dict[str, int] = {}
+        self._slots: Dict[tuple, int] = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        # (kind, query) rows of dropped entries, deleted by the next disk write
+        self._pending_deletes: deque = deque()
+        if use_disk:
+            self.disk_path = disk_path or os.getenv("SEMANTIC_CACHE_PATH") or cache_path("semantic_cache.sqlite3")
+            try:
+                self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS semantic_sessions (kind TEXT NOT NULL, query TEXT NOT NULL, "
+                    "embedding BLOB NOT NULL, session TEXT NOT NULL, created_at REAL NOT NULL, "
+                    "last_used REAL NOT NULL, PRIMARY KEY (kind, query))"
+                )
+                self._db.commit()
+                self._load()
+            except sqlite3.Error as e:
+                self.logger.warning(f"Semantic cache disk store unavailable: {e}")
+                self._db = None
+
+    def __len__(self) -> int:
+        return int(self.valid.sum())
+
+    def _kind_id(self, kind: str) -> int:
+        return self._kinds.setdefault(kind, len(self._kinds) + 1)
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT kind, query, embedding, session, created_at, last_used FROM semantic_sessions "
+            "ORDER BY last_used DESC LIMIT ?", (self.capacity,)
+        ).fetchall()
+        for kind, query, embedding, session, created_at, last_used in rows:
+            vector = np.frombuffer(embedding, dtype=np.float32)
+            if vector.shape[0] != self.dim or self._expired(created_at):
+                continue
+            slot = self._free_slot()
+            self._fill(slot, kind, query, vector, json.loads(session), created_at, last_used)
+        if rows:
+            self.logger.info(f"Loaded {len(self)} cached research sessions from {self.disk_path}")
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+    def _free_slot(self) -> int:
+        """An empty slot, or the least recently used one once the cache is full"""
+        empty = np.flatnonzero(~self.valid)
+        if len(empty):
+            return int(empty[0])
+        slot = int(self.last_used.argmin())
+        self._drop(slot)
+        self.stats["evictions"] += 1
+        return slot
+
+    def _fill(self, slot: int, kind: str, query: str, vector: np.ndarray, session: Dict[str, Any],
+              created_at: float, last_used: float):
+        self.embeddings[slot] = vector
+        self.valid[slot] = True
+        self.created_at[slot] = created_at
+        self.last_used[slot] = last_used
+        self.kind_ids[slot] = self._kind_id(kind)
+        self.queries[slot] = query
+        self.sessions[slot] = session
+        self._slots[(kind, query)] = slot
+
+    def _drop(self, slot: int, delete: bool = True):
+        kind = next((name for name, kind_id in self._kinds.items() if kind_id == self.kind_ids[slot]), None)
+        self._slots.pop((kind, self.queries[slot]), None)
+        if delete and self._db is not None:
+            self._pending_deletes.append((kind, self.queries[slot]))
+        self.valid[slot] = False
+        self.queries[slot] = None
+        self.sessions[slot] = None
+        self.last_used[slot] = 0.0
+
+    def lookup_many(self, queries: List[str], kind: str = "default") -> List[Optional[Dict[str, Any]]]:
+        """Best cached match for every query, matched as one batch.
+
+        Each hit is {"session", "similarity", "cached_query"}; misses are None.
+        """
+        if not queries:
+            return []
+        live = self.valid & (self.kind_ids == self._kinds.get(kind, -1))
+        if self.ttl_seconds > 0:
+            expired = live & (time.time() - self.created_at > self.ttl_seconds)
+            for slot in np.flatnonzero(expired):
+                self._drop(int(slot))
+                self.stats["expired"] += 1
+            live &= ~expired
+        if not live.any():
+            self.stats["misses"] += len(queries)
+            return [None] * len(queries)
+
+        slots = np.flatnonzero(live)
+        similarity = embed_queries(queries, self.dim) @ self.embeddings[slots].T
+        best = similarity.argmax(axis=1)
+        now = time.time()
+        matches: List[Optional[Dict[str, Any]]] = []
+        for row, column in enumerate(best):
+            score = float(similarity[row, column])
+            if score < self.threshold:
+                self.stats["misses"] += 1
+                matches.append(None)
+                continue
+            slot = int(slots[column])
+            self.last_used[slot] = now
+            self.stats["hits"] += 1
+            matches.append({"session": self.sessions[slot], "similarity": round(score, 4),
+                            "cached_query": self.queries[slot]})
+        return matches
+
+    def lookup(self, query: str, kind: str = "default") -> Optional[Dict[str, Any]]:
+        return self.lookup_many([query], kind)[0]
+
+    def put(self, query: str, session: Dict[str, Any], kind: str = "default"):
+        """Cache a copy of a finished session under its query, replacing an entry for the same query.
+
+        Blocking when the cache has a disk store: async callers use aput().
+        """
+        row = self._remember(query, session, kind)
+        if self._db is not None:
+            self._write_to_disk(row)
+
+    async def aput(self, query: str, session: Dict[str, Any], kind: str = "default"):
+        """put() with the serialization and disk write in a worker thread"""
+        row = self._remember(query, session, kind)
+        if self._db is not None:
+            await asyncio.to_thread(self._write_to_disk, row)
+
+    def _remember(self, query: str, session: Dict[str, Any], kind: str) -> tuple:
+        """Store a private copy in memory, so later changes by the caller do not alter the entry"""
+        session = copy.deepcopy(session)
+        slot = self._slots.get((kind, query))
+        if slot is not None:
+            self._drop(slot, delete=False)
+        else:
+            slot = self._free_slot()
+        now = time.time()
+        vector = embed_queries([query], self.dim)[0]
+        self._fill(slot, kind, query, vector, session, now, now)
+        return kind, query, vector.tobytes(), session, now
+
+    def _write_to_disk(self, row: tuple):
+        """Delete the rows of dropped entries, then write one entry. Blocking."""
+        kind, query, embedding, session, created_at = row
+        deletes = []
+        while self._pending_deletes:
+            deletes.append(self._pending_deletes.popleft())
+        try:
+            value = json.dumps(session, default=str)
+            with self._db_lock:
+                self._db.executemany("DELETE FROM semantic_sessions WHERE kind = ? AND query = ?", deletes)
+                # Writes may finish out of order; an older version never replaces a newer one
+                self._db.execute(
+                    "INSERT INTO semantic_sessions (kind, query, embedding, session, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (kind, query) DO UPDATE SET "
+                    "embedding = excluded.embedding, session = excluded.session, created_at = excluded.created_at, "
+                    "last_used = excluded.last_used WHERE excluded.created_at >= semantic_sessions.created_at",
+                    (kind, query, embedding, value, created_at, created_at)
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Semantic cache write failed: {e}")
+
+    def clear(self):
+        for slot in np.flatnonzero(self.valid):
+            self._drop(int(slot), delete=False)
+        self._pending_deletes.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM semantic_sessions")
+                self._db.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "entries": len(self),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "disk": self._db is not None,
+            **self.stats
+        }
@@ -0,0 +1,161 @@
+import contextvars
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .rate_limiter import estimate_tokens
+
+# Prompts with less room than this for content are not worth sending
+MIN_CONTENT_TOKENS = 32
+
+# Share of a truncated text kept from its start; the rest comes from its end
+HEAD_SHARE = 0.75
+
+WHITESPACE_RUN = re.compile(r"[ \t\f\v]+")
+BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised when a session has no token budget left for another call"""
+
+
+class TokenAccount:
+    """Token usage of one research session, with an optional limit.
+
+    Calls reserve their worst case (prompt plus the output cap) before they
+    are sent and settle to the actual usage afterwards, so concurrent calls
+    in one session cannot jointly overrun the limit. A limit of 0 means
+    usage is recorded but not capped.
+    """
+
+    def __init__(self, limit: int = 0):
+        self.limit = limit
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.calls = 0
+        self.truncated_calls = 0
+        self.trimmed_tokens = 0
+        self.rejected_calls = 0
+        self.hedged_calls = 0
+        self.hedge_input_tokens = 0
+        self.reserved = 0
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> Optional[int]:
+        if not self.limit:
+            return None
+        return self.limit - self.input_tokens - self.output_tokens - self.reserved
+
+    def reserve(self, tokens: int) -> int:
+        with self._lock:
+            remaining = self.remaining
+            if remaining is not None and tokens > remaining:
+                self.rejected_calls += 1
+                raise TokenBudgetExceeded(f"call needs up to {tokens} tokens, session has {remaining} left")
+            self.reserved += tokens
+            return tokens
+
+    def settle(self, reserved: int, input_tokens: int, output_tokens: int):
+        with self._lock:
+            self.reserved -= reserved
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.calls += 1
+
+    def release(self, reserved: int):
+        with self._lock:
+            self.reserved -= reserved
+
+    def note_hedge(self, input_tokens: int):
+        """A hedged call sent its prompt a second time; the duplicate's input counts too"""
+        with self._lock:
+            self.hedged_calls += 1
+            self.hedge_input_tokens += input_tokens
+            self.input_tokens += input_tokens
+
+    def note_trimmed(self, tokens: int):
+        with self._lock:
+            self.truncated_calls += 1
+            self.trimmed_tokens += tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.input_tokens + self.output_tokens,
+            "calls": self.calls,
+            "budget": self.limit or None,
+            "truncated_calls": self.truncated_calls,
+            "trimmed_tokens": self.trimmed_tokens,
+            "rejected_calls": self.rejected_calls,
+            "hedged_calls": self.hedged_calls,
+            "hedge_input_tokens": self.hedge_input_tokens
+        }
+
+
+_current_account: contextvars.ContextVar = contextvars.ContextVar("token_account", default=None)
+
+
+def current_account() -> Optional[TokenAccount]:
+    """The account of the session running in this context, if any"""
+    return _current_account.get()
+
+
+@contextmanager
+def charged_to(account: TokenAccount) -> Iterator[TokenAccount]:
+    """Charge every Gemini call made in this context (and tasks started from it) to account.
+
+    Never yield from an async generator inside it: the account would leak
+    into the consumer's context between items. Enter it around each step.
+    """
+    token = _current_account.set(account)
+    try:
+        yield account
+    finally:
+        _current_account.reset(token)
+
+
+@contextmanager
+def token_accounting(limit: int = 0) -> Iterator[TokenAccount]:
+    """charged_to() a new account with the given limit"""
+    with charged_to(TokenAccount(limit)) as account:
+        yield account
+
+
+def fit_text(text: str, max_tokens: int) -> Tuple[str, int]:
+    """Shrink text to about max_tokens; returns (text, tokens trimmed).
+
+    Cheap compression first (collapsed whitespace, repeated lines such as
+    navigation and footers dropped); if that is not enough, the middle is
+    cut, keeping the start and the end of the text.
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text, 0
+
+    seen = set()
+    lines = []
+    for line in BLANK_LINES.sub("\n", WHITESPACE_RUN.sub(" ", text)).split("\n"):
+        line = line.strip()
+        if line and (len(line) < 20 or line not in seen):
+            seen.add(line)
+            lines.append(line)
+    compact = "\n".join(lines)
+    if estimate_tokens(compact) <= max_tokens:
+        return compact, tokens - estimate_tokens(compact)
+
+    marker = "\n[... {} tokens omitted ...]\n"
+    budget_chars = max(0, max_tokens * 4 - len(marker) - 8)
+    head_chars = int(budget_chars * HEAD_SHARE)
+    tail_chars = budget_chars - head_chars
+    head = compact[:head_chars]
+    cut = head.rfind(" ")
+    head = head[:cut] if cut > head_chars // 2 else head
+    tail = compact[len(compact) - tail_chars:] if tail_chars else ""
+    cut = tail.find(" ")
+    tail = tail[cut + 1:] if 0 <= cut < tail_chars // 2 else tail
+    omitted = estimate_tokens(compact) - estimate_tokens(head) - estimate_tokens(tail)
+    fitted = head + marker.format(omitted) + tail
+    return fitted, tokens - estimate_tokens(fitted)
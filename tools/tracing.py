@@ -0,0 +1,271 @@
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# The tracer reads TRACING_ENABLED at import, which can come before gemini_tools loads .env
+load_dotenv()
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation; children record the span that was current when they started"""
+
+    __slots__ = ("name", "kind", "span_id", "parent_id", "trace_id", "start", "end", "status", "attributes")
+
+    def __init__(self, name: str, kind: str, span_id: int, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.span_id = span_id
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else span_id
+        self.start = time.perf_counter()
+        self.end = None
+        self.status = "ok"
+        self.attributes = attributes
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "trace_id": self.trace_id,
+            "duration": round(self.duration, 6),
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus layout)"""
+
+    __slots__ = ("buckets", "counts", "count", "total", "max")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound containing the q-th quantile"""
+        if not self.count:
+            return 0.0
+        target, running = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99)
+        }
+
+
+class _NoopSpan:
+    """Returned when tracing is off, so instrumented code pays almost nothing"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _SpanContext:
+    def __init__(self, tracer: "Tracer", name: str, kind: str, attributes: Dict[str, Any], activate: bool):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.activate = activate
+        self.span = None
+        self.token = None
+
+    def __enter__(self) -> Span:
+        self.span = self.tracer._start(self.name, self.kind, self.attributes)
+        if self.activate:
+            self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.token is not None:
+            _current_span.reset(self.token)
+        if exc_type is not None:
+            self.span.status = "cancelled" if exc_type.__name__ == "CancelledError" else "error"
+            self.span.attributes["error"] = str(exc)[:200]
+        self.tracer._finish(self.span)
+        return False
+
+
+class Tracer:
+    """Process-wide spans, latency histograms and in-flight gauges for agents and tools"""
+
+    def __init__(self, enabled: Optional[bool] = None, max_spans: int = 1000):
+        if enabled is None:
+            enabled = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.in_flight: Dict[Tuple[str, str], int] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def span(self, name: str, kind: str = "internal", activate: bool = True, **attributes):
+        """Context manager timing a block as a child of the current span.
+
+        With activate=False the span does not become the parent of work started
+        inside it; async generators need this because they run in their
+        consumer's context between yields.
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _SpanContext(self, name, kind, attributes, activate)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def _start(self, name: str, kind: str, attributes: Dict[str, Any]) -> Span:
+        span = Span(name, kind, next(self._ids), _current_span.get(), attributes)
+        with self._lock:
+            key = (kind, name)
+            self.in_flight[key] = self.in_flight.get(key, 0) + 1
+        return span
+
+    def _finish(self, span: Span):
+        span.end = time.perf_counter()
+        with self._lock:
+            key = (span.kind, span.name)
+            self.in_flight[key] -= 1
+            self.histograms.setdefault(key, Histogram()).observe(span.duration)
+            self.spans.append(span)
+
+    def observe(self, name: str, value: float, kind: str = "metric"):
+        """Record a measurement (e.g. a queue wait) that is not a span"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.histograms.setdefault((kind, name), Histogram()).observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.histograms.clear()
+            self.in_flight = {key: count for key, count in self.in_flight.items() if count}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "histograms": [
+                    {"kind": kind, "name": name, **histogram.to_dict()}
+                    for (kind, name), histogram in sorted(self.histograms.items())
+                ],
+                "in_flight": [
+                    {"kind": kind, "name": name, "value": value}
+                    for (kind, name), value in sorted(self.in_flight.items())
+                ],
+                "recent_spans": [span.to_dict() for span in self.spans]
+            }
+
+    def export_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent, default=str)
+
+    def export_prometheus(self, prefix: str = "research") -> str:
+        """Prometheus text exposition format"""
+        lines: List[str] = [
+            f"# HELP {prefix}_duration_seconds Latency of agent, tool and internal operations.",
+            f"# TYPE {prefix}_duration_seconds histogram"
+        ]
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            in_flight = sorted(self.in_flight.items())
+        for (kind, name), histogram in histograms:
+            labels = f'kind="{kind}",name="{name}"'
+            running = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                running += count
+                lines.append(f'{prefix}_duration_seconds_bucket{{{labels},le="{bound}"}} {running}')
+            lines.append(f'{prefix}_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{prefix}_duration_seconds_sum{{{labels}}} {histogram.total:.6f}")
+            lines.append(f"{prefix}_duration_seconds_count{{{labels}}} {histogram.count}")
+        lines.append(f"# HELP {prefix}_in_flight Operations currently running.")
+        lines.append(f"# TYPE {prefix}_in_flight gauge")
+        for (kind, name), value in in_flight:
+            lines.append(f'{prefix}_in_flight{{kind="{kind}",name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer()
+
+
+def traced(name: Optional[str] = None, kind: str = "tool") -> Callable:
+    """Decorator wrapping a coroutine or async-generator method in a span"""
+
+    def decorate(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def generator_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                    return
+                with tracer.span(span_name, kind, activate=False):
+                    async for item in func(*args, **kwargs):
+                        yield item
+            return generator_wrapper
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return await func(*args, **kwargs)
+            with tracer.span(span_name, kind):
+                return await func(*args, **kwargs)
+
+        wrapper.__traced__ = True
+        return wrapper
+
+    return decorate